@@ -0,0 +1,49 @@
+# Encode and decode cost of each installed JSON codec on chat completion chunks, compared with
+# the previous stdlib path that encoded to a str before encoding it to bytes.
+#
+#     PYTHONPATH=src python benchmarks/bench_codec.py
+import json
+import time
+
+from demuxai.codec import registry
+from helper import chat_chunk
+from helper import report
+
+
+def legacy_dumps(obj) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+
+def run(name: str, func, items, total_bytes: int, rounds: int = 5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    report(name, best, len(items), total_bytes)
+
+
+def main():
+    count = 50000
+    chunks = [chat_chunk(i) for i in range(count)]
+    tool_calls = [chat_chunk(i, content="x" * 64 * 1024) for i in range(200)]
+    codecs = [codec_class() for codec_class in registry if codec_class.is_available()]
+
+    for scenario, items in (("tokens", chunks), ("tool calls, 64KB", tool_calls)):
+        encoded = [legacy_dumps(item) for item in items]
+        total_bytes = sum(len(data) for data in encoded)
+
+        print(f"# dumps, {scenario}")
+        run("legacy", legacy_dumps, items, total_bytes)
+        for codec in codecs:
+            run(codec.name, codec.dumps, items, total_bytes)
+
+        print(f"# loads, {scenario}")
+        run("legacy", json.loads, encoded, total_bytes)
+        for codec in codecs:
+            run(codec.name, codec.loads, encoded, total_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Cost of routing a request body: reading the members routing needs, updating the model, and
+# encoding the body to send upstream. Compared with decoding the whole body up front and encoding
+# it all over again, for bodies with the model both before and after the bulk of the request.
+#
+#     PYTHONPATH=src python benchmarks/bench_context.py
+import time
+
+from demuxai import codec
+from demuxai.codec import registry
+from demuxai.context import ChatCompletionContext
+from demuxai.context import CompletionContext
+from helper import chat_body
+from helper import fim_body
+from helper import image_body
+
+
+def decoded(raw: bytes) -> bytes:
+    payload = codec.loads(raw)
+    payload["stream"]
+    payload["model"] = payload["model"].split("/", 1)[1]
+    return codec.dumps(payload)
+
+
+def routed(raw: bytes) -> bytes:
+    context = ChatCompletionContext.for_path("/v1/chat/completions")
+    context.raw_body = raw
+    context.streaming
+    context.update(model=context.model)
+    return context.encode()
+
+
+def decoded_fim(raw: bytes) -> bytes:
+    payload = codec.loads(raw)
+    payload["prompt"], payload["suffix"], payload["stop"], payload["stream"]
+    payload["model"] = payload["model"].split("/", 1)[1]
+    return codec.dumps(payload)
+
+
+def routed_fim(raw: bytes) -> bytes:
+    context = CompletionContext.for_path("/v1/completions")
+    context.raw_body = raw
+    # routing checks the request is FIM, and whether it streams, at several stages
+    for _ in range(3):
+        context.is_fim
+        context.streaming
+    context.update(model=context.model)
+    return context.encode()
+
+
+def run(name: str, func, raw: bytes, rounds: int = 50):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(raw)
+        best = min(best, time.perf_counter() - start)
+    print(
+        f"{name:>12}: {best * 1000:9.2f} ms  {len(raw) / best / 1024 / 1024:9.2f} MB/s"
+    )
+
+
+def main():
+    scenarios = (
+        ("chat, 300KB", chat_body, 300 * 1024, decoded, routed),
+        ("chat, 1MB", chat_body, 1024 * 1024, decoded, routed),
+        ("image, 1.5MB", image_body, 1536 * 1024, decoded, routed),
+        ("FIM, 356KB", fim_body, 356 * 1024, decoded_fim, routed_fim),
+    )
+    names = [codec_class.name for codec_class in registry if codec_class.is_available()]
+    for scenario, body, size, decode, route in scenarios:
+        for model_first in (False, True):
+            raw = codec.dumps(body(size, model_first))
+            order = "model first" if model_first else "model last"
+            for name in names:
+                codec.use(name)
+                assert codec.loads(route(raw)) == codec.loads(decode(raw))
+
+                print(f"# {scenario}, {order}, {name}")
+                run("decoded", decode, raw)
+                run("routed", route, raw)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Throughput benchmark for the SSE reader, comparing the buffer-based reader against the previous
+# line-concatenating implementation.
+#
+#     PYTHONPATH=src python benchmarks/bench_sse_reader.py
+import asyncio
+import json
+import time
+from typing import AsyncGenerator
+
+from demuxai.sse import AsyncStreamReader
+from demuxai.sse import Event
+from demuxai.sse import SEPARATOR
+from helper import async_iter
+from helper import chat_chunk
+from helper import report
+from helper import split_chunks
+
+
+class LegacyAsyncStreamReader(AsyncStreamReader):
+    """The previous implementation, kept here as the baseline"""
+
+    async def _read(self) -> AsyncGenerator[bytes, None]:
+        data = b""
+        async for chunk in self.upstream_aiter:
+            for line in chunk.splitlines(True):
+                data += line
+                if data.endswith((b"\r\r", b"\n\n", b"\r\n\r\n")):
+                    yield data
+                    data = b""
+        if data:
+            yield data
+
+    async def stream(self) -> AsyncGenerator[Event, None]:
+        async for chunk in self._read():
+            event = Event()
+            for line in chunk.splitlines():
+                line = line.decode(self.encoding)
+                if not line.strip() or line.startswith(SEPARATOR):
+                    continue
+
+                data = line.split(SEPARATOR, 1)
+                field = data[0]
+                if field not in Event.__slots__:
+                    continue
+
+                if len(data) > 1:
+                    value = data[1][1:] if data[1].startswith(" ") else data[1]
+                else:
+                    value = ""
+
+                if field == "data":
+                    setattr(event, field, value + "\n")
+                else:
+                    setattr(event, field, value)
+
+            if not event.data:
+                continue
+            if event.data.endswith("\n"):
+                event.data = event.data[0:-1]
+            event.event = event.event or "message"
+            yield event
+
+
+def token_stream(count: int) -> bytes:
+    return b"".join(
+        f"data: {json.dumps(chat_chunk(i))}\n\n".encode("utf-8") for i in range(count)
+    )
+
+
+def tool_call_stream(count: int, size: int) -> bytes:
+    arguments = "x" * size
+    return b"".join(
+        f"data: {json.dumps(chat_chunk(i, content=arguments))}\n\n".encode("utf-8")
+        for i in range(count)
+    )
+
+
+async def consume(reader_cls, chunks) -> int:
+    count = 0
+    async for _ in reader_cls(async_iter(chunks)).stream():
+        count += 1
+    return count
+
+
+def run(name: str, reader_cls, chunks, total_bytes: int, rounds: int = 5):
+    best = float("inf")
+    events = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        events = asyncio.run(consume(reader_cls, chunks))
+        best = min(best, time.perf_counter() - start)
+    report(name, best, events, total_bytes)
+
+
+def main():
+    scenarios = {
+        "tokens, 1 event per chunk": (token_stream(20000), None),
+        "tokens, 4KB chunks": (token_stream(20000), 4096),
+        "tool calls, 1MB events, 512B chunks": (tool_call_stream(4, 1024 * 1024), 512),
+    }
+    for scenario, (raw, chunk_size) in scenarios.items():
+        if chunk_size is None:
+            chunks = [block + b"\n\n" for block in raw.split(b"\n\n") if block]
+        else:
+            chunks = split_chunks(raw, chunk_size)
+        print(f"# {scenario}")
+        run("legacy", LegacyAsyncStreamReader, chunks, len(raw))
+        run("buffered", AsyncStreamReader, chunks, len(raw))
+
+
+if __name__ == "__main__":
+    main()
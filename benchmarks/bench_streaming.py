@@ -0,0 +1,101 @@
+# Per-event overhead of the streaming pipeline, from upstream bytes to downstream bytes, comparing
+# the layered generator pipeline against the fused pipeline.
+#
+#     PYTHONPATH=src python benchmarks/bench_streaming.py
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+from demuxai.providers.http import HTTPStreamingCompletionResponse
+from demuxai.sse import AsyncJSONStreamWriter
+from demuxai.sse import DEFAULT_EVENT_TYPE
+from demuxai.sse import Event
+from demuxai.sse import JSONEvent
+from helper import async_iter
+from helper import chat_chunk
+from helper import report
+from helper import split_chunks
+
+
+class LegacyAsyncJSONStreamWriter(AsyncJSONStreamWriter):
+    """The previous writer, which yielded each field of an event separately"""
+
+    async def _write(self, event: Event) -> AsyncGenerator[bytes, None]:
+        if isinstance(event, JSONEvent):
+            event = event.to_plain()
+        if event.event and event.event != DEFAULT_EVENT_TYPE:
+            yield f"event: {event.event}\n".encode(self.encoding)
+        yield f"data: {event.data}\n".encode(self.encoding)
+        if event.id is not None:
+            yield f"id: {event.id}\n".encode(self.encoding)
+        if event.retry is not None:
+            yield f"retry: {event.retry}\n".encode(self.encoding)
+        yield "\n".encode(self.encoding)
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        async for event in self.upstream_aiter:
+            async for chunk in self._write(event):
+                yield chunk
+        async for chunk in self._write(self.done_event):
+            yield chunk
+
+
+def build_response(chunks, decode: bool) -> HTTPStreamingCompletionResponse:
+    provider = SimpleNamespace(id="ollama")
+    response = HTTPStreamingCompletionResponse(provider, None, None)
+    response.decode = decode
+    response.upstream_aiter = async_iter(chunks)
+    return response
+
+
+def legacy(chunks):
+    response = build_response(chunks, decode=True)
+    return LegacyAsyncJSONStreamWriter(response.receive()).stream()
+
+
+def layered(chunks):
+    response = build_response(chunks, decode=False)
+    return AsyncJSONStreamWriter(response.receive()).stream()
+
+
+def fused(chunks):
+    return build_response(chunks, decode=False).transmit()
+
+
+async def consume(pipeline, chunks) -> int:
+    total = 0
+    async for chunk in pipeline(chunks):
+        total += len(chunk)
+    return total
+
+
+def run(name: str, pipeline, chunks, events: int, total_bytes: int, rounds: int = 5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        asyncio.run(consume(pipeline, chunks))
+        best = min(best, time.perf_counter() - start)
+    report(name, best, events, total_bytes)
+
+
+def main():
+    events = 20000
+    raw = b"".join(
+        f"data: {json.dumps(chat_chunk(i))}\n\n".encode("utf-8") for i in range(events)
+    )
+    raw += b"data: [DONE]\n\n"
+    scenarios = {
+        "1 event per chunk": [block + b"\n\n" for block in raw.split(b"\n\n") if block],
+        "4KB chunks": split_chunks(raw, 4096),
+    }
+    for scenario, chunks in scenarios.items():
+        print(f"# {scenario}")
+        run("legacy", legacy, chunks, events, len(raw))
+        run("layered", layered, chunks, events, len(raw))
+        run("fused", fused, chunks, events, len(raw))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import base64
+import os
+from typing import Iterable
+from typing import List
+
+
+async def async_iter(items: Iterable):
+    for item in items:
+        yield item
+
+
+def chat_chunk(
+    index: int, content: str = "token", model: str = "qwen2.5-coder:1.5b"
+) -> dict:
+    """A realistic chat completion chunk, as streamed by OpenAI compatible APIs"""
+    return {
+        "id": "chatcmpl-8f3a2c1d9e7b4a6f",
+        "object": "chat.completion.chunk",
+        "created": 1771102980,
+        "model": model,
+        "system_fingerprint": "fp_ollama",
+        "choices": [
+            {
+                "index": 0,
+                "delta": {"role": "assistant", "content": f"{content} {index}"},
+                "finish_reason": None,
+            }
+        ],
+    }
+
+
+def _request_body(bulk: dict, members: dict, model_first: bool) -> dict:
+    """Orders the body as a client would, with the model either before or after the bulk of it"""
+    return {**members, **bulk} if model_first else {**bulk, **members}
+
+
+def chat_body(size: int, model_first: bool = False) -> dict:
+    """A chat completion request with a long conversation of about `size` bytes"""
+    line = 'print("hello, world")  # a line of code, quoted "like so"\n'
+    messages = []
+    for index in range(size // 1024):
+        role = "user" if index % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": line * 16})
+    members = {"model": "ollama/qwen2.5-coder:1.5b", "stream": True}
+    return _request_body({"messages": messages}, members, model_first)
+
+
+def image_body(size: int, model_first: bool = False) -> dict:
+    """A chat completion request with an embedded image of about `size` bytes"""
+    image = base64.b64encode(os.urandom(size * 3 // 4)).decode("ascii")
+    content = [
+        {"type": "text", "text": "What is in this image?"},
+        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image}"}},
+    ]
+    messages = [{"role": "user", "content": content}]
+    members = {"model": "ollama/llava", "stream": False}
+    return _request_body({"messages": messages}, members, model_first)
+
+
+def fim_body(size: int, model_first: bool = False) -> dict:
+    """A fill-in-the-middle completion request with about `size` bytes of code around the cursor"""
+    line = '    value = compute("input", limit=10)  # call it\n'
+    code = line * (size // len(line) // 2)
+    members = {"model": "ollama/qwen2.5-coder:1.5b", "stream": True}
+    bulk = {"prompt": code, "suffix": code, "stop": ["\n\n"]}
+    return _request_body(bulk, members, model_first)
+
+
+def split_chunks(raw: bytes, size: int) -> List[bytes]:
+    chunks = []
+    for start in range(0, len(raw), size):
+        end = start + size
+        chunks.append(raw[start:end])
+    return chunks
+
+
+def report(name: str, seconds: float, events: int, total_bytes: int):
+    print(
+        f"{name:>12}: {seconds * 1000:9.2f} ms  "
+        f"{events / seconds:12,.0f} events/s  "
+        f"{total_bytes / seconds / 1024 / 1024:9.2f} MB/s  "
+        f"{seconds / events * 1e6:8.2f} us/event"
+    )
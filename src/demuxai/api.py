@@ -1,17 +1,27 @@
-import json
+import asyncio
 import os
 from contextlib import asynccontextmanager
 
+import httpx
+from demuxai import codec
 from demuxai.app import App
 from demuxai.context import ChatCompletionContext
 from demuxai.context import CompletionContext
 from demuxai.context import Context
 from demuxai.context import EmbeddingContext
 from demuxai.context import StreamingContext
+from demuxai.exceptions import ProviderOverloadedError
+from demuxai.exceptions import ProviderUnavailableError
+from demuxai.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from demuxai.metrics import render_metrics
 from demuxai.provider import ProviderResponse
 from demuxai.provider import ProviderStreamingCompletionResponse
+from demuxai.retry import classify
+from demuxai.retry import ERROR_CLIENT
+from demuxai.retry import ERROR_RATE_LIMITED
+from demuxai.retry import ERROR_TIMEOUT
 from demuxai.settings.main import Settings
-from demuxai.sse import AsyncJSONStreamWriter
+from demuxai.sse import AsyncStreamCoalescer
 from fastapi import FastAPI
 from fastapi import HTTPException
 from fastapi import Request
@@ -29,22 +39,41 @@ class API(FastAPI):
 
 class StreamingProxyResponse(StreamingResponse):
     def __init__(
-        self, context: Context, upstream_response: ProviderStreamingCompletionResponse
+        self,
+        context: Context,
+        upstream_response: ProviderStreamingCompletionResponse,
+        flush_delay_ms: int = 0,
+        flush_bytes: int = 0,
     ):
+        """
+        :param context: The request context
+        :param upstream_response: The streaming response from the provider
+        :param flush_delay_ms: Maximum time to hold events for coalescing them into one send,
+            where 0 sends every event as it arrives
+        :param flush_bytes: Maximum bytes to hold before sending coalesced events
+        """
         super().__init__(self, media_type="text/event-stream")
         self.context = context
         self.upstream_response = upstream_response
         self.upstream_aiter = None
+        self.flush_delay_ms = flush_delay_ms
+        self.flush_bytes = flush_bytes
 
     async def stream_response(self, send) -> None:
-        async with self.upstream_response.stream() as upstream_aiter:
+        async with self.upstream_response.stream_encoded() as upstream_aiter:
+            self.context.timing.set_first_byte_received()
             self.status_code = self.upstream_response.status_code
             self.init_headers(self.upstream_response.headers)
+            if self.flush_delay_ms > 0:
+                upstream_aiter = AsyncStreamCoalescer(
+                    upstream_aiter, self.flush_delay_ms / 1000, self.flush_bytes
+                ).stream()
             self.upstream_aiter = upstream_aiter
             await super().stream_response(send)
+        self.context.timing.end()
 
     def __aiter__(self):
-        return AsyncJSONStreamWriter(self.upstream_aiter).stream()
+        return self.upstream_aiter
 
 
 @asynccontextmanager
@@ -53,26 +82,94 @@ async def lifespan(api: API):
     if not config_file:
         raise RuntimeError("Missing DEMUXAI_CONFIG_FILE environment variable")
     api.app = await App.create(Settings.load(config_file))
+    warmup = None
+    if not api.app.ready:
+        # requests are served while warming up, but readiness waits for it
+        warmup = asyncio.create_task(api.app.warm_up())
     yield
     # on shutdown
+    if warmup is not None:
+        warmup.cancel()
     await api.app.shutdown()
 
 
 api = API(lifespan=lifespan)
 
 
+@api.exception_handler(ProviderUnavailableError)
+async def provider_unavailable(request: Request, exc: ProviderUnavailableError):
+    return Response(
+        codec.dumps({"detail": str(exc)}),
+        status_code=503,
+        media_type="application/json",
+    )
+
+
+@api.exception_handler(ProviderOverloadedError)
+async def provider_overloaded(request: Request, exc: ProviderOverloadedError):
+    return Response(
+        codec.dumps({"detail": str(exc)}),
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        media_type="application/json",
+    )
+
+
+@api.exception_handler(httpx.HTTPError)
+async def upstream_error(request: Request, exc: httpx.HTTPError):
+    """Maps an upstream error, once any retries are exhausted, to the response of the proxy"""
+    error = classify(exc)
+    headers = {}
+    if error == ERROR_CLIENT:
+        # the upstream rejected the request itself, so its status is passed through
+        status_code = exc.response.status_code
+    elif error == ERROR_RATE_LIMITED:
+        status_code = 429
+        if "retry-after" in exc.response.headers:
+            headers["Retry-After"] = exc.response.headers["retry-after"]
+    elif error == ERROR_TIMEOUT:
+        status_code = 504
+    else:
+        status_code = 502
+    return Response(
+        codec.dumps({"detail": str(exc) or error}),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
 async def respond(context: Context, response: ProviderResponse):
     if isinstance(context, StreamingContext) and context.streaming:
         if not isinstance(response, ProviderStreamingCompletionResponse):
             raise HTTPException(status_code=500, detail="Streaming not supported")
-        return StreamingProxyResponse(context, response)
+        return StreamingProxyResponse(
+            context,
+            response,
+            flush_delay_ms=api.app.settings.stream_flush_ms,
+            flush_bytes=api.app.settings.stream_flush_bytes,
+        )
 
     data = {}
+    body = []
     async with response.stream() as response_aiter:
+        context.timing.set_first_byte_received()
         async for _data in response_aiter:
             # should only be one item in the iterator
-            data.update(_data)
-    return Response(json.dumps(data), media_type="application/json")
+            if isinstance(_data, bytes):
+                body.append(_data)
+            else:
+                data.update(_data)
+    context.timing.end()
+
+    if body:
+        # passthrough of the upstream body
+        return Response(
+            b"".join(body),
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "application/json"),
+        )
+    return Response(codec.dumps(data), media_type="application/json")
 
 
 @api.get("/models")
@@ -85,11 +182,29 @@ async def models(request: Request):
         async for model in response_aiter:
             model_data.append(model.to_dict())
     return Response(
-        json.dumps({"object": "list", "data": model_data}),
+        codec.dumps({"object": "list", "data": model_data}),
+        media_type="application/json",
+    )
+
+
+@api.get("/ready")
+async def ready(request: Request):
+    """Whether the proxy is ready for requests, which is once any warm-up has ended"""
+    return Response(
+        codec.dumps({"ready": api.app.ready}),
+        status_code=200 if api.app.ready else 503,
         media_type="application/json",
     )
 
 
+@api.get("/metrics")
+async def metrics(request: Request):
+    return Response(
+        render_metrics(api.app.providers, api.app.composites, codec.offloader),
+        media_type=METRICS_CONTENT_TYPE,
+    )
+
+
 @api.post("/completions")
 @api.post("/v1/completions")
 async def completions(request: Request):
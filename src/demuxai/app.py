@@ -1,6 +1,9 @@
 import asyncio
+import logging
+from typing import Dict
 from typing import List
 
+from demuxai import codec
 from demuxai.context import ChatCompletionContext
 from demuxai.context import CompletionContext
 from demuxai.context import Context
@@ -10,18 +13,39 @@ from demuxai.exceptions import ProviderNotFoundError
 from demuxai.provider import BaseProvider
 from demuxai.provider import ProviderModelsResponse
 from demuxai.providers.composite import BaseCompositeProvider
+from demuxai.providers.composite import CompositeProvider
+from demuxai.providers.composite import CompositeProviderRegistry
 from demuxai.providers.registry import registry as provider_registry
+from demuxai.providers.service import ServiceProvider
 from demuxai.settings.main import Settings
 
 
 DEFAULT_CONFIG = "config.yml"
 
+logger = logging.getLogger("uvicorn")
+
 
 class App(BaseCompositeProvider):
+    __slots__ = ("composites", "routes", "ready")
+
     settings: Settings
 
-    def __init__(self, settings: Settings, providers: List[BaseProvider] = None):
+    def __init__(
+        self,
+        settings: Settings,
+        providers: List[BaseProvider] = None,
+        composites: List[CompositeProvider] = None,
+    ):
         super().__init__(settings, providers)
+        self.composites: List[CompositeProvider] = composites or []
+        # the provider or composite to route to, by the provider ID or the composite's model ID
+        self.routes: Dict[str, BaseProvider] = {
+            provider.id: provider for provider in self.providers
+        }
+        for composite in self.composites:
+            self.routes[composite.id] = composite
+        # whether the app is ready for requests, which is once any warm-up has ended
+        self.ready = not settings.warmup_seconds
 
     @property
     def id(self):
@@ -29,6 +53,8 @@ class App(BaseCompositeProvider):
 
     @classmethod
     async def create(cls, settings: Settings) -> "App":
+        codec.use(settings.json_codec)
+        codec.offload(settings.json_offload_bytes)
         providers = []
 
         for provider_conf in settings.providers:
@@ -36,11 +62,49 @@ class App(BaseCompositeProvider):
             provider = provider_cls(provider_conf)
             providers.append(provider)
 
-        return cls(settings, providers=providers)
+        providers_by_id = {provider.id: provider for provider in providers}
+        composites = []
+        for composite_conf in settings.composites:
+            composite_cls = CompositeProviderRegistry().get(composite_conf.serve_type)
+            composites.append(composite_cls.create(composite_conf, providers_by_id))
+
+        return cls(settings, providers=providers, composites=composites)
+
+    async def warm_up(self):
+        """
+        Warm up every provider in parallel, connecting to its upstream and prefetching its
+        models, until they're all warm or the deadline of `warmup_seconds` passes. A provider
+        which fails to warm up only logs a warning, since its requests may still succeed.
+        """
+        context = Context.for_path("/v1/models")
+        tasks = {
+            asyncio.create_task(provider.warm_up(context)): provider
+            for provider in self.providers
+            if isinstance(provider, ServiceProvider)
+        }
+        try:
+            if tasks:
+                done, pending = await asyncio.wait(
+                    tasks, timeout=self.settings.warmup_seconds
+                )
+                for task in pending:
+                    logger.warning(
+                        f"Warming up provider '{tasks[task].id}' passed the deadline"
+                    )
+                    task.cancel()
+                for task in done:
+                    if task.exception() is not None:
+                        logger.warning(
+                            f"Warming up provider '{tasks[task].id}' failed: "
+                            f"{task.exception()!r}"
+                        )
+        finally:
+            self.ready = True
 
     async def get_models(self, context: Context) -> ProviderModelsResponse:
         results = await asyncio.gather(
-            *[provider.get_models(context) for provider in self.providers]
+            *[provider.get_models(context) for provider in self.providers],
+            *[composite.get_models(context) for composite in self.composites],
         )
         models = []
         for result in results:
@@ -53,10 +117,16 @@ class App(BaseCompositeProvider):
         if context.model is None:
             raise ProviderNotFoundError("No model specified")
 
-        for provider in self.providers:
-            if context.provider_id == provider.id:
-                context.update(model=context.model)
-                return provider
+        # composite models are requested by their ID, without a provider prefix
+        provider = self.routes.get(context.provider_id or context.raw_model)
+        if isinstance(provider, CompositeProvider):
+            return provider
+        if provider is not None:
+            raw_model = context.raw_model
+            context.update(model=context.model)
+            # restored after the update, which would split a model with a slash in it again
+            context.raw_model = raw_model
+            return provider
 
         raise ProviderNotFoundError(f"No provider found for model {context.model}")
 
@@ -77,3 +147,4 @@ class App(BaseCompositeProvider):
 
     async def shutdown(self):
         await asyncio.gather(*[provider.shutdown() for provider in self.providers])
+        codec.offloader.shutdown()
@@ -0,0 +1,269 @@
+# Circuit breakers, which stop routing requests to a provider's model while it's failing. A breaker
+# is closed while requests succeed, and opens (trips) on consecutive failures, on a high error rate,
+# or when its latency is an outlier among the other members of its composite. Once its ejection
+# time has passed, it's half-open, and a limited number of probe requests decide whether it closes
+# again or trips for an exponentially longer time.
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Generic
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+from demuxai.timing import clock
+
+
+T = TypeVar("T")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """
+    The breaker of a single provider and model. Outcomes are kept for the last `window` seconds,
+    and the error rate is only considered once there are at least `minimum_requests` of them.
+    """
+
+    __slots__ = (
+        "failure_threshold",
+        "error_rate",
+        "minimum_requests",
+        "window",
+        "ejection_time",
+        "max_ejection_time",
+        "probes",
+        "state",
+        "trips",
+        "open_until",
+        "_consecutive_failures",
+        "_outcomes",
+        "_failures",
+        "_latency_sum",
+        "_latency_count",
+        "_probes_in_flight",
+        "_probe_successes",
+    )
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        minimum_requests: int = 10,
+        window: float = 60.0,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        probes: int = 1,
+    ):
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.minimum_requests = minimum_requests
+        self.window = window
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.probes = probes
+        self.state = STATE_CLOSED
+        # the number of times the breaker tripped since it was last closed
+        self.trips = 0
+        self.open_until = 0.0
+        self._consecutive_failures = 0
+        # the time of each outcome, whether it failed, and its latency
+        self._outcomes: Deque[Tuple[float, bool, Optional[float]]] = deque()
+        self._failures = 0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            _, failed, latency = self._outcomes.popleft()
+            self._failures -= failed
+            if latency is not None:
+                self._latency_sum -= latency
+                self._latency_count -= 1
+
+    def _reset(self):
+        self._consecutive_failures = 0
+        self._outcomes.clear()
+        self._failures = 0
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _update_state(self, now: float):
+        if self.state == STATE_OPEN and now >= self.open_until:
+            self.state = STATE_HALF_OPEN
+
+    def allows(self, now: Optional[float] = None) -> bool:
+        """Whether a request may be routed through the breaker"""
+        now = clock() if now is None else now
+        self._update_state(now)
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_HALF_OPEN:
+            return self._probes_in_flight < self.probes
+        return False
+
+    def acquire(self, now: Optional[float] = None):
+        """Mark that a request was routed through the breaker, as a probe while half-open"""
+        now = clock() if now is None else now
+        self._update_state(now)
+        if self.state == STATE_HALF_OPEN:
+            self._probes_in_flight += 1
+
+    def release(self):
+        """Mark that a request routed through the breaker ended without an outcome"""
+        if self.state == STATE_HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def trip(self, now: Optional[float] = None):
+        """Open the breaker, for twice as long as the last time it tripped"""
+        now = clock() if now is None else now
+        ejection_time = min(self.ejection_time * 2**self.trips, self.max_ejection_time)
+        self.trips += 1
+        self.state = STATE_OPEN
+        self.open_until = now + ejection_time
+        self._reset()
+
+    def close(self):
+        self.state = STATE_CLOSED
+        self.trips = 0
+        self._reset()
+
+    def record(
+        self, failed: bool, latency: Optional[float] = None, now: Optional[float] = None
+    ):
+        """
+        Record the outcome of a request routed through the breaker
+        :param failed: Whether the request failed
+        :param latency: The request's time to first byte, if known
+        :param now: The time of the outcome
+        """
+        now = clock() if now is None else now
+        self._update_state(now)
+        if self.state == STATE_OPEN:
+            # a request routed before the breaker tripped
+            return
+
+        if self.state == STATE_HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            if failed:
+                self.trip(now)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.probes:
+                self.close()
+            return
+
+        self._expire(now)
+        self._outcomes.append((now, failed, latency))
+        self._failures += failed
+        if latency is not None:
+            self._latency_sum += latency
+            self._latency_count += 1
+
+        if not failed:
+            self._consecutive_failures = 0
+            return
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold:
+            self.trip(now)
+        elif (
+            len(self._outcomes) >= self.minimum_requests
+            and self._failures / len(self._outcomes) >= self.error_rate
+        ):
+            self.trip(now)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """The mean latency within the window, or None with fewer than `minimum_requests`"""
+        if self._latency_count < max(self.minimum_requests, 1):
+            return None
+        return self._latency_sum / self._latency_count
+
+
+class CircuitBreakers(Generic[T]):
+    """
+    The breakers of the members of a composite, which also ejects a member as an outlier when its
+    mean latency is more than `latency_factor` times the median of the other members. A member is
+    never ejected as an outlier if that would leave no closed breaker.
+    """
+
+    __slots__ = ("options", "latency_factor", "_breakers")
+
+    def __init__(self, latency_factor: Optional[float] = 3.0, **options):
+        """
+        :param latency_factor: The multiple of the median latency of the other members, beyond
+            which a member is ejected, where None disables outlier ejection
+        :param options: The options for each `CircuitBreaker`
+        """
+        self.options = options
+        self.latency_factor = latency_factor
+        self._breakers: Dict[T, CircuitBreaker] = {}
+
+    def get(self, thing: T) -> CircuitBreaker:
+        breaker = self._breakers.get(thing)
+        if breaker is None:
+            breaker = self._breakers[thing] = CircuitBreaker(**self.options)
+        return breaker
+
+    def state(self, thing: T, now: Optional[float] = None) -> str:
+        breaker = self.get(thing)
+        breaker._update_state(clock() if now is None else now)
+        return breaker.state
+
+    def available(self, things: List[T], now: Optional[float] = None) -> List[T]:
+        """The things whose breakers allow a request"""
+        now = clock() if now is None else now
+        return [thing for thing in things if self.get(thing).allows(now)]
+
+    def acquire(self, thing: T, now: Optional[float] = None):
+        self.get(thing).acquire(now)
+
+    def release(self, thing: T):
+        self.get(thing).release()
+
+    def record(
+        self,
+        thing: T,
+        failed: bool,
+        latency: Optional[float] = None,
+        now: Optional[float] = None,
+    ):
+        """
+        Record the outcome of a request routed to the thing, then eject any latency outlier
+        :param thing: The thing the request was routed to
+        :param failed: Whether the request failed
+        :param latency: The request's time to first byte, if known
+        :param now: The time of the outcome
+        """
+        now = clock() if now is None else now
+        self.get(thing).record(failed, latency, now=now)
+        if self.latency_factor is not None and latency is not None:
+            self._eject_outliers(now)
+
+    def _eject_outliers(self, now: float):
+        latencies = {
+            thing: breaker.latency
+            for thing, breaker in self._breakers.items()
+            if breaker.state == STATE_CLOSED and breaker.latency is not None
+        }
+        if len(latencies) < 2:
+            return
+        closed = sum(
+            1 for breaker in self._breakers.values() if breaker.state == STATE_CLOSED
+        )
+        for thing, latency in latencies.items():
+            others = sorted(
+                value for other, value in latencies.items() if other != thing
+            )
+            median = others[len(others) // 2]
+            if closed > 1 and latency > self.latency_factor * median:
+                self._breakers[thing].trip(now)
+                closed -= 1
@@ -0,0 +1,27 @@
+class RetryBudget(object):
+    """
+    A token bucket which caps the extra requests sent on behalf of others, such as retries and
+    hedged requests, at `percent` of the requests. Each request deposits a fraction of a token,
+    and each extra request withdraws a whole one. The bucket starts full, and holds at most
+    `max_tokens`, which bounds a burst of extra requests.
+    """
+
+    __slots__ = ("ratio", "max_tokens", "tokens")
+
+    def __init__(self, percent: float = 10.0, max_tokens: float = 10.0):
+        self.ratio = percent / 100
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        """Credit the budget for a request"""
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self) -> bool:
+        """
+        :return: Whether the budget allows an extra request, which is then debited
+        """
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
@@ -0,0 +1,232 @@
+# The JSON codec used throughout the proxy. A faster optional backend (orjson or msgspec) is used
+# when installed, falling back to the standard library otherwise. Every backend encodes directly
+# to bytes, which is what gets written downstream.
+#
+# Every backend holds the GIL while it works, so a large body stalls the event loop even from a
+# worker thread. Work on large bodies, like rewriting a response or decoding a request, is instead
+# offloaded to worker processes, where only the bytes cross over, along with the decoded value when
+# the work decodes, which is cheaper to unpickle than the JSON is to decode.
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import Type
+from typing import Union
+
+from demuxai.exceptions import CodecUnavailableError
+from demuxai.registry import Registry
+from demuxai.timing import clock
+from demuxai.timing import QuantileSketch
+
+
+AUTO_CODEC = "auto"
+DEFAULT_OFFLOAD_BYTES = 1048576
+DEFAULT_OFFLOAD_WORKERS = 2
+
+JSONInput = Union[str, bytes, bytearray, memoryview]
+
+# reused, since `json.dumps` builds a new encoder per call when given any options
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+class JSONCodec(object):
+    """Encodes and decodes JSON using the standard library"""
+
+    __slots__ = ()
+
+    name = "json"
+    # the module that must be installed to use the codec
+    module: Optional[str] = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return cls.module is None or find_spec(cls.module) is not None
+
+    def loads(self, data: JSONInput) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return _json_encoder.encode(obj).encode("utf-8")
+
+
+class OrjsonCodec(JSONCodec):
+    """Encodes and decodes JSON using orjson"""
+
+    __slots__ = ("loads", "dumps")
+
+    name = "orjson"
+    module = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self.loads = orjson.loads
+        self.dumps = orjson.dumps
+
+
+class MsgspecCodec(JSONCodec):
+    """Encodes and decodes JSON using msgspec"""
+
+    __slots__ = ("loads", "dumps")
+
+    name = "msgspec"
+    module = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self.loads = msgspec.json.Decoder().decode
+        self.dumps = msgspec.json.Encoder().encode
+
+
+class CodecRegistry(Registry[Type[JSONCodec]]):
+    def get_codec(self, name: str = AUTO_CODEC) -> JSONCodec:
+        """
+        Instantiate a codec by name
+        :param name: The name of the codec, or 'auto' for the fastest one installed
+        :return: The codec
+        """
+        if name == AUTO_CODEC:
+            for codec_class in self:
+                if codec_class.is_available():
+                    return codec_class()
+
+        codec_class = self.get(name)
+        if not codec_class.is_available():
+            raise CodecUnavailableError(
+                f"The '{name}' JSON codec requires the '{codec_class.module}' package"
+            )
+        return codec_class()
+
+
+# registered in order of preference
+registry = CodecRegistry()
+registry.add(OrjsonCodec.name, OrjsonCodec)
+registry.add(MsgspecCodec.name, MsgspecCodec)
+registry.add(JSONCodec.name, JSONCodec)
+
+current: JSONCodec = registry.get_codec()
+# bound directly to the current codec, so a call costs a single module attribute lookup
+loads = current.loads
+dumps = current.dumps
+
+
+def use(name: str = AUTO_CODEC) -> JSONCodec:
+    """
+    Switch the codec used by the proxy
+    :param name: The name of the codec, or 'auto' for the fastest one installed
+    :return: The codec now in use
+    """
+    global current, loads, dumps
+    current = registry.get_codec(name)
+    loads = current.loads
+    dumps = current.dumps
+    return current
+
+
+def decode(body: bytes) -> Any:
+    """
+    Decode a body with the current codec, which, unlike the bound `loads`, the offloader can send
+    to a worker process
+    """
+    return loads(body)
+
+
+def _call_with_codec(name: str, function: Callable[..., Any], *args) -> Any:
+    # runs in a worker process, which starts out with the default codec
+    if current.name != name:
+        use(name)
+    return function(*args)
+
+
+class Offloader(object):
+    """
+    Runs work on large bodies in worker processes, so it doesn't stall every other request on the
+    event loop, while smaller bodies are handled inline, where a worker would cost more than it
+    saves. The time inline work blocks the event loop is recorded, to tune the threshold by.
+    """
+
+    __slots__ = ("threshold", "workers", "blocking", "offloaded", "_executor")
+
+    def __init__(
+        self,
+        threshold: Optional[int] = DEFAULT_OFFLOAD_BYTES,
+        workers: int = DEFAULT_OFFLOAD_WORKERS,
+    ):
+        """
+        :param threshold: The size in bytes from which bodies are offloaded, where 0 or None keeps
+            them all inline
+        :param workers: The most worker processes, which are started as they're needed
+        """
+        self.threshold = threshold
+        self.workers = workers
+        # the seconds each body handled inline blocked the event loop
+        self.blocking = QuantileSketch()
+        # the number of bodies handled by a worker
+        self.offloaded = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawned, since forking a process with a running event loop isn't safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, function: Callable[..., Any], body: bytes, *args) -> Any:
+        """
+        Run a function of a body, in a worker process when the body is large
+        :param function: A module level function, which is given the body and the arguments
+        :param body: The body
+        :param args: Any other arguments of the function
+        :return: The result of the function
+        """
+        if self.threshold and len(body) >= self.threshold:
+            self.offloaded += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, _call_with_codec, current.name, function, body, *args
+            )
+        return self.call(function, body, *args)
+
+    def call(self, function: Callable[..., Any], body: bytes, *args) -> Any:
+        """
+        Run a function of a body inline, recording how long it blocks the event loop, for work
+        which can't wait on a worker
+        :param function: The function, which is given the body and the arguments
+        :param body: The body
+        :param args: Any other arguments of the function
+        :return: The result of the function
+        """
+        start = clock()
+        try:
+            return function(body, *args)
+        finally:
+            self.blocking.add(clock() - start)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+offloader = Offloader()
+
+
+def offload(threshold: Optional[int] = DEFAULT_OFFLOAD_BYTES) -> Offloader:
+    """
+    Set the size of the bodies which are offloaded to worker processes
+    :param threshold: The size in bytes, where 0 or None keeps all bodies inline
+    :return: The offloader
+    """
+    offloader.threshold = threshold
+    return offloader
@@ -1,8 +1,16 @@
+import copy
+from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Union
 
+from demuxai import codec
 from demuxai.timing import Timing
+from demuxai.utils import json_members
+from demuxai.utils import JSONMembers
+from demuxai.utils import set_json_members
 from fastapi import Request
 from starlette.datastructures import Headers
 from starlette.datastructures import QueryParams
@@ -10,6 +18,13 @@ from starlette.datastructures import QueryParams
 
 TOKEN_PREFIX = "[PREFIX]"
 TOKEN_SUFFIX = "[SUFFIX]"
+# indexing the raw body scans it in Python, which only beats decoding it when the body is mostly
+# long strings, like embedded images, or when the members needed are at either end of the body, so
+# the scan is limited to a step for this many bytes, though never to fewer than the least steps
+INDEX_BYTES_PER_STEP = 16384
+INDEX_MIN_STEPS = 64
+
+ModelParts = Tuple[Optional[str], Optional[str], Optional[str]]
 
 
 class Usage(object):
@@ -48,13 +63,33 @@ class Usage(object):
 
 
 class Context(object):
-    __slots__ = ("raw_request", "usage", "timing", "url_path")
+    __slots__ = (
+        "raw_request",
+        "raw_body",
+        "usage",
+        "timing",
+        "url_path",
+        "_payload",
+        "_updated",
+        "_members",
+        "_values",
+    )
 
     def __init__(self, raw_request: Request):
         self.raw_request = raw_request
+        # the body as the client sent it, which is forwarded unless the payload is updated
+        self.raw_body: Optional[bytes] = None
         self.usage = Usage()
         self.timing = Timing()
         self.url_path = raw_request.url.path
+        self._payload: Optional[dict] = None
+        # the top-level members of the payload which were updated
+        self._updated: Dict[str, Any] = {}
+        # the positions of the top-level members in the raw body once indexed, or False when it
+        # can't be indexed
+        self._members: Union[None, bool, JSONMembers] = None
+        # the members decoded from the raw body so far
+        self._values: Dict[str, Any] = {}
 
     @property
     def headers(self) -> Headers:
@@ -64,81 +99,232 @@ class Context(object):
     def query_params(self) -> QueryParams:
         return self.raw_request.query_params
 
+    def _decode(self) -> dict:
+        """The payload as the client sent it"""
+        if self.raw_body is None:
+            return getattr(self.raw_request, "_json", {})
+        return codec.offloader.call(codec.decode, self.raw_body)
+
     @property
     def payload(self) -> dict:
-        return getattr(self.raw_request, "_json", {})
+        """
+        The decoded payload, with any updates. Decoding is deferred until something needs more
+        than the members read with `get`, unless the raw body can't be indexed cheaply.
+        """
+        if self._payload is None:
+            self._payload = dict(self._decode())
+            self._payload.update(self._updated)
+        return self._payload
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        A top-level member of the payload. Until the payload is decoded, only the member's value
+        is decoded from the raw body, once, so routing a request doesn't decode a long
+        conversation.
+        :param key: The key of the member
+        :param default: The value when the member is missing
+        """
+        if self._payload is not None:
+            return self._payload.get(key, default)
+        if key in self._updated:
+            return self._updated[key]
+        if self.raw_body is None:
+            return self._decode().get(key, default)
+        if key in self._values:
+            return self._values[key]
+
+        members = self._index()
+        if members is None or not members.settles(key):
+            # not an object, not valid, or the member could be among those left unscanned, which
+            # decoding settles
+            return self.payload.get(key, default)
+        span = members.get(key)
+        if span is None:
+            return default
+        start, end = span
+        value = self._values[key] = codec.loads(self.raw_body[start:end])
+        return value
+
+    def _index(self) -> Optional[JSONMembers]:
+        """The positions of the top-level members in the raw body, or None if it can't be indexed"""
+        if self._members is None:
+            limit = max(INDEX_MIN_STEPS, len(self.raw_body) // INDEX_BYTES_PER_STEP)
+            members = json_members(self.raw_body, limit)
+            self._members = False if members is None else members
+        return None if self._members is False else self._members
+
+    def copy(self) -> "Context":
+        """
+        A copy of the context with its own payload, which can be updated independently, so the
+        request can be sent to more than one provider
+        """
+        context = copy.copy(self)
+        if self._payload is not None:
+            context._payload = dict(self._payload)
+        context._updated = dict(self._updated)
+        context._values = dict(self._values)
+        return context
 
     def update(self, **kwargs):
         """
         Update the context with new values.
         :param kwargs: Key value pairs to update the context with.
         """
-        self.payload.update(**kwargs)
+        self._updated.update(kwargs)
+        if self._payload is not None:
+            self._payload.update(kwargs)
+
+    def encode(self) -> bytes:
+        """
+        Encodes the payload to send upstream. The body of the client is forwarded as it is, with
+        only the updated members spliced in, so a long conversation isn't encoded all over again.
+        """
+        if self.raw_body is None:
+            return codec.dumps(self.payload)
+        if not self._updated:
+            return self.raw_body
+        members = self._index()
+        if members is not None:
+            values = {key: codec.dumps(value) for key, value in self._updated.items()}
+            body = set_json_members(self.raw_body, values, members)
+            if body is not None:
+                return body
+        return codec.dumps(self.payload)
+
+    @classmethod
+    def for_path(cls, url_path: str) -> "Context":
+        """A context for a request the proxy makes of its own accord, like warming up"""
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": url_path,
+            "query_string": b"",
+            "headers": [],
+        }
+        return cls(Request(scope))
 
     @classmethod
     async def from_request(cls, raw_request: Request):
-        # preload the body, which gets cached on the request object
+        timing = Timing()
+        timing.start()
+        # preload the body, which gets cached on the request object, and is only decoded as
+        # far as it's needed
+        raw_body = None
         if raw_request.method == "POST":
-            await raw_request.json()
-        return cls(raw_request)
+            raw_body = await raw_request.body()
+        context = cls(raw_request)
+        context.raw_body = raw_body
+        context.timing = timing
+        await context.load()
+        return context
+
+    async def load(self):
+        """
+        Decodes a raw body ahead of reading it when it can't be indexed, since reading any member
+        decodes it anyway, or when it's large enough to offload and the index leaves a gap, so
+        decoding it doesn't stall the event loop should a member in the gap be read
+        """
+        if self.raw_body is None or self._payload is not None:
+            return
+        members = self._index()
+        threshold = codec.offloader.threshold
+        if members is not None and (
+            members.gap is None or not threshold or len(self.raw_body) < threshold
+        ):
+            return
+        try:
+            payload = await codec.offloader.run(codec.decode, self.raw_body)
+        except ValueError:
+            # not valid, which reading the payload reports
+            return
+        if isinstance(payload, dict):
+            self._payload = dict(payload)
+            self._payload.update(self._updated)
 
 
 class ModelContext(Context):
-    __slots__ = ("raw_model",)
+    __slots__ = ("_model_parts",)
 
     def __init__(self, raw_request: Request):
         super().__init__(raw_request)
-        self.raw_model = self.payload.get("model", None)
+        # the raw model, with its provider ID and model split out, once read
+        self._model_parts: Optional[ModelParts] = None
+
+    def _split_model(self, raw_model: Optional[str]):
+        if raw_model and "/" in raw_model:
+            provider_id, model = raw_model.split("/", 1)
+            self._model_parts = (raw_model, provider_id, model)
+        else:
+            self._model_parts = (raw_model, None, raw_model)
+
+    @property
+    def _parts(self) -> ModelParts:
+        if self._model_parts is None:
+            self._split_model(self.get("model", None))
+        return self._model_parts
+
+    @property
+    def raw_model(self) -> Optional[str]:
+        return self._parts[0]
+
+    @raw_model.setter
+    def raw_model(self, raw_model: Optional[str]):
+        self._split_model(raw_model)
 
     @property
     def model(self) -> Optional[str]:
-        if self.raw_model and "/" in self.raw_model:
-            return self.raw_model.split("/", 1)[1]
-        return self.raw_model
+        return self._parts[2]
 
     @property
     def provider_id(self) -> Optional[str]:
-        if self.raw_model and "/" in self.raw_model:
-            return self.raw_model.split("/", 1)[0]
-        return None
+        return self._parts[1]
+
+    @property
+    def remote_model(self) -> Optional[str]:
+        """
+        The model as it's sent upstream, once routed to a provider, which unlike `model` isn't
+        split again when the provider's own model ID contains a slash
+        """
+        return self.get("model", None)
 
     def update(self, **kwargs):
         """
         Update the context with new values.
         :param kwargs: Key value pairs to update the context with.
         """
+        provider_id = self.provider_id
         super().update(**kwargs)
         model = kwargs.get("model", None)
         if model and "/" in model:
             self.raw_model = model
         elif model:
-            self.raw_model = f"{self.provider_id}/{model}"
+            self.raw_model = f"{provider_id}/{model}"
 
 
 class ModelGenerationContext(ModelContext):
     @property
     def temperature(self) -> Optional[float]:
-        return self.payload.get("temperature", None)
+        return self.get("temperature", None)
 
     @property
     def stop_tokens(self) -> List[str]:
-        return self.payload.get("stop", [])
+        return self.get("stop", [])
 
 
 class StreamingContext(Context):
     @property
     def streaming(self) -> bool:
-        return self.payload.get("stream", False)
+        return self.get("stream", False)
 
 
 class CompletionContext(StreamingContext, ModelGenerationContext):
     @property
     def suffix(self) -> Optional[str]:
-        return self.payload.get("suffix", None)
+        return self.get("suffix", None)
 
     @property
     def prompt(self) -> str:
-        return self.payload.get("prompt", "")
+        return self.get("prompt", "")
 
     @property
     def is_fim(self) -> bool:
@@ -153,7 +339,7 @@ class CompletionContext(StreamingContext, ModelGenerationContext):
 class ChatCompletionContext(StreamingContext, ModelGenerationContext):
     @property
     def messages(self) -> List[dict]:
-        return self.payload.get("messages", [])
+        return self.get("messages", [])
 
 
 AnyCompletionContext = Union[CompletionContext, ChatCompletionContext]
@@ -162,4 +348,4 @@ AnyCompletionContext = Union[CompletionContext, ChatCompletionContext]
 class EmbeddingContext(ModelContext):
     @property
     def input(self) -> Union[str, List[str]]:
-        return self.payload.get("input", "")
+        return self.get("input", "")
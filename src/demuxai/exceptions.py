@@ -12,3 +12,17 @@ class ProviderNotFoundError(Exception):
 
 class ProviderConfigurationError(Exception):
     pass
+
+
+class ProviderUnavailableError(Exception):
+    pass
+
+
+class ProviderOverloadedError(Exception):
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CodecUnavailableError(Exception):
+    pass
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Awaitable
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import TypeVar
+
+from demuxai.retry import classify
+from demuxai.retry import RETRYABLE_ERRORS
+
+T = TypeVar("T")
+# the message the losers of a hedge are cancelled with, once another awaitable won, which tells
+# their cancellation apart from that of the caller
+LOST = "Lost the hedge to another awaitable"
+
+
+def _retryable(exc: Optional[BaseException]) -> bool:
+    return exc is not None and classify(exc) in RETRYABLE_ERRORS
+
+
+def lost(exc: Optional[BaseException]) -> bool:
+    """Whether an error is the cancellation of an awaitable which lost a hedge"""
+    return isinstance(exc, asyncio.CancelledError) and LOST in exc.args
+
+
+async def hedge(
+    primary: Awaitable[T],
+    secondary: Callable[[], Optional[Awaitable[T]]],
+    delay: float,
+    discard: Callable[[T], Awaitable[None]],
+) -> T:
+    """
+    Await the primary, and should it not succeed within `delay` seconds, race it against the
+    secondary, so the first to succeed wins and the other is cancelled, with the `LOST` message.
+    Should neither win, like when the caller is cancelled, any awaitable left is cancelled without
+    it. The secondary isn't started when the primary failed with an error which retrying wouldn't
+    avoid, like a bad request, which is raised right away.
+    :param primary: The awaitable started first
+    :param secondary: Starts the awaitable raced against the primary, or returns None when it
+        shouldn't be started after all
+    :param delay: Seconds to wait on the primary before starting the secondary
+    :param discard: Releases the result of the loser, should both succeed at once
+    :return: The result of the winner
+    """
+    tasks: List[asyncio.Future] = [asyncio.ensure_future(primary)]
+    winner = None
+    try:
+        await asyncio.wait(tasks, timeout=delay)
+        if not tasks[0].done() or _retryable(tasks[0].exception()):
+            awaitable = secondary()
+            if awaitable is not None:
+                tasks.append(asyncio.ensure_future(awaitable))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in tasks:
+                if task in done and task.exception() is None:
+                    winner = task
+                    return task.result()
+            if tasks[0] in done and not _retryable(tasks[0].exception()):
+                raise tasks[0].exception()
+        # neither succeeded, so the primary's error is the one raised
+        raise tasks[0].exception()
+    finally:
+        losers = [task for task in tasks if task is not winner]
+        for task in losers:
+            task.cancel(None if winner is None else LOST)
+        for result in await asyncio.gather(*losers, return_exceptions=True):
+            if not isinstance(result, BaseException):
+                await discard(result)
@@ -0,0 +1,258 @@
+# Adaptive limits on the concurrent requests to an upstream provider. The limit grows additively
+# while requests succeed promptly, and shrinks multiplicatively (AIMD) when the upstream signals
+# overload, by rate limiting, failing or timing out, or when its time to first byte rises well above
+# its baseline. Requests beyond the limit wait in a bounded queue, which sheds them once it's full,
+# or CoDel-style, once the queue has been standing for a while, so clients get a fast response
+# instead of hanging until the connection pool times out.
+import asyncio
+import math
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from demuxai.exceptions import ProviderOverloadedError
+from demuxai.retry import classify
+from demuxai.retry import ERROR_RATE_LIMITED
+from demuxai.retry import ERROR_SERVER
+from demuxai.retry import ERROR_TIMEOUT
+from demuxai.timing import clock
+
+
+# the classes of upstream errors which signal overload
+OVERLOAD_ERRORS = (ERROR_RATE_LIMITED, ERROR_SERVER, ERROR_TIMEOUT)
+
+
+class Unlimited(object):
+    """Stands in for a limiter, where concurrency isn't limited"""
+
+    __slots__ = ()
+
+    async def acquire(self):
+        pass
+
+    def release(self):
+        pass
+
+    def record(
+        self, latency: Optional[float] = None, exc: Optional[BaseException] = None
+    ):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+UNLIMITED = Unlimited()
+
+
+class ConcurrencyLimiter(Unlimited):
+    """
+    The limiter of a single provider, or model of one. A waiting request is shed when its time in
+    the queue exceeds `queue_target`, once the queue hasn't drained below it for `queue_interval`,
+    and in any case once it has waited `max_queue_time`.
+    """
+
+    __slots__ = (
+        "limit",
+        "min_limit",
+        "max_limit",
+        "backoff",
+        "tolerance",
+        "smoothing",
+        "queue_size",
+        "queue_target",
+        "queue_interval",
+        "max_queue_time",
+        "in_flight",
+        "shed",
+        "baseline",
+        "_queue",
+        "_first_above",
+    )
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        backoff: float = 0.9,
+        tolerance: float = 2.0,
+        smoothing: float = 0.05,
+        queue_size: int = 64,
+        queue_target: float = 0.5,
+        queue_interval: float = 2.0,
+        max_queue_time: float = 30.0,
+    ):
+        """
+        :param initial_limit: The concurrency limit to start from
+        :param min_limit: The lowest the limit shrinks to
+        :param max_limit: The highest the limit grows to
+        :param backoff: The factor by which the limit shrinks on overload
+        :param tolerance: The multiple of the baseline time to first byte, beyond which a request
+            signals overload
+        :param smoothing: The weight of each request in the baseline time to first byte
+        :param queue_size: The most requests waiting for the limit
+        :param queue_target: The acceptable time in the queue, in seconds
+        :param queue_interval: How long the queue may stand above its target, in seconds
+        :param max_queue_time: The longest a request waits in the queue, in seconds
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.queue_size = queue_size
+        self.queue_target = queue_target
+        self.queue_interval = queue_interval
+        self.max_queue_time = max_queue_time
+        self.in_flight = 0
+        # the number of requests shed
+        self.shed = 0
+        # the smoothed time to first byte
+        self.baseline: Optional[float] = None
+        self._queue: Deque[Tuple[float, asyncio.Future]] = deque()
+        # when the queue would have stood above its target for the interval
+        self._first_above: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def _available(self) -> bool:
+        return self.in_flight < max(int(self.limit), 1)
+
+    def _overloaded(self, reason: str) -> ProviderOverloadedError:
+        self.shed += 1
+        # roughly the time for a request in flight to complete
+        retry_after = max(math.ceil(self.baseline or 1), 1)
+        return ProviderOverloadedError(
+            f"Upstream is overloaded, {reason}", retry_after=retry_after
+        )
+
+    def _should_shed(self, sojourn: float, now: float) -> bool:
+        if sojourn < self.queue_target:
+            self._first_above = None
+            return False
+        if self._first_above is None:
+            self._first_above = now + self.queue_interval
+            return False
+        return now >= self._first_above
+
+    def _dispatch(self):
+        """Grant the limit to waiting requests, shedding those which waited too long"""
+        now = clock()
+        while self._queue and self._available:
+            enqueued, future = self._queue.popleft()
+            if future.done():
+                continue
+            if self._should_shed(now - enqueued, now):
+                future.set_exception(self._overloaded("request waited too long"))
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+        if not self._queue:
+            self._first_above = None
+
+    async def acquire(self):
+        """
+        Wait until the request is within the limit
+        :raises ProviderOverloadedError: When the request is shed
+        """
+        if self._available and not self._queue:
+            self.in_flight += 1
+            return
+        if len(self._queue) >= self.queue_size:
+            raise self._overloaded("too many requests are waiting")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (clock(), future)
+        self._queue.append(entry)
+        try:
+            await asyncio.wait_for(future, self.max_queue_time)
+        except BaseException as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # granted just as the wait ended
+                self.release()
+            elif entry in self._queue:
+                self._queue.remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._overloaded("request waited too long") from None
+            raise
+
+    def release(self):
+        """Mark that a request within the limit has ended"""
+        self.in_flight = max(self.in_flight - 1, 0)
+        self._dispatch()
+
+    def _decrease(self):
+        self.limit = max(self.limit * self.backoff, self.min_limit)
+
+    def _increase(self):
+        # only grow while the limit is in use, otherwise it says nothing about the upstream
+        if self.in_flight >= self.limit / 2:
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            self._dispatch()
+
+    def record(
+        self, latency: Optional[float] = None, exc: Optional[BaseException] = None
+    ):
+        """
+        Adapt the limit to the outcome of a request
+        :param latency: The request's time to first byte, if it succeeded
+        :param exc: The error of the request, if it failed
+        """
+        if exc is not None:
+            if classify(exc) in OVERLOAD_ERRORS:
+                self._decrease()
+            return
+        if latency is None:
+            return
+        if self.baseline is not None and latency > self.tolerance * self.baseline:
+            self._decrease()
+        else:
+            self._increase()
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            self.baseline += self.smoothing * (latency - self.baseline)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None:
+            self.record(exc=exc_val)
+        self.release()
+
+
+class ConcurrencyLimiters(object):
+    """The limiters of a provider, of which there's one for each model with `per_model`"""
+
+    __slots__ = ("options", "per_model", "_limiters")
+
+    def __init__(self, per_model: bool = False, **options):
+        """
+        :param per_model: Whether each model is limited separately
+        :param options: The options for each `ConcurrencyLimiter`
+        """
+        self.options = options
+        self.per_model = per_model
+        self._limiters: Dict[Optional[str], ConcurrencyLimiter] = {}
+
+    def get(self, model: Optional[str] = None) -> ConcurrencyLimiter:
+        key = model if self.per_model else None
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = ConcurrencyLimiter(**self.options)
+        return limiter
+
+    def items(self):
+        return self._limiters.items()
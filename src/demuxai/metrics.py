@@ -0,0 +1,191 @@
+# Renders the latency sketches of each provider in the Prometheus text exposition format
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from demuxai.codec import Offloader
+from demuxai.providers.composite import CompositeProvider
+from demuxai.providers.service import ServiceProvider
+from demuxai.timing import MEASURES
+from demuxai.timing import QUANTILES
+from demuxai.timing import TimingSketches
+
+
+METRIC_PREFIX = "demuxai"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Optional[str]) -> str:
+    value = value or ""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_summary(
+    lines: List[str], name: str, labels: str, sketches: TimingSketches, measure: str
+):
+    sketch = sketches.sketch(measure)
+    if not sketch.count:
+        return
+    for q in QUANTILES:
+        lines.append(f'{name}{{{labels},quantile="{q}"}} {sketch.quantile(q):.6f}')
+    lines.append(f"{name}_sum{{{labels}}} {sketch.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {sketch.count}")
+
+
+def _render_hedges(lines: List[str], composites: List[CompositeProvider]):
+    counters = (
+        ("hedge_requests", "requests", "Requests eligible for hedging or racing"),
+        ("hedged", "hedged", "Requests also sent to a second member"),
+        ("hedge_wins", "won", "Hedged requests won by the second member"),
+    )
+    for metric, attribute, description in counters:
+        name = f"{METRIC_PREFIX}_composite_{metric}_total"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        for composite in composites:
+            value = getattr(composite.hedges, attribute)
+            lines.append(f'{name}{{composite="{_escape(composite.id)}"}} {value}')
+
+
+def _render_limiters(lines: List[str], providers: List[ServiceProvider]):
+    series = (
+        ("concurrency_limit", "limit", "gauge", "The adaptive concurrency limit"),
+        ("concurrency_in_flight", "in_flight", "gauge", "Requests within the limit"),
+        ("concurrency_queued", "queued", "gauge", "Requests waiting for the limit"),
+        ("concurrency_shed_total", "shed", "counter", "Requests shed by the limiter"),
+    )
+    limiters = [
+        (provider, model, limiter)
+        for provider in providers
+        if getattr(provider, "limiters", None) is not None
+        for model, limiter in provider.limiters.items()
+    ]
+    if not limiters:
+        return
+    for metric, attribute, metric_type, description in series:
+        name = f"{METRIC_PREFIX}_{metric}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for provider, model, limiter in limiters:
+            labels = f'provider="{_escape(provider.id)}"'
+            if model is not None:
+                labels = f'{labels},model="{_escape(model)}"'
+            lines.append(f"{name}{{{labels}}} {getattr(limiter, attribute):g}")
+
+
+def _render_rate_limits(lines: List[str], providers: List[ServiceProvider]):
+    series = (
+        ("ratelimit_remaining", "remaining", "What remains of an upstream rate limit"),
+        ("ratelimit_limit", "limit", "An upstream rate limit"),
+    )
+    windows = [
+        (provider, key, window)
+        for provider in providers
+        if getattr(provider, "rate_limits", None) is not None
+        for key, rate_limit in provider.rate_limits.items()
+        for window in rate_limit.windows.values()
+    ]
+    if not windows:
+        return
+    for metric, attribute, description in series:
+        name = f"{METRIC_PREFIX}_{metric}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for provider, key, window in windows:
+            value = getattr(window, attribute)
+            if value is None:
+                continue
+            labels = f'provider="{_escape(provider.id)}"'
+            if key is not None:
+                labels = f'{labels},key="{_escape(key)}"'
+            labels = f'{labels},limit="{_escape(window.name)}"'
+            lines.append(f"{name}{{{labels}}} {value}")
+
+
+def _render_pools(lines: List[str], providers: List[ServiceProvider]):
+    pools = [
+        (provider, provider.pool)
+        for provider in providers
+        if getattr(provider, "pool", None) is not None
+    ]
+    if not pools:
+        return
+    name = f"{METRIC_PREFIX}_pool_connections"
+    lines.append(f"# HELP {name} Connections of the pool, in use or idle")
+    lines.append(f"# TYPE {name} gauge")
+    for provider, pool in pools:
+        label = f'provider="{_escape(provider.id)}"'
+        lines.append(f'{name}{{{label},state="in_use"}} {pool.in_use}')
+        lines.append(f'{name}{{{label},state="idle"}} {pool.idle}')
+
+    name = f"{METRIC_PREFIX}_pool_waiting"
+    lines.append(f"# HELP {name} Requests waiting for a connection")
+    lines.append(f"# TYPE {name} gauge")
+    for provider, pool in pools:
+        lines.append(f'{name}{{provider="{_escape(provider.id)}"}} {pool.waiting}')
+
+    name = f"{METRIC_PREFIX}_pool_wait_seconds"
+    lines.append(f"# HELP {name} Time requests waited for a connection")
+    lines.append(f"# TYPE {name} summary")
+    for provider, pool in pools:
+        label = f'provider="{_escape(provider.id)}"'
+        if pool.waits.count:
+            for q in QUANTILES:
+                value = pool.waits.quantile(q)
+                lines.append(f'{name}{{{label},quantile="{q}"}} {value:.6f}')
+        lines.append(f"{name}_sum{{{label}}} {pool.waits.sum:.6f}")
+        lines.append(f"{name}_count{{{label}}} {pool.waits.count}")
+
+
+def _render_offloader(lines: List[str], offloader: Optional[Offloader]):
+    if offloader is None:
+        return
+    name = f"{METRIC_PREFIX}_codec_blocking_seconds"
+    lines.append(f"# HELP {name} Time bodies handled inline blocked the event loop")
+    lines.append(f"# TYPE {name} summary")
+    if offloader.blocking.count:
+        for q in QUANTILES:
+            value = offloader.blocking.quantile(q)
+            lines.append(f'{name}{{quantile="{q}"}} {value:.6f}')
+    lines.append(f"{name}_sum {offloader.blocking.sum:.6f}")
+    lines.append(f"{name}_count {offloader.blocking.count}")
+
+    name = f"{METRIC_PREFIX}_codec_offloaded_total"
+    lines.append(f"# HELP {name} Bodies handled by a worker process")
+    lines.append(f"# TYPE {name} counter")
+    lines.append(f"{name} {offloader.offloaded}")
+
+
+def render_metrics(
+    providers: Iterable[ServiceProvider],
+    composites: Iterable[CompositeProvider] = (),
+    offloader: Optional[Offloader] = None,
+) -> str:
+    """
+    :param providers: The providers to render the metrics of
+    :param composites: The composites to render the hedging counters of
+    :param offloader: The offloader of the codec
+    :return: The metrics, as a summary per measure with a series per provider and model, the
+        state of any concurrency limiters, the budgets of upstream rate limits, the connection
+        pools, counters of hedged requests per composite, from which the hedge and win rates
+        follow, and how long work on bodies blocked the event loop
+    """
+    providers = [
+        provider for provider in providers if isinstance(provider, ServiceProvider)
+    ]
+    lines = []
+    for measure in MEASURES:
+        name = f"{METRIC_PREFIX}_{measure}_seconds"
+        lines.append(f"# TYPE {name} summary")
+        for provider in providers:
+            provider_label = f'provider="{_escape(provider.id)}"'
+            for model, sketches in provider.model_sketches.items():
+                labels = f'{provider_label},model="{_escape(model)}"'
+                _render_summary(lines, name, labels, sketches, measure)
+    _render_limiters(lines, providers)
+    _render_rate_limits(lines, providers)
+    _render_pools(lines, providers)
+    _render_hedges(lines, list(composites))
+    _render_offloader(lines, offloader)
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+# The connection pool of an HTTP provider, with telemetry of its connections and of the time
+# requests spend waiting for one. The wait ends with the first event httpcore traces for the
+# request, like connecting or sending its headers, which only happens once it has a connection.
+import importlib.util
+from typing import List
+from typing import Optional
+
+import httpx
+from demuxai.exceptions import ProviderConfigurationError
+from demuxai.timing import clock
+from demuxai.timing import QuantileSketch
+
+
+class PoolTransport(httpx.AsyncBaseTransport):
+    """Sends requests through a pool of connections, which is shared by all of them"""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5.0,
+        http2: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        :param max_connections: The most open connections, where None is unlimited
+        :param max_keepalive_connections: The most idle connections kept open
+        :param keepalive_expiry: Seconds an idle connection is kept open
+        :param http2: Whether to multiplex requests over HTTP/2 connections, when the upstream
+            supports it
+        :param transport: The transport to send requests with, instead of one with the pool
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            raise ProviderConfigurationError(
+                "HTTP/2 requires the 'h2' package, install demuxai[http2]"
+            )
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                http2=http2,
+            )
+        self.transport = transport
+        # the requests waiting for a connection
+        self.waiting = 0
+        # the seconds each request waited for a connection
+        self.waits = QuantileSketch()
+
+    @property
+    def connections(self) -> List:
+        """The connections of the pool, which are httpcore's"""
+        pool = getattr(self.transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    @property
+    def idle(self) -> int:
+        return sum(1 for connection in self.connections if connection.is_idle())
+
+    @property
+    def in_use(self) -> int:
+        return sum(
+            1
+            for connection in self.connections
+            if not connection.is_idle() and not connection.is_closed()
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = clock()
+        waiting = True
+        trace = request.extensions.get("trace")
+
+        def end_wait():
+            nonlocal waiting
+            if waiting:
+                waiting = False
+                self.waiting -= 1
+                return True
+            return False
+
+        async def trace_wait(name: str, info: dict):
+            if end_wait():
+                self.waits.add(clock() - start)
+            if trace is not None:
+                await trace(name, info)
+
+        request.extensions["trace"] = trace_wait
+        self.waiting += 1
+        try:
+            return await self.transport.handle_async_request(request)
+        except httpx.PoolTimeout:
+            # the request waited for a connection until it timed out
+            if end_wait():
+                self.waits.add(clock() - start)
+            raise
+        finally:
+            end_wait()
+
+    async def aclose(self):
+        await self.transport.aclose()
@@ -15,7 +15,9 @@ from demuxai.context import CompletionContext
 from demuxai.context import Context
 from demuxai.context import EmbeddingContext
 from demuxai.model import Model
-from demuxai.sse import JSONEvent
+from demuxai.sse import AsyncJSONStreamWriter
+from demuxai.sse import Event
+from demuxai.timing import Timing
 
 
 T = TypeVar("T")
@@ -24,15 +26,22 @@ Embedding = List[Union[float, int]]
 
 
 class ProviderResponse(AsyncContextManager[T], Generic[T, U], ABC):
-    """Base class for provider responses"""
+    """
+    Base class for provider responses. Unless `decode` is set, by a pipeline stage that needs to
+    inspect the response data, the upstream data may be passed through without decoding it.
+    When the provider starts its `timing`, it's reported back to the provider once the response
+    has been completely received.
+    """
 
-    __slots__ = ("provider", "context", "status_code", "headers")
+    __slots__ = ("provider", "context", "status_code", "headers", "decode", "timing")
 
     def __init__(self, provider: "BaseProvider", context: Context):
         self.provider = provider
         self.context = context
         self.status_code = 200
         self.headers = {}
+        self.decode = False
+        self.timing = Timing()
 
     async def __aenter__(self) -> AsyncContextManager[T]:
         pass
@@ -52,11 +61,18 @@ class ProviderResponse(AsyncContextManager[T], Generic[T, U], ABC):
     async def receive(self) -> AsyncGenerator[U, None]:
         yield
 
+    def finish(self):
+        """Called once the response has been completely received"""
+        if self.timing.started:
+            self.timing.end()
+            self.provider.add_timing(self.timing)
+
     @asynccontextmanager
     async def stream(self) -> AsyncGenerator[U, None]:
         async with self.open() as response_context:
             await self.prepare(response_context)
             yield self.receive()
+        self.finish()
 
 
 class ProviderModelsResponse(ProviderResponse[T, Model], Generic[T]):
@@ -94,16 +110,38 @@ class ProviderEmbeddingResponse(ProviderResponse[T, Embedding], Generic[T]):
             yield embedding
 
 
-class ProviderFullCompletionResponse(ProviderResponse[T, dict], Generic[T], ABC):
+class ProviderFullCompletionResponse(
+    ProviderResponse[T, Union[dict, bytes]], Generic[T], ABC
+):
     def __init__(self, provider: "BaseProvider", context: AnyCompletionContext):
         super().__init__(provider, context)
 
 
-class ProviderStreamingCompletionResponse(
-    ProviderResponse[T, JSONEvent], Generic[T], ABC
-):
+class ProviderStreamingCompletionResponse(ProviderResponse[T, Event], Generic[T], ABC):
+    """
+    Base class for streaming completions. When `raise_for_retryable_status` is set, because the
+    request could be reissued elsewhere, a retryable upstream status is raised on opening the
+    stream rather than streamed downstream.
+    """
+
+    __slots__ = ("raise_for_retryable_status",)
+
     def __init__(self, provider: "BaseProvider", context: AnyCompletionContext):
         super().__init__(provider, context)
+        self.raise_for_retryable_status = False
+
+    def transmit(self) -> AsyncGenerator[bytes, None]:
+        """
+        :return: An async generator of the received events, encoded for sending downstream
+        """
+        return AsyncJSONStreamWriter(self.receive()).stream()
+
+    @asynccontextmanager
+    async def stream_encoded(self) -> AsyncGenerator[AsyncGenerator[bytes, None], None]:
+        async with self.open() as response_context:
+            await self.prepare(response_context)
+            yield self.transmit()
+        self.finish()
 
 
 AnyProviderCompletionResponse = Union[
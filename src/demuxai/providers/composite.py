@@ -1,25 +1,64 @@
+import asyncio
+import logging
 from abc import ABC
+from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+from typing import AsyncContextManager
+from typing import AsyncGenerator
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Generic
 from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Type
 from typing import TypeVar
 
+from demuxai.breaker import CircuitBreakers
+from demuxai.budget import RetryBudget
+from demuxai.context import ChatCompletionContext
+from demuxai.context import CompletionContext
 from demuxai.context import Context
+from demuxai.context import EmbeddingContext
+from demuxai.context import ModelContext
+from demuxai.context import ModelGenerationContext
+from demuxai.context import StreamingContext
+from demuxai.exceptions import ProviderConfigurationError
+from demuxai.exceptions import ProviderUnavailableError
+from demuxai.hedge import hedge
+from demuxai.hedge import LOST
+from demuxai.hedge import lost
 from demuxai.model import Model
 from demuxai.provider import AnyProviderCompletionResponse
 from demuxai.provider import BaseProvider
+from demuxai.provider import ProviderEmbeddingResponse
+from demuxai.provider import ProviderModelsResponse
+from demuxai.provider import ProviderResponse
+from demuxai.provider import ProviderStreamingCompletionResponse
 from demuxai.providers.service import ServiceProvider
 from demuxai.registry import Registry
+from demuxai.retry import classify
+from demuxai.retry import RETRYABLE_ERRORS
 from demuxai.settings.base import BaseSettings
+from demuxai.settings.composite import CompositeProviderSettings
 from demuxai.settings.composite import CompositeSettings
+from demuxai.sse import Event
+from demuxai.strategy import FailoverStrategy
+from demuxai.strategy import FastestStrategy
+from demuxai.strategy import LeastOutstandingStrategy
+from demuxai.strategy import RoundRobinStrategy
 from demuxai.strategy import Strategy
+from demuxai.timing import clock
+from demuxai.timing import sample_timing
+from demuxai.timing import TimingReporter
 from demuxai.utils import SingletonMeta
 
-# from demuxai.strategy import FailoverStrategy
-# from demuxai.strategy import FastestStrategy
-# from demuxai.strategy import RoundRobinStrategy
 
+logger = logging.getLogger("uvicorn")
 
 T = TypeVar("T")
+U = TypeVar("U")
 
 
 class BaseCompositeProvider(BaseProvider, ABC):
@@ -31,22 +70,379 @@ class BaseCompositeProvider(BaseProvider, ABC):
 
         if providers:
             for provider in providers:
-                self.providers.add(provider.type, provider)
+                self.providers.add(provider.id, provider)
+
+
+class CompositeMember(TimingReporter):
+    """
+    A model of a provider, which is a member of a composite model. Its timings are those of the
+    provider for that model, so strategies can compare the members of a composite.
+    """
+
+    __slots__ = ("provider", "remote_id", "temperature")
+
+    def __init__(
+        self,
+        provider: ServiceProvider,
+        remote_id: str,
+        temperature: Optional[float] = None,
+    ):
+        self.provider = provider
+        self.remote_id = remote_id
+        self.temperature = temperature
+
+    @property
+    def id(self) -> str:
+        return f"{self.provider.id}/{self.remote_id}"
+
+    def apply(self, context: ModelContext):
+        """
+        Route the request context to this member
+        :param context: The request context, which is updated with the model of the member
+        """
+        context.update(model=self.remote_id)
+        # set after the update, which would split a remote ID with a slash in it as a provider's
+        context.raw_model = self.id
+        if self.temperature is not None and isinstance(context, ModelGenerationContext):
+            context.update(temperature=self.temperature)
+
+    def _timing(self, measure: str) -> float:
+        timing = self.provider.model_timing.get(self.remote_id)
+        if timing is None:
+            return 0
+        return getattr(timing, measure)
+
+    @property
+    def time_to_first_byte(self) -> float:
+        return self._timing("time_to_first_byte")
+
+    @property
+    def duration(self) -> float:
+        return self._timing("duration")
+
+    @property
+    def response_duration(self) -> float:
+        return self._timing("response_duration")
+
+    @property
+    def time_to_first_token(self) -> float:
+        return self._timing("time_to_first_token")
+
+    @property
+    def inter_token_latency(self) -> float:
+        return self._timing("inter_token_latency")
+
+    def quantile(self, measure: str, q: float) -> float:
+        return self.provider.quantile(measure, q, model=self.remote_id)
+
+    def __repr__(self):
+        return f"CompositeMember(id='{self.id}')"
+
+
+GetResponse = Callable[[ServiceProvider, ModelContext], Awaitable[ProviderResponse]]
+StreamOpener = Callable[[ProviderResponse], AsyncContextManager[AsyncGenerator]]
+
+
+class MemberRequest(object):
+    """
+    A request routed to a member of a composite, by the strategy which chose it, which is entered
+    once the request is sent to the member
+    """
+
+    __slots__ = ("strategy", "member", "context", "response", "started")
+
+    def __init__(
+        self,
+        strategy: Strategy[CompositeMember],
+        member: CompositeMember,
+        context: ModelContext,
+    ):
+        self.strategy = strategy
+        self.member = member
+        self.context = context
+        self.response: Optional[ProviderResponse] = None
+        # when the request was sent to the member
+        self.started: Optional[float] = None
+
+
+class CompositeResponseMixin(Generic[T, U]):
+    """
+    Wraps the response of the member a request was routed to, and exits the strategy once the
+    response has been completely received, since a streaming request only reaches upstream once
+    the response is opened
+    """
+
+    provider: "CompositeProvider"
+    request: MemberRequest
+    status_code: int
+    headers: dict
+    decode: bool
+
+    @property
+    def member(self) -> CompositeMember:
+        return self.request.member
+
+    @property
+    def response(self) -> ProviderResponse[T, U]:
+        return self.request.response
+
+    async def _exit_strategy(self, exc: Optional[BaseException]):
+        await self.provider._exit_member(self.request, exc)
+
+    @asynccontextmanager
+    async def _route(
+        self, stream: StreamOpener
+    ) -> AsyncGenerator[AsyncGenerator, None]:
+        self.response.decode = self.decode
+        try:
+            async with stream(self.response) as response_aiter:
+                self.status_code = self.response.status_code
+                self.headers = self.response.headers
+                yield response_aiter
+        except BaseException as e:
+            await self._exit_strategy(e)
+            raise
+        await self._exit_strategy(None)
+
+    async def receive(self) -> AsyncGenerator[U, None]:
+        async for data in self.response.receive():
+            yield data
+
+    def stream(self) -> AsyncGenerator[U, None]:
+        return self._route(lambda response: response.stream())
+
+
+class CompositeResponse(CompositeResponseMixin[T, U], ProviderResponse[T, U]):
+    __slots__ = ("request",)
+
+    def __init__(
+        self, provider: "CompositeProvider", context: Context, request: MemberRequest
+    ):
+        super().__init__(provider, context)
+        self.request = request
+
+
+class CompositeStreamingCompletionResponse(
+    CompositeResponseMixin[T, Event], ProviderStreamingCompletionResponse[T]
+):
+    """
+    Waits on the stream of the member until its first event, and should the member fail before
+    then, by an error, a retryable status or by timing out, the request is transparently reissued
+    to the next member chosen by the strategy. When racing, the request is also sent to the next
+    member should the first event take too long, and whichever stream's first event arrives first
+    is the one streamed.
+    """
+
+    __slots__ = ("request", "get_response", "original", "race", "tried")
+
+    provider: "CompositeProvider"
+    context: ModelContext
+
+    def __init__(
+        self,
+        provider: "CompositeProvider",
+        context: ModelContext,
+        request: MemberRequest,
+        get_response: Optional[GetResponse] = None,
+        original: Optional[ModelContext] = None,
+        race: bool = False,
+    ):
+        """
+        :param provider: The composite
+        :param context: The request context
+        :param request: The request routed to the first member
+        :param get_response: Sends the request to a member, for reissuing it
+        :param original: A copy of the context before it was routed to a member
+        :param race: Whether to race the request against another member
+        """
+        super().__init__(provider, context)
+        self.request = request
+        self.get_response = get_response
+        self.original = original
+        self.race = race
+        self.tried: List[CompositeMember] = [request.member]
+
+    def _can_reissue(self) -> bool:
+        if self.get_response is None or self.original is None:
+            return False
+        return any(
+            member not in self.tried
+            for member in self.provider.breakers.available(self.provider.members)
+        )
+
+    async def _reissue(self) -> MemberRequest:
+        """Route the request to the next member, which hasn't been tried yet"""
+        request = await self.provider._open_member(
+            self.original.copy(), self.get_response, exclude=self.tried
+        )
+        self.tried.append(request.member)
+        return request
+
+    async def _open(
+        self, request: MemberRequest, stream: StreamOpener
+    ) -> Tuple[MemberRequest, AsyncExitStack, AsyncGenerator]:
+        """
+        Open the stream of a member, and wait on its first event
+        :return: The request, the exit stack of its opened stream, and the stream including its
+            first event
+        """
+        request.response.decode = self.decode
+        stack = AsyncExitStack()
+        try:
+            response_aiter = await stack.enter_async_context(stream(request.response))
+            try:
+                first = await asyncio.wait_for(
+                    response_aiter.__anext__(),
+                    self.provider.settings.first_byte_timeout,
+                )
+            except StopAsyncIteration:
+                return request, stack, response_aiter
+            return request, stack, _prepend(first, response_aiter)
+        except BaseException as e:
+            try:
+                await stack.__aexit__(type(e), e, e.__traceback__)
+            except Exception:
+                pass
+            await self.provider._exit_member(request, e)
+            raise
+
+    async def _open_next(
+        self, stream: StreamOpener
+    ) -> Tuple[MemberRequest, AsyncExitStack, AsyncGenerator]:
+        request = await self._reissue()
+        request.response.raise_for_retryable_status = True
+        return await self._open(request, stream)
+
+    async def _discard(
+        self, opened: Tuple[MemberRequest, AsyncExitStack, AsyncGenerator]
+    ):
+        """Close the stream of the member which lost the race"""
+        request, stack, _ = opened
+        cancelled = asyncio.CancelledError(LOST)
+        try:
+            await stack.__aexit__(type(cancelled), cancelled, None)
+        except BaseException:
+            pass
+        await self.provider._exit_member(request, cancelled)
+
+    async def _open_first(
+        self, stream: StreamOpener
+    ) -> Tuple[AsyncExitStack, AsyncGenerator]:
+        """
+        Open the stream of a member, reissuing or racing the request as needed, until there is a
+        stream whose first event arrived
+        :return: The exit stack of the opened stream, and the stream including its first event
+        """
+        while True:
+            can_reissue = self._can_reissue()
+            self.request.response.raise_for_retryable_status = can_reissue
+            primary = self.request
+            try:
+                delay = None
+                if self.race and can_reissue:
+                    delay = self.provider._start_hedge(primary.member, True)
+                if delay is None:
+                    opened = await self._open(primary, stream)
+                else:
+                    opened = await hedge(
+                        self._open(primary, stream),
+                        self.provider._hedged(lambda: self._open_next(stream), True),
+                        delay,
+                        self._discard,
+                    )
+                    if opened[0] is not primary:
+                        self.provider.hedges.won += 1
+                self.request, stack, response_aiter = opened
+                return stack, response_aiter
+            except Exception as e:
+                if not self._can_reissue():
+                    raise
+                logger.debug(
+                    f"Reissuing request from '{self.member.id}' of composite "
+                    f"'{self.provider.id}' after: {e!r}"
+                )
+                self.request = await self._reissue()
+
+    @asynccontextmanager
+    async def _route(
+        self, stream: StreamOpener
+    ) -> AsyncGenerator[AsyncGenerator, None]:
+        stack, response_aiter = await self._open_first(stream)
+        self.status_code = self.response.status_code
+        self.headers = self.response.headers
+        try:
+            async with stack:
+                yield response_aiter
+        except BaseException as e:
+            await self._exit_strategy(e)
+            raise
+        await self._exit_strategy(None)
+
+    def stream_encoded(self) -> AsyncGenerator[AsyncGenerator[bytes, None], None]:
+        return self._route(lambda response: response.stream_encoded())
+
+
+async def _prepend(first: T, aiter: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+    yield first
+    async for item in aiter:
+        yield item
+
+
+class HedgeStatistics(object):
+    """
+    Counts of the requests which were eligible for hedging (or racing), those which were sent
+    to a second member, and those where the second member won
+    """
+
+    __slots__ = ("requests", "hedged", "won")
+
+    def __init__(self):
+        self.requests = 0
+        self.hedged = 0
+        self.won = 0
 
 
 class CompositeProvider(BaseCompositeProvider):
-    __slots__ = ("strategy",)
+    """
+    A model composed of the models of other providers, which routes each request to one of its
+    members, as chosen by its strategy
+    """
+
+    __slots__ = (
+        "strategy",
+        "members",
+        "breakers",
+        "hedge_budget",
+        "race_budget",
+        "hedges",
+    )
 
     settings: CompositeSettings
 
     def __init__(
         self,
         settings: CompositeSettings,
-        providers: List[ServiceProvider] = None,
-        strategy: Strategy[ServiceProvider] = None,
+        members: List[CompositeMember] = None,
+        strategy: Strategy[CompositeMember] = None,
+        breakers: CircuitBreakers[CompositeMember] = None,
     ):
-        super().__init__(settings, providers)
+        members = members or []
+        super().__init__(settings)
+        for member in members:
+            self.providers.add(
+                member.provider.id, member.provider, allow_overwrite=True
+            )
+        self.members = members
+        if strategy is None:
+            strategy_class = self.get_meta_option("strategy", RoundRobinStrategy)
+            strategy = strategy_class(**settings.strategy)
         self.strategy = strategy
+        if breakers is None:
+            breakers = CircuitBreakers(**settings.breaker)
+        self.breakers = breakers
+        self.hedge_budget = RetryBudget(settings.hedge.get("budget", 10.0))
+        self.race_budget = RetryBudget(settings.race.get("budget", 10.0))
+        self.hedges = HedgeStatistics()
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -55,24 +451,345 @@ class CompositeProvider(BaseCompositeProvider):
             setattr(cls, "type", provider_type)
             CompositeProviderRegistry().add(provider_type, cls)
 
+    @classmethod
+    def create(
+        cls, settings: CompositeSettings, providers: Dict[str, BaseProvider]
+    ) -> "CompositeProvider":
+        """
+        Create the composite, resolving its members from the configured providers
+        :param settings: The composite's settings
+        :param providers: The configured providers, by their ID
+        """
+        members = [
+            cls._create_member(settings, member_settings, providers)
+            for member_settings in settings.providers
+        ]
+        return cls(settings, members=members)
+
+    @staticmethod
+    def _create_member(
+        settings: CompositeSettings,
+        member_settings: CompositeProviderSettings,
+        providers: Dict[str, BaseProvider],
+    ) -> CompositeMember:
+        provider = providers.get(member_settings.provider_id)
+        if not isinstance(provider, ServiceProvider):
+            raise ProviderConfigurationError(
+                f"Composite '{settings.id}' references unknown provider "
+                f"'{member_settings.provider_id}'"
+            )
+        temperature = member_settings.temperature
+        if temperature is None:
+            temperature = settings.temperature
+        return CompositeMember(provider, member_settings.remote_id, temperature)
+
     @property
     def id(self):
         return self.settings.id
 
-    async def get_models(self, context: Context) -> List[Model]:
-        pass
+    async def _get_member_capabilities(self, context: Context) -> List[str]:
+        """The capabilities which all members of the composite have in common"""
+        capabilities = None
+        for member in self.members:
+            member_capabilities = []
+            response = await member.provider.get_models(context)
+            async with response.stream() as models:
+                async for model in models:
+                    if model.id == member.id:
+                        member_capabilities = model.capabilities
+            if capabilities is None:
+                capabilities = list(member_capabilities)
+            else:
+                capabilities = [c for c in capabilities if c in member_capabilities]
+        return capabilities or []
+
+    async def get_models(self, context: Context) -> ProviderModelsResponse:
+        metadata = dict(self.settings.metadata)
+        if self.settings.name:
+            metadata["name"] = self.settings.name
+        if self.settings.description:
+            metadata["description"] = self.settings.description
+
+        model = Model(
+            self.id,
+            0,
+            self.id,
+            await self._get_member_capabilities(context),
+            [],
+            metadata=metadata,
+        )
+        return ProviderModelsResponse(self, context, [model])
+
+    def _hedge_options(self, fim: bool) -> dict:
+        return self.settings.race if fim else self.settings.hedge
+
+    def _hedge_budget(self, fim: bool) -> RetryBudget:
+        return self.race_budget if fim else self.hedge_budget
 
-    async def get_completion(self, context: Context) -> AnyProviderCompletionResponse:
-        pass
+    def _start_hedge(self, member: CompositeMember, fim: bool) -> Optional[float]:
+        """
+        Count a request which is hedged, or raced when it's a FIM request
+        :param member: The member the request was routed to
+        :param fim: Whether the request is a FIM request
+        :return: Seconds to wait on the member before sending the request to another member, or
+            None when it isn't, since without a configured delay, there's no telling when a
+            member without recent timings is slow
+        """
+        options = self._hedge_options(fim)
+        delay = options.get("delay")
+        if delay is None:
+            if fim:
+                # the first token decides the winner, when a race is streamed
+                delay = member.quantile(
+                    "time_to_first_token", options.get("quantile", 0.9)
+                )
+            else:
+                delay = member.quantile(
+                    "time_to_first_byte", options.get("quantile", 0.95)
+                )
+            if not delay:
+                return None
+        self.hedges.requests += 1
+        self._hedge_budget(fim).deposit()
+        return delay
 
-    async def get_chat_completion(self, context: Context):
-        pass
+    def _hedged(
+        self, start: Callable[[], Awaitable[T]], fim: bool
+    ) -> Callable[[], Optional[Awaitable[T]]]:
+        """
+        Wrap starting the request sent to another member, so it's counted and only sent when the
+        budget for hedging, or racing, allows
+        """
 
-    async def get_fim_completion(self, context: Context):
-        pass
+        def secondary() -> Optional[Awaitable[T]]:
+            if not self._hedge_budget(fim).withdraw():
+                return None
+            self.hedges.hedged += 1
+            return start()
+
+        return secondary
+
+    async def _select(
+        self, context: ModelContext, exclude: List[CompositeMember] = None
+    ) -> MemberRequest:
+        """
+        Route the request to the member chosen by the strategy
+        :param context: The request context, which is updated for the member
+        :param exclude: Members which shouldn't be chosen
+        :return: The request routed to the member, with the strategy which chose it
+        """
+        exclude = exclude or []
+        # only members whose breakers allow a request are offered to the strategy
+        members = [
+            member
+            for member in self.breakers.available(self.members)
+            if member not in exclude
+        ]
+        if not members:
+            raise ProviderUnavailableError(
+                f"All members of composite '{self.id}' are unavailable"
+            )
+        # members close to the rate limits of their upstreams are avoided, unless all are
+        members = [
+            member for member in members if not member.provider.rate_limited()
+        ] or members
+
+        member = self.strategy.next(members)
+        self.breakers.acquire(member)
+        member.apply(context)
+        return MemberRequest(self.strategy, member, context)
+
+    async def _send(
+        self, request: MemberRequest, get_response: GetResponse
+    ) -> MemberRequest:
+        """Send the request to the member it was routed to, entering the strategy which chose it"""
+        request.strategy.current = request.member
+        await request.strategy.__aenter__()
+        request.started = clock()
+        try:
+            request.response = await get_response(
+                request.member.provider, request.context
+            )
+        except BaseException as e:
+            await self._exit_member(request, e)
+            raise
+        return request
+
+    async def _open_member(
+        self,
+        context: ModelContext,
+        get_response: GetResponse,
+        exclude: List[CompositeMember] = None,
+    ) -> MemberRequest:
+        """
+        Route the request to the member chosen by the strategy, and send it
+        :param context: The request context, which is updated for the member
+        :param get_response: Sends the request to the member's provider
+        :param exclude: Members which shouldn't be chosen
+        :return: The request routed to the member, with its response
+        """
+        return await self._send(await self._select(context, exclude), get_response)
+
+    async def _exit_member(
+        self, request: MemberRequest, exc: Optional[BaseException] = None
+    ):
+        """
+        Record the outcome of a request to a member, and exit the strategy which chose it
+        :param request: The request routed to the member
+        :param exc: The error of the request, if it failed or was cancelled
+        """
+        if exc is not None and classify(exc) not in RETRYABLE_ERRORS:
+            # only errors which another member might not have are failures of the member, unlike
+            # cancellation, shedding a request which never reached it, or a bad request
+            self.breakers.release(request.member)
+            if lost(exc):
+                self._add_cancelled_timing(request)
+            exc = None
+        else:
+            latency = None
+            if request.response is not None and request.response.timing.started:
+                latency = sample_timing(request.response.timing)[0]
+            self.breakers.record(request.member, exc is not None, latency)
+
+        request.strategy.current = request.member
+        if exc is None:
+            await request.strategy.__aexit__(None, None, None)
+        else:
+            await request.strategy.__aexit__(type(exc), exc, exc.__traceback__)
+
+    def _add_cancelled_timing(self, request: MemberRequest):
+        """
+        Record the timing of a request which lost a race or hedge before the member answered, as
+        though it answered right then, since it would've taken at least as long. A member which
+        keeps losing races would otherwise only be timed on the requests it won. A request the
+        client cancelled isn't timed, as it says nothing of how long the member takes.
+        """
+        response = request.response
+        if response is not None and response.timing.started:
+            timing = response.timing
+        elif request.started is not None:
+            timing = request.member.provider.start_timing(request.context)
+            timing.start_time = request.started
+        else:
+            return
+        if timing.first_token_time is not None or timing.end_time is not None:
+            return
+        now = clock()
+        if timing.first_byte_time is None:
+            timing.first_byte_time = now
+        timing.first_token_time = now
+        timing.end_time = now
+        request.member.provider.add_timing(timing)
+
+    async def _discard(self, request: MemberRequest):
+        """Release the response of the member which lost a race"""
+        await self._exit_member(request, asyncio.CancelledError(LOST))
+
+    async def _route(
+        self, context: ModelContext, get_response: GetResponse, fim: bool = False
+    ) -> ProviderResponse:
+        """
+        :param context: The request context
+        :param get_response: Sends the request to a member's provider
+        :param fim: Whether the request is a FIM request, which is raced rather than hedged
+        """
+        streaming = isinstance(context, StreamingContext) and context.streaming
+        # only FIM requests are raced when streamed, since the other member's stream can only
+        # be cancelled before anything was sent downstream
+        hedging = bool(self._hedge_options(fim)) and (fim or not streaming)
+        # the context before routing, so the request can be sent to other members
+        original = context.copy() if hedging or streaming else None
+        primary = await self._select(context)
+
+        delay = None
+        if hedging and not streaming:
+            delay = self._start_hedge(primary.member, fim)
+        if delay is None:
+            request = await self._send(primary, get_response)
+        else:
+            request = await hedge(
+                self._send(primary, get_response),
+                self._hedged(
+                    lambda: self._open_member(
+                        original.copy(), get_response, exclude=[primary.member]
+                    ),
+                    fim,
+                ),
+                delay,
+                self._discard,
+            )
+            if request is not primary:
+                self.hedges.won += 1
+
+        if isinstance(request.response, ProviderStreamingCompletionResponse):
+            return CompositeStreamingCompletionResponse(
+                self,
+                context,
+                request,
+                get_response=get_response,
+                original=original,
+                race=hedging,
+            )
+        return CompositeResponse(self, context, request)
+
+    async def get_completion(
+        self, context: CompletionContext
+    ) -> AnyProviderCompletionResponse:
+        if context.is_fim:
+            return await self.get_fim_completion(context)
+        return await self._route(
+            context, lambda provider, context: provider.get_completion(context)
+        )
+
+    async def get_chat_completion(
+        self, context: ChatCompletionContext
+    ) -> AnyProviderCompletionResponse:
+        return await self._route(
+            context, lambda provider, context: provider.get_chat_completion(context)
+        )
+
+    async def get_fim_completion(
+        self, context: CompletionContext
+    ) -> AnyProviderCompletionResponse:
+        return await self._route(
+            context,
+            lambda provider, context: provider.get_fim_completion(context),
+            fim=True,
+        )
+
+    async def get_embeddings(
+        self, context: EmbeddingContext
+    ) -> ProviderEmbeddingResponse:
+        return await self._route(
+            context, lambda provider, context: provider.get_embeddings(context)
+        )
 
 
 class CompositeProviderRegistry(
     Registry[Type[CompositeProvider]], metaclass=SingletonMeta
 ):
     pass
+
+
+class RoundRobinCompositeProvider(CompositeProvider):
+    class Meta:
+        type = "roundrobin"
+        strategy = RoundRobinStrategy
+
+
+class FailoverCompositeProvider(CompositeProvider):
+    class Meta:
+        type = "failover"
+        strategy = FailoverStrategy
+
+
+class FastestCompositeProvider(CompositeProvider):
+    class Meta:
+        type = "fastest"
+        strategy = FastestStrategy
+
+
+class LeastOutstandingCompositeProvider(CompositeProvider):
+    class Meta:
+        type = "leastoutstanding"
+        strategy = LeastOutstandingStrategy
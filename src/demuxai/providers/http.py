@@ -1,24 +1,48 @@
+import asyncio
 import logging
 from abc import ABC
 from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+from typing import Any
 from typing import AsyncContextManager
 from typing import AsyncGenerator
+from typing import Callable
+from typing import Optional
 from typing import Union
 
 import httpx
 from demuxai import __version__
+from demuxai import codec
 from demuxai.context import AnyCompletionContext
 from demuxai.context import ChatCompletionContext
 from demuxai.context import CompletionContext
+from demuxai.context import Context
 from demuxai.context import EmbeddingContext
 from demuxai.exceptions import ProviderConfigurationError
+from demuxai.exceptions import ProviderOverloadedError
+from demuxai.limiter import ConcurrencyLimiters
+from demuxai.limiter import UNLIMITED
+from demuxai.limiter import Unlimited
+from demuxai.pool import PoolTransport
 from demuxai.provider import ProviderEmbeddingResponse
 from demuxai.provider import ProviderFullCompletionResponse
 from demuxai.provider import ProviderStreamingCompletionResponse
 from demuxai.providers.service import ServiceProvider
+from demuxai.ratelimit import APIKey
+from demuxai.ratelimit import RateLimits
+from demuxai.retry import Retrier
 from demuxai.settings.provider import ProviderSettings
+from demuxai.sse import AsyncJSONStreamPipe
 from demuxai.sse import AsyncJSONStreamReader
+from demuxai.sse import AsyncRawJSONStreamReader
+from demuxai.sse import DEFAULT_EVENT_TYPE
+from demuxai.sse import Event
 from demuxai.sse import JSONEvent
+from demuxai.sse import RawEvent
+from demuxai.timing import clock
+from demuxai.timing import sample_timing
+from demuxai.timing import Timing
+from demuxai.utils import prefix_json_string
 from demuxai.utils import recursive_update
 from httpx import Request
 from httpx import Response
@@ -27,7 +51,78 @@ from httpx import Response
 logger = logging.getLogger("uvicorn")
 
 
-class HTTPCompletionResponse(ProviderFullCompletionResponse[Response]):
+def is_retryable_status(status_code: int) -> bool:
+    """Whether a request which failed with the status could succeed elsewhere, or later"""
+    return status_code == 429 or status_code >= 500
+
+
+def rewrite_model(content: bytes, prefix: str) -> bytes:
+    """
+    Prefixes the model of a response body, which the offloader may run in a worker process. A
+    top-level model string is prefixed in place, otherwise the body is decoded.
+    :param content: The encoded response body
+    :param prefix: The prefix of the model
+    :return: The encoded response body, with its model prefixed
+    """
+    body = prefix_json_string(content, "model", prefix)
+    if body is not None:
+        return body
+    if b'"model"' not in content:
+        return content
+    # the model isn't a top-level string, so fall back to rewriting the decoded body
+    response_data = codec.loads(content)
+    if "model" not in response_data:
+        return content
+    recursive_update(response_data, dict(model=lambda m: f"{prefix}{m}"))
+    return codec.dumps(response_data)
+
+
+def decode_model(content: bytes, prefix: str) -> Any:
+    """
+    Decodes a response body with its model prefixed, which the offloader may run in a worker
+    process
+    :param content: The encoded response body
+    :param prefix: The prefix of the model
+    :return: The response data
+    """
+    response_data = codec.loads(content)
+    if "model" in response_data:
+        recursive_update(response_data, dict(model=lambda m: f"{prefix}{m}"))
+    return response_data
+
+
+class HTTPBodyResponseMixin(object):
+    """
+    Handles a complete upstream response body, which is passed through as bytes with only the
+    top-level model rewritten, unless the response data needs to be decoded
+    """
+
+    provider: "HTTPServiceProvider"
+    upstream_response: Response
+    status_code: int
+    headers: dict
+    decode: bool
+    timing: Timing
+
+    async def prepare(self, response_context: None):
+        # the complete body has been received, which is also when its tokens arrived
+        self.timing.add_token()
+        self.status_code = self.upstream_response.status_code
+        content_type = self.upstream_response.headers.get("content-type")
+        if content_type:
+            self.headers["content-type"] = content_type
+
+    async def receive(self) -> AsyncGenerator[Union[dict, bytes], None]:
+        # rewriting or decoding a large body is offloaded, and the time either blocks is recorded
+        function = decode_model if self.decode else rewrite_model
+        yield await codec.offloader.run(
+            function, self.upstream_response.content, f"{self.provider.id}/"
+        )
+
+
+class HTTPCompletionResponse(
+    HTTPBodyResponseMixin, ProviderFullCompletionResponse[Response]
+):
     __slots__ = ("upstream_response",)
 
     context: AnyCompletionContext
@@ -41,36 +136,96 @@ class HTTPCompletionResponse(ProviderFullCompletionResponse[Response]):
         super().__init__(provider, context)
         self.upstream_response = upstream_response
 
-    async def receive(self) -> AsyncGenerator[dict, None]:
-        response_data = self.upstream_response.json()
-        if "model" in response_data:
-            recursive_update(
-                response_data, dict(model=lambda m: f"{self.provider.id}/{m}")
-            )
-        yield response_data
-
 
 class HTTPStreamingCompletionResponse(ProviderStreamingCompletionResponse[Response]):
-    __slots__ = ("upstream_response",)
+    __slots__ = ("upstream_response", "send")
 
+    provider: "HTTPServiceProvider"
     context: AnyCompletionContext
 
     def __init__(
         self,
         provider: "HTTPServiceProvider",
         context: AnyCompletionContext,
-        upstream_response: AsyncContextManager[Response],
+        upstream_response: Optional[AsyncContextManager[Response]] = None,
+        send: Optional[Callable[[APIKey], AsyncContextManager[Response]]] = None,
     ):
+        """
+        :param provider: The provider
+        :param context: The request context
+        :param upstream_response: Sends the request, once the response is opened
+        :param send: Sends the request with a key, for each attempt, instead
+        """
         super().__init__(provider, context)
         self.upstream_response = upstream_response
+        self.send = send
         self.upstream_aiter = None
 
+    async def _enter(self, stack: AsyncExitStack) -> Response:
+        key = await self.provider.admit(self.context)
+        # the request holds its place within the limit until its stream is closed
+        limiter = self.provider.get_limiter(self.context)
+        await limiter.acquire()
+        stack.callback(limiter.release)
+        upstream_response = self.upstream_response
+        if self.send is not None:
+            upstream_response = self.send(key)
+        start = clock()
+        try:
+            response_context = await stack.enter_async_context(upstream_response)
+            key.rate_limit.update(
+                response_context.headers, response_context.status_code
+            )
+            if is_retryable_status(response_context.status_code):
+                response_context.raise_for_status()
+        except httpx.HTTPError as e:
+            limiter.record(exc=e)
+            raise
+        limiter.record(clock() - start)
+        return response_context
+
     @asynccontextmanager
     async def open(self) -> AsyncGenerator[Response, None]:
-        async with self.upstream_response as response_context:
+        """
+        Send the request, retrying it until its response has a status that isn't retryable, which
+        is before anything of the response could have been sent downstream
+        """
+        retrier = self.provider.retrier if self.send is not None else None
+        if retrier is not None:
+            retrier.budget.deposit()
+
+        attempt = 1
+        while True:
+            stack = AsyncExitStack()
+            try:
+                response_context = await self._enter(stack)
+                break
+            except httpx.HTTPError as e:
+                delay = retrier.next_delay(attempt, e) if retrier else None
+                if delay is None and isinstance(e, httpx.HTTPStatusError):
+                    # the status of the last attempt is passed through
+                    response_context = e.response
+                    break
+                await stack.aclose()
+                if delay is None:
+                    raise
+            except BaseException:
+                await stack.aclose()
+                raise
+            await asyncio.sleep(delay)
+            if self.timing.started:
+                self.timing.start()
+            attempt += 1
+
+        async with stack:
             yield response_context
 
     async def prepare(self, response_context: Response):
+        self.timing.set_first_byte_received()
+        if self.raise_for_retryable_status and is_retryable_status(
+            response_context.status_code
+        ):
+            response_context.raise_for_status()
         self.status_code = response_context.status_code
         self.headers.update(
             {
@@ -81,14 +236,51 @@ class HTTPStreamingCompletionResponse(ProviderStreamingCompletionResponse[Respon
         )
         self.upstream_aiter = response_context.aiter_bytes()
 
-    async def receive(self) -> AsyncGenerator[JSONEvent, None]:
-        async for event in AsyncJSONStreamReader(self.upstream_aiter).stream():
-            if "model" in (event.data or {}):
-                event.update_data(model=lambda m: f"{self.provider.id}/{m}")
-            yield event
-
-
-class HTTPEmbeddingResponse(ProviderEmbeddingResponse[Response]):
+    def _prefix_model(self, event: JSONEvent):
+        if "model" in (event.data or {}):
+            event.update_data(model=lambda m: f"{self.provider.id}/{m}")
+
+    def _receive_raw_event(self, event: RawEvent) -> Event:
+        self.timing.add_token()
+        return self._prefix_raw_model(event)
+
+    def _prefix_raw_model(self, event: RawEvent) -> Event:
+        if event.event != DEFAULT_EVENT_TYPE:
+            return event
+
+        data = prefix_json_string(event.data, "model", f"{self.provider.id}/")
+        if data is not None:
+            event.data = data
+            return event
+        if b'"model"' not in event.data:
+            return event
+
+        # the model isn't a top-level string, so fall back to decoding the event
+        json_event = event.to_json()
+        self._prefix_model(json_event)
+        return json_event
+
+    async def receive(self) -> AsyncGenerator[Event, None]:
+        if self.decode:
+            async for event in AsyncJSONStreamReader(self.upstream_aiter).stream():
+                self.timing.add_token()
+                self._prefix_model(event)
+                yield event
+            return
+
+        async for event in AsyncRawJSONStreamReader(self.upstream_aiter).stream():
+            yield self._receive_raw_event(event)
+
+    def transmit(self) -> AsyncGenerator[bytes, None]:
+        if self.decode:
+            return super().transmit()
+        # read, rewrite and encode each upstream chunk in a single generator
+        return AsyncJSONStreamPipe(
+            self.upstream_aiter, transform=self._receive_raw_event
+        ).stream()
+
+
+class HTTPEmbeddingResponse(HTTPBodyResponseMixin, ProviderEmbeddingResponse[Response]):
     __slots__ = ("upstream_response",)
 
     context: EmbeddingContext
@@ -102,14 +294,6 @@ class HTTPEmbeddingResponse(ProviderEmbeddingResponse[Response]):
         super().__init__(provider, context, [])
         self.upstream_response = upstream_response
 
-    async def receive(self) -> AsyncGenerator[dict, None]:
-        response_data = self.upstream_response.json()
-        if "model" in response_data:
-            recursive_update(
-                response_data, dict(model=lambda m: f"{self.provider.id}/{m}")
-            )
-        yield response_data
-
 
 AnyHTTPCompletionResponse = Union[
     HTTPCompletionResponse, HTTPStreamingCompletionResponse
@@ -129,20 +313,57 @@ async def log_response(response: Response):
 
 
 class HTTPServiceProvider(ServiceProvider, ABC):
-    __slots__ = ("_client",)
+    __slots__ = ("_client", "retrier", "limiters", "rate_limits", "pool")
 
     def __init__(self, settings: ProviderSettings):
         super().__init__(settings)
         self._client: httpx.AsyncClient = None
+        # the pool is created with the client
+        self.pool: Optional[PoolTransport] = None
+        self.retrier = Retrier(**settings.retry)
+        self.limiters: Optional[ConcurrencyLimiters] = None
+        if settings.concurrency is not None:
+            self.limiters = ConcurrencyLimiters(**settings.concurrency)
+        self.rate_limits = RateLimits(settings.api_keys, **settings.rate_limit)
+
+    def get_limiter(self, context: Context) -> Unlimited:
+        """The limiter of concurrent requests for the context's model, if limited"""
+        if self.limiters is None:
+            return UNLIMITED
+        return self.limiters.get(getattr(context, "remote_model", None))
+
+    def rate_limited(self, now: Optional[float] = None) -> bool:
+        return self.rate_limits.exhausted(now)
+
+    async def admit(self, context: Context) -> APIKey:
+        """
+        Choose the key for the request, and wait until its rate limit allows the request
+        :param context: The request context
+        :return: The key, whose rate limit is updated from the response
+        :raises ProviderOverloadedError: When the request would wait too long
+        """
+        now = clock()
+        key = self.rate_limits.select(now)
+        delay = key.rate_limit.acquire(now, max_wait=self.rate_limits.max_wait)
+        if delay is None:
+            raise ProviderOverloadedError(
+                f"Rate limit of provider '{self.id}' is exhausted",
+                retry_after=key.rate_limit.retry_after(now),
+            )
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return key
 
     def _build_client(self) -> httpx.AsyncClient:
         if not self.settings.url:
             raise ProviderConfigurationError(
                 "A URL is required for an HTTP service provider"
             )
+        self.pool = PoolTransport(**self.settings.pool)
         return httpx.AsyncClient(
             base_url=self.settings.url,
             headers=self._get_default_headers(),
+            transport=self.pool,
             timeout=httpx.Timeout(
                 connect=10.0,
                 read=self.settings.timeout_seconds,
@@ -162,13 +383,16 @@ class HTTPServiceProvider(ServiceProvider, ABC):
             "User-Agent": f"demuxai/{__version__} httpx/{httpx.__version__}",
         }
         if self.settings.api_key:
-            headers["Authorization"] = f"Bearer {self.settings.api_key}"
+            headers.update(self._get_auth_headers(self.settings.api_key))
         elif self.get_meta_option("requires_api_key", False):
             raise ProviderConfigurationError(
                 f"An API key is required for this provider: '{self.type}'"
             )
         return headers
 
+    def _get_auth_headers(self, api_key: str) -> dict:
+        return {"Authorization": f"Bearer {api_key}"}
+
     @property
     def client(self) -> httpx.AsyncClient:
         if not self._client:
@@ -179,25 +403,57 @@ class HTTPServiceProvider(ServiceProvider, ABC):
         if self._client:
             await self._client.aclose()
 
+    def _encode_payload(self, context: Context) -> dict:
+        """Encodes the request payload, as arguments for the client"""
+        return dict(
+            content=context.encode(),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def _request_options(self, context: Context, key: APIKey) -> dict:
+        """The arguments for the client to send the request with the key"""
+        options = self._encode_payload(context)
+        if len(self.rate_limits.keys) > 1:
+            # the client's default headers only have the first key
+            options["headers"].update(self._get_auth_headers(key.value))
+        return dict(params=context.query_params, **options)
+
+    async def _post(self, context: Context, timing: Timing) -> Response:
+        """Send an attempt of a request, which raises for an error status"""
+        key = await self.admit(context)
+        limiter = self.get_limiter(context)
+        async with limiter:
+            timing.start()
+            response = await self.client.post(
+                context.url_path, **self._request_options(context, key)
+            )
+            timing.set_first_byte_received()
+            key.rate_limit.update(response.headers, response.status_code)
+            response.raise_for_status()
+            limiter.record(sample_timing(timing)[0])
+        return response
+
+    def _stream(self, context: Context, key: APIKey) -> AsyncContextManager[Response]:
+        return self.client.stream(
+            "POST", context.url_path, **self._request_options(context, key)
+        )
+
     async def _post_completion(
         self, context: AnyCompletionContext
     ) -> AnyHTTPCompletionResponse:
+        timing = self.start_timing(context)
         if context.streaming:
-            response = self.client.stream(
-                "POST",
-                context.url_path,
-                params=context.query_params,
-                json=context.payload,
+            # the request is sent when the streaming response is opened
+            streaming_response = HTTPStreamingCompletionResponse(
+                self, context, send=lambda key: self._stream(context, key)
             )
-            return HTTPStreamingCompletionResponse(self, context, response)
+            streaming_response.timing = timing
+            return streaming_response
 
-        response = await self.client.post(
-            context.url_path,
-            params=context.query_params,
-            json=context.payload,
-        )
-        response.raise_for_status()
-        return HTTPCompletionResponse(self, context, response)
+        response = await self.retrier.call(lambda: self._post(context, timing))
+        completion_response = HTTPCompletionResponse(self, context, response)
+        completion_response.timing = timing
+        return completion_response
 
     async def get_completion(
         self, context: CompletionContext
@@ -215,10 +471,8 @@ class HTTPServiceProvider(ServiceProvider, ABC):
         return await self._post_completion(context)
 
     async def get_embeddings(self, context: EmbeddingContext) -> HTTPEmbeddingResponse:
-        response = await self.client.post(
-            context.url_path,
-            params=context.query_params,
-            json=context.payload,
-        )
-        response.raise_for_status()
-        return HTTPEmbeddingResponse(self, context, response)
+        timing = self.start_timing(context)
+        response = await self.retrier.call(lambda: self._post(context, timing))
+        embedding_response = HTTPEmbeddingResponse(self, context, response)
+        embedding_response.timing = timing
+        return embedding_response
@@ -1,23 +1,42 @@
+import logging
 from abc import ABC
 from abc import abstractmethod
+from typing import Dict
+from typing import Optional
 
 from demuxai.context import Context
 from demuxai.context import Usage
 from demuxai.provider import BaseProvider
 from demuxai.provider import ProviderModelsResponse
 from demuxai.settings.provider import ProviderSettings
+from demuxai.timing import DEFAULT_WINDOW_SECONDS
+from demuxai.timing import Timing
 from demuxai.timing import TimingReporter
+from demuxai.timing import TimingSketches
 from demuxai.timing import TimingStatistics
 from demuxai.utils import async_cacher
 from demuxai.utils import CacheProvider
 
 
+logger = logging.getLogger("uvicorn")
+
+
 class ServiceProvider(BaseProvider, TimingReporter, CacheProvider, ABC):
-    __slots__ = ("settings", "timing", "usage")
+    __slots__ = (
+        "settings",
+        "timing",
+        "model_timing",
+        "sketches",
+        "model_sketches",
+        "usage",
+    )
 
     def __init__(self, settings: ProviderSettings):
         self.settings = settings
-        self.timing = TimingStatistics()
+        self.timing = TimingStatistics(max_age=DEFAULT_WINDOW_SECONDS)
+        self.model_timing: Dict[Optional[str], TimingStatistics] = {}
+        self.sketches = TimingSketches()
+        self.model_sketches: Dict[Optional[str], TimingSketches] = {}
         self.usage = Usage()
 
     @property
@@ -42,6 +61,70 @@ class ServiceProvider(BaseProvider, TimingReporter, CacheProvider, ABC):
     async def get_models(self, context: Context) -> ProviderModelsResponse:
         return await self._get_models(context)
 
+    async def warm_up(self, context: Context):
+        """
+        Prepare the provider for requests, by prefetching its models, which also connects to
+        the upstream of an HTTP provider
+        :param context: The context of the proxy's own request
+        """
+        await self.get_models(context)
+
+    def rate_limited(self, now: Optional[float] = None) -> bool:
+        """Whether the provider is close to the rate limits of its upstream"""
+        return False
+
+    def start_timing(self, context: Context) -> Timing:
+        """
+        Start timing a request to this provider
+        :param context: The request context, of which the model sent upstream is the model the
+            timing is for
+        :return: The started timing
+        """
+        timing = Timing(
+            provider_id=self.id, model=getattr(context, "remote_model", None)
+        )
+        timing.start()
+        return timing
+
+    def add_timing(self, timing: Timing):
+        """
+        Record the timing of a completed request, for the provider and for its model
+        :param timing: The ended timing
+        """
+        self.timing.add(timing)
+        model_timing = self.model_timing.get(timing.model)
+        if model_timing is None:
+            model_timing = TimingStatistics(max_age=DEFAULT_WINDOW_SECONDS)
+            self.model_timing[timing.model] = model_timing
+        model_timing.add(timing)
+
+        self.sketches.add(timing)
+        model_sketches = self.model_sketches.get(timing.model)
+        if model_sketches is None:
+            model_sketches = self.model_sketches[timing.model] = TimingSketches()
+        model_sketches.add(timing)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            p50, p90, p99 = model_sketches.quantiles("duration").values()
+            logger.debug(
+                f"time: {self.id}/{timing.model} - {timing} "
+                f"(p50 {p50:.3f}s / p90 {p90:.3f}s / p99 {p99:.3f}s)"
+            )
+
+    def quantile(self, measure: str, q: float, model: Optional[str] = None) -> float:
+        """
+        :param measure: One of the timing `MEASURES`
+        :param q: The quantile, between 0 and 1
+        :param model: Restricts the quantile to the timings of this model
+        :return: The estimated quantile of the recent timings, or 0 without any
+        """
+        if model is None:
+            return self.sketches.quantile(measure, q)
+        model_sketches = self.model_sketches.get(model)
+        if model_sketches is None:
+            return 0
+        return model_sketches.quantile(measure, q)
+
     @property
     def time_to_first_byte(self) -> float:
         return self.timing.time_to_first_byte
@@ -53,3 +136,11 @@ class ServiceProvider(BaseProvider, TimingReporter, CacheProvider, ABC):
     @property
     def response_duration(self) -> float:
         return self.timing.response_duration
+
+    @property
+    def time_to_first_token(self) -> float:
+        return self.timing.time_to_first_token
+
+    @property
+    def inter_token_latency(self) -> float:
+        return self.timing.inter_token_latency
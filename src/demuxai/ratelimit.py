@@ -0,0 +1,324 @@
+# Rate limits of upstream providers, as they report them in the headers of their responses, like
+# `x-ratelimit-remaining-requests` and `retry-after`. Each limit of an upstream is a window, with
+# the requests or tokens remaining until it resets. A provider whose remaining budget falls within
+# its reserve is steered away from by composites, and once it's running low, requests to it are
+# paced to spread what remains until the reset, so they finish just under the limit.
+import math
+import re
+import time
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from demuxai.timing import clock
+
+
+HEADER_PREFIX = "x-ratelimit-"
+REMAINING_PREFIX = f"{HEADER_PREFIX}remaining"
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+# reset times beyond this many seconds are timestamps rather than durations
+_TIMESTAMP_THRESHOLD = 10**9
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    :param value: A duration in seconds, like "1.5", one like "1m30s" or "20ms", or a timestamp
+    :return: The duration in seconds, or None if it can't be parsed
+    """
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        parts = _DURATION_PART.findall(value)
+        if not parts or "".join(n + u for n, u in parts) != value:
+            return None
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(number) * units[unit] for number, unit in parts)
+    if seconds > _TIMESTAMP_THRESHOLD:
+        seconds -= time.time()
+    return max(seconds, 0.0)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+class RateLimitWindow(object):
+    """A limit of an upstream, like its requests or tokens per minute"""
+
+    __slots__ = ("name", "limit", "remaining", "reset_at")
+
+    def __init__(
+        self,
+        name: str,
+        remaining: int,
+        limit: Optional[int] = None,
+        reset_at: Optional[float] = None,
+    ):
+        self.name = name
+        self.remaining = remaining
+        self.limit = limit
+        self.reset_at = reset_at
+
+    @property
+    def counts_requests(self) -> bool:
+        return "token" not in self.name
+
+    def active(self, now: float) -> bool:
+        """Whether the window hasn't reset since it was reported"""
+        return self.reset_at is None or now < self.reset_at
+
+    @property
+    def headroom(self) -> float:
+        """The share of the limit which remains"""
+        if not self.limit:
+            return 1.0 if self.remaining > 0 else 0.0
+        return max(self.remaining / self.limit, 0.0)
+
+
+class RateLimit(object):
+    """
+    The budget of a provider, or of one of its keys, as last reported by the upstream. Windows
+    which don't report when they reset are assumed to reset after `default_reset` seconds.
+    """
+
+    __slots__ = (
+        "reserve",
+        "pace_below",
+        "default_reset",
+        "windows",
+        "blocked_until",
+        "last_used",
+        "_next_slot",
+        "_rejections",
+    )
+
+    def __init__(
+        self,
+        reserve: float = 0.05,
+        pace_below: float = 0.2,
+        default_reset: float = 60.0,
+    ):
+        """
+        :param reserve: The share of a limit at which the provider is steered away from
+        :param pace_below: The share of a limit below which requests are paced
+        :param default_reset: Seconds until a window resets, when the upstream doesn't report it
+        """
+        self.reserve = reserve
+        self.pace_below = pace_below
+        self.default_reset = default_reset
+        self.windows: Dict[str, RateLimitWindow] = {}
+        self.blocked_until = 0.0
+        self.last_used = 0.0
+        self._next_slot = 0.0
+        # the times of the upstream's recent 429 responses
+        self._rejections: Deque[float] = deque()
+
+    def update(
+        self,
+        headers: Mapping[str, str],
+        status_code: Optional[int] = None,
+        now: Optional[float] = None,
+    ):
+        """
+        Update the budget from the headers of an upstream response
+        :param headers: The response headers, with lowercase names
+        :param status_code: The response status
+        :param now: The time of the response
+        """
+        now = clock() if now is None else now
+        for header, value in headers.items():
+            header = header.lower()
+            if not header.startswith(REMAINING_PREFIX):
+                continue
+            remaining = _parse_int(value)
+            if remaining is None:
+                continue
+            suffix = header.split(REMAINING_PREFIX, 1)[1]
+            name = suffix.lstrip("-") or "requests"
+            reset = headers.get(f"{HEADER_PREFIX}reset{suffix}")
+            reset_in = parse_duration(reset) if reset else None
+            if reset_in is None:
+                reset_in = self.default_reset
+            self.windows[name] = RateLimitWindow(
+                name,
+                remaining,
+                limit=_parse_int(headers.get(f"{HEADER_PREFIX}limit{suffix}")),
+                reset_at=now + reset_in,
+            )
+
+        if status_code != 429:
+            return
+        self._rejections.append(now)
+        retry_after = headers.get("retry-after")
+        blocked_for = parse_duration(retry_after) if retry_after else None
+        if blocked_for is not None:
+            self.blocked_until = max(self.blocked_until, now + blocked_for)
+
+    def rejections(self, now: Optional[float] = None) -> int:
+        """The number of 429 responses within the last `default_reset` seconds"""
+        now = clock() if now is None else now
+        while self._rejections and self._rejections[0] < now - self.default_reset:
+            self._rejections.popleft()
+        return len(self._rejections)
+
+    def _active_windows(self, now: float):
+        return [window for window in self.windows.values() if window.active(now)]
+
+    def headroom(self, now: Optional[float] = None) -> float:
+        """The least share remaining of any of the limits, which is 1 when there are none"""
+        now = clock() if now is None else now
+        if now < self.blocked_until:
+            return 0.0
+        return min(
+            (window.headroom for window in self._active_windows(now)), default=1.0
+        )
+
+    def exhausted(self, now: Optional[float] = None) -> bool:
+        """Whether the remaining budget is within the reserve"""
+        now = clock() if now is None else now
+        if now < self.blocked_until:
+            return True
+        return any(
+            window.remaining <= 0 or window.headroom <= self.reserve
+            for window in self._active_windows(now)
+        )
+
+    def acquire(
+        self, now: Optional[float] = None, max_wait: float = math.inf
+    ) -> Optional[float]:
+        """
+        Reserve the budget of a request
+        :param now: The time the request is to be sent
+        :param max_wait: The longest the request may wait, in seconds
+        :return: Seconds to wait before sending the request, or None if that's beyond
+            `max_wait`, when nothing is reserved
+        """
+        now = clock() if now is None else now
+        windows = self._active_windows(now)
+        delay = max(self.blocked_until - now, 0.0)
+        for window in windows:
+            if window.remaining <= 0:
+                # nothing remains, so wait for the reset
+                delay = max(delay, window.reset_at - now)
+
+        slot = max(now + delay, self._next_slot)
+        if slot - now > max_wait:
+            return None
+        interval = 0.0
+        for window in windows:
+            paced = window.counts_requests and window.headroom < self.pace_below
+            if paced and window.remaining > 0:
+                # spread what remains over the time until the reset
+                interval = max(interval, (window.reset_at - slot) / window.remaining)
+        self._next_slot = slot + interval
+        self.last_used = now
+        for window in windows:
+            if window.counts_requests:
+                window.remaining -= 1
+        return slot - now
+
+    def available_in(self, now: Optional[float] = None) -> float:
+        """Seconds until the budget allows a request"""
+        now = clock() if now is None else now
+        waits = [self.blocked_until - now, 0.0]
+        waits.extend(
+            window.reset_at - now
+            for window in self._active_windows(now)
+            if window.remaining <= 0
+        )
+        return max(waits)
+
+    def retry_after(self, now: Optional[float] = None) -> int:
+        """Whole seconds until the budget allows a request"""
+        return max(math.ceil(self.available_in(now)), 1)
+
+    def rank(
+        self, now: Optional[float] = None
+    ) -> Tuple[float, bool, float, int, float]:
+        """Orders budgets from the one best able to take another request"""
+        now = clock() if now is None else now
+        return (
+            self.available_in(now),
+            self.exhausted(now),
+            -self.headroom(now),
+            self.rejections(now),
+            self.last_used,
+        )
+
+
+class APIKey(object):
+    """A key of a provider, with its own rate limit"""
+
+    __slots__ = ("label", "value", "rate_limit")
+
+    def __init__(
+        self, label: Optional[str], value: Optional[str], rate_limit: RateLimit
+    ):
+        """
+        :param label: Identifies the key, without revealing it
+        :param value: The key itself
+        :param rate_limit: The budget of the key
+        """
+        self.label = label
+        self.value = value
+        self.rate_limit = rate_limit
+
+
+class RateLimits(object):
+    """
+    The rate limits of a provider, one for each of its keys. Each request uses the key whose
+    budget is best able to take it, preferring those with the most headroom and the fewest recent
+    429s, and otherwise the least recently used, so requests are spread across the keys. A key
+    that's exhausted is out of the rotation until its window resets.
+    """
+
+    __slots__ = ("keys", "max_wait")
+
+    def __init__(
+        self,
+        keys: Sequence[Optional[str]] = (None,),
+        max_wait: float = 5.0,
+        **options,
+    ):
+        """
+        :param keys: The keys of the provider
+        :param max_wait: The longest a request waits for the budget, in seconds, beyond which
+            it's shed instead
+        :param options: The options for each `RateLimit`
+        """
+        keys = list(keys) or [None]
+        self.keys = [
+            # a single key needs no label
+            APIKey(str(index) if len(keys) > 1 else None, value, RateLimit(**options))
+            for index, value in enumerate(keys)
+        ]
+        self.max_wait = max_wait
+
+    def get(self, label: Optional[str] = None) -> RateLimit:
+        for key in self.keys:
+            if key.label == label:
+                return key.rate_limit
+        raise KeyError(label)
+
+    def select(self, now: Optional[float] = None) -> APIKey:
+        """The key to send the next request with"""
+        now = clock() if now is None else now
+        return min(self.keys, key=lambda key: key.rate_limit.rank(now))
+
+    def exhausted(self, now: Optional[float] = None) -> bool:
+        """Whether the budgets of all the keys are within their reserves"""
+        return all(key.rate_limit.exhausted(now) for key in self.keys)
+
+    def items(self):
+        return [(key.label, key.rate_limit) for key in self.keys]
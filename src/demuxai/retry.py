@@ -0,0 +1,153 @@
+# Retries of upstream requests. Errors are classified by what went wrong, and only those which
+# could succeed on another attempt are retried, with jittered exponential backoff that honors any
+# `Retry-After` of the upstream. A retry budget per provider stops retries from amplifying an
+# outage, since retries then make up at most a fixed share of the requests.
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable
+from typing import Callable
+from typing import Collection
+from typing import Optional
+from typing import TypeVar
+
+import httpx
+from demuxai.budget import RetryBudget
+
+
+T = TypeVar("T")
+
+ERROR_CONNECT = "connect"
+ERROR_TIMEOUT = "timeout"
+ERROR_RATE_LIMITED = "rate_limited"
+ERROR_SERVER = "server"
+ERROR_CLIENT = "client"
+ERROR_OTHER = "other"
+
+RETRYABLE_ERRORS = (ERROR_CONNECT, ERROR_TIMEOUT, ERROR_RATE_LIMITED, ERROR_SERVER)
+
+
+def classify(exc: BaseException) -> str:
+    """
+    :param exc: The error of an upstream request
+    :return: The class of the error, one of the `ERROR_*` constants
+    """
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout)):
+        # the request never reached the upstream
+        return ERROR_CONNECT
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError)):
+        # including waiting too long on the first event of a stream
+        return ERROR_TIMEOUT
+    if isinstance(exc, httpx.HTTPStatusError):
+        status_code = exc.response.status_code
+        if status_code == 429:
+            return ERROR_RATE_LIMITED
+        if status_code >= 500:
+            return ERROR_SERVER
+        return ERROR_CLIENT
+    return ERROR_OTHER
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """
+    :param exc: The error of an upstream request
+    :return: The seconds the upstream asked to wait before retrying, if it did
+    """
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class Retrier(object):
+    """
+    Decides whether, and after how long, a failed upstream request is retried. The delay before
+    each retry is drawn at random up to an exponentially growing cap ("full jitter"), but is at
+    least what the upstream asked for with `Retry-After`. Should the upstream ask for longer than
+    `max_retry_after`, the request isn't retried at all.
+    """
+
+    __slots__ = (
+        "attempts",
+        "base_delay",
+        "max_delay",
+        "max_retry_after",
+        "retry_on",
+        "budget",
+        "_random",
+    )
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        max_retry_after: float = 10.0,
+        budget: float = 20.0,
+        retry_on: Collection[str] = RETRYABLE_ERRORS,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param attempts: The most attempts of a request, including the first
+        :param base_delay: The cap of the delay before the first retry, in seconds
+        :param max_delay: The largest cap of the delay before a retry, in seconds
+        :param max_retry_after: The longest `Retry-After` which is waited on, in seconds
+        :param budget: The most retries, as a percentage of requests
+        :param retry_on: The classes of errors which are retried
+        :param seed: Seeds the jitter
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_on = frozenset(retry_on)
+        self.budget = RetryBudget(budget)
+        self._random = random.Random(seed)
+
+    def next_delay(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """
+        :param attempt: The number of the failed attempt, starting at 1
+        :param exc: The error of the failed attempt
+        :return: Seconds to wait before retrying, or None when the request isn't retried
+        """
+        if attempt >= self.attempts or classify(exc) not in self.retry_on:
+            return None
+        requested = retry_after(exc)
+        if requested is not None and requested > self.max_retry_after:
+            return None
+        if not self.budget.withdraw():
+            return None
+
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = self._random.uniform(0, cap)
+        if requested is not None:
+            delay = max(delay, requested)
+        return delay
+
+    async def call(self, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Send a request, retrying it as long as it fails with a retryable error
+        :param request: Sends an attempt of the request
+        :return: The result of the successful attempt
+        """
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                return await request()
+            except Exception as e:
+                delay = self.next_delay(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -55,6 +55,11 @@ class CompositeSettings(BaseSettings):
         "description",
         "temperature",
         "metadata",
+        "strategy",
+        "breaker",
+        "first_byte_timeout",
+        "race",
+        "hedge",
     )
 
     def __init__(
@@ -66,6 +71,11 @@ class CompositeSettings(BaseSettings):
         description: Optional[str] = None,
         temperature: Optional[float] = None,
         metadata: Optional[dict] = None,
+        strategy: Optional[dict] = None,
+        breaker: Optional[dict] = None,
+        first_byte_timeout: Optional[float] = None,
+        race: Optional[dict] = None,
+        hedge: Optional[dict] = None,
         extra: Optional[dict] = None,
     ):
         super().__init__(extra=extra)
@@ -76,6 +86,11 @@ class CompositeSettings(BaseSettings):
         self.description = description
         self.temperature = temperature
         self.metadata = metadata or {}
+        self.strategy = strategy or {}
+        self.breaker = breaker or {}
+        self.first_byte_timeout = first_byte_timeout
+        self.race = race or {}
+        self.hedge = hedge or {}
 
     @classmethod
     def from_yaml_dict(cls, local_id: str, yaml_dict: dict) -> "CompositeSettings":
@@ -101,6 +116,11 @@ class CompositeSettings(BaseSettings):
         description = yaml_dict.pop("description", None)
         temperature = yaml_dict.pop("temperature", None)
         metadata = yaml_dict.pop("metadata", {}) or {}
+        strategy = yaml_dict.pop("strategy", {}) or {}
+        breaker = yaml_dict.pop("breaker", {}) or {}
+        first_byte_timeout = yaml_dict.pop("first_byte_timeout", None)
+        race = yaml_dict.pop("race", {}) or {}
+        hedge = yaml_dict.pop("hedge", {}) or {}
         return CompositeSettings(
             local_id,
             serve_type,
@@ -109,5 +129,10 @@ class CompositeSettings(BaseSettings):
             description=description,
             temperature=temperature,
             metadata=metadata,
+            strategy=strategy,
+            breaker=breaker,
+            first_byte_timeout=first_byte_timeout,
+            race=race,
+            hedge=hedge,
             extra=yaml_dict,
         )
@@ -16,6 +16,11 @@ DEFAULT_SETTINGS = {
     "cache_seconds": 3600,
     "timeout_seconds": 300,
     "api_key": None,
+    "stream_flush_ms": 0,
+    "stream_flush_bytes": 16384,
+    "json_codec": "auto",
+    "json_offload_bytes": 1048576,
+    "warmup_seconds": 0,
 }
 
 
@@ -30,6 +35,11 @@ class Settings(BaseSettings):
         "providers",
         "composites",
         "api_key",
+        "stream_flush_ms",
+        "stream_flush_bytes",
+        "json_codec",
+        "json_offload_bytes",
+        "warmup_seconds",
     )
 
     def __init__(
@@ -41,6 +51,11 @@ class Settings(BaseSettings):
         providers: List[ProviderSettings],
         composites: List[CompositeSettings],
         api_key: Optional[str] = None,
+        stream_flush_ms: Optional[int] = None,
+        stream_flush_bytes: Optional[int] = None,
+        json_codec: Optional[str] = None,
+        json_offload_bytes: Optional[int] = None,
+        warmup_seconds: Optional[float] = None,
         extra: Optional[dict] = None,
     ):
         super().__init__(extra=extra)
@@ -51,6 +66,11 @@ class Settings(BaseSettings):
         self.providers = providers
         self.composites = composites
         self.api_key = api_key
+        self.stream_flush_ms = stream_flush_ms
+        self.stream_flush_bytes = stream_flush_bytes
+        self.json_codec = json_codec
+        self.json_offload_bytes = json_offload_bytes
+        self.warmup_seconds = warmup_seconds
 
     @classmethod
     def load(cls, config_file: str) -> "Settings":
@@ -75,6 +95,11 @@ class Settings(BaseSettings):
         cache_seconds = yaml_dict.pop("cache_seconds", None) or None
         timeout_seconds = yaml_dict.pop("timeout_seconds", None) or None
         api_key = yaml_dict.pop("api_key", None) or None
+        stream_flush_ms = yaml_dict.pop("stream_flush_ms", None)
+        stream_flush_bytes = yaml_dict.pop("stream_flush_bytes", None) or None
+        json_codec = yaml_dict.pop("json_codec", None) or None
+        json_offload_bytes = yaml_dict.pop("json_offload_bytes", None)
+        warmup_seconds = yaml_dict.pop("warmup_seconds", None)
 
         providers = []
         for local_id, provider_dict in yaml_dict.pop("providers", {}).items():
@@ -98,6 +123,11 @@ class Settings(BaseSettings):
             providers,
             composites,
             api_key=api_key,
+            stream_flush_ms=stream_flush_ms,
+            stream_flush_bytes=stream_flush_bytes,
+            json_codec=json_codec,
+            json_offload_bytes=json_offload_bytes,
+            warmup_seconds=warmup_seconds,
             extra=yaml_dict,
         )
         settings.set_defaults(**DEFAULT_SETTINGS)
@@ -1,6 +1,7 @@
 import fnmatch
 from typing import List
 from typing import Optional
+from typing import Union
 
 from demuxai.settings.base import BaseSettings
 from demuxai.settings.exceptions import InvalidConfigurationError
@@ -14,10 +15,15 @@ class ProviderSettings(BaseSettings):
         "description",
         "url",
         "api_key",
+        "api_keys",
         "cache_seconds",
         "timeout_seconds",
         "include_models",
         "exclude_models",
+        "retry",
+        "concurrency",
+        "rate_limit",
+        "pool",
     )
 
     def __init__(
@@ -27,11 +33,15 @@ class ProviderSettings(BaseSettings):
         name: Optional[str] = None,
         description: Optional[str] = None,
         url: Optional[str] = None,
-        api_key: Optional[str] = None,
+        api_key: Union[str, List[str], None] = None,
         cache_seconds: Optional[int] = None,
         timeout_seconds: Optional[int] = None,
         include_models: Optional[List[str]] = None,
         exclude_models: Optional[List[str]] = None,
+        retry: Optional[dict] = None,
+        concurrency: Optional[dict] = None,
+        rate_limit: Optional[dict] = None,
+        pool: Optional[dict] = None,
         extra: Optional[dict] = None,
     ):
         super().__init__(extra=extra)
@@ -40,11 +50,18 @@ class ProviderSettings(BaseSettings):
         self.name = name
         self.description = description
         self.url = url
-        self.api_key = api_key
+        # requests are spread across the keys, while anything else uses the first
+        self.api_keys = [api_key] if isinstance(api_key, str) else list(api_key or [])
+        self.api_key = self.api_keys[0] if self.api_keys else None
         self.cache_seconds = cache_seconds
         self.timeout_seconds = timeout_seconds
         self.include_models = include_models
         self.exclude_models = exclude_models
+        self.retry = retry or {}
+        # None leaves concurrency unlimited, while an empty dict limits it with the defaults
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit or {}
+        self.pool = pool or {}
 
     def filter_model_ids(self, model_ids: List[str]) -> List[str]:
         filtered_ids = []
@@ -88,6 +105,12 @@ class ProviderSettings(BaseSettings):
         timeout_seconds = yaml_dict.pop("timeout_seconds", None)
         include_models = yaml_dict.pop("include_models", None)
         exclude_models = yaml_dict.pop("exclude_models", None)
+        retry = yaml_dict.pop("retry", {}) or {}
+        concurrency = yaml_dict.pop("concurrency", None)
+        if isinstance(concurrency, bool):
+            concurrency = {} if concurrency else None
+        rate_limit = yaml_dict.pop("rate_limit", {}) or {}
+        pool = yaml_dict.pop("pool", {}) or {}
         return ProviderSettings(
             local_id,
             provider_type,
@@ -99,5 +122,9 @@ class ProviderSettings(BaseSettings):
             timeout_seconds=timeout_seconds,
             include_models=include_models,
             exclude_models=exclude_models,
+            retry=retry,
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            pool=pool,
             extra=yaml_dict,
         )
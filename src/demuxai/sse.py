@@ -1,20 +1,29 @@
-import json
+import asyncio
 from typing import AsyncGenerator
 from typing import AsyncIterator
+from typing import Callable
 from typing import Generic
+from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import TypeVar
 from typing import Union
 
+from demuxai import codec
 from demuxai.utils import recursive_update
 
 
 T = TypeVar("T")
 
 SEPARATOR = ":"
+SEPARATOR_BYTES = SEPARATOR.encode("ascii")
+SEPARATOR_BYTE = SEPARATOR_BYTES[0]
 DEFAULT_ENCODING = "utf-8"
 DEFAULT_EVENT_TYPE = "message"
 DEFAULT_DONE_SYMBOL = "[DONE]"
+DEFAULT_DONE_BYTES = DEFAULT_DONE_SYMBOL.encode(DEFAULT_ENCODING)
+# events are terminated by an empty line, using any of the line endings
+EVENT_BOUNDARY_MAX_LENGTH = 4
 
 
 class Event(object):
@@ -51,15 +60,26 @@ class Event(object):
 class JSONEvent(Event):
     @classmethod
     def from_event(cls, event: Event) -> "JSONEvent":
-        data = json.loads(event.data)
+        data = codec.loads(event.data)
         return cls(id=event.id, event=event.event, data=data, retry=event.retry)
 
     def to_plain(self) -> Event:
+        """Encodes the event data, as bytes ready to be written downstream"""
         return Event(
-            id=self.id, event=self.event, data=json.dumps(self.data), retry=self.retry
+            id=self.id, event=self.event, data=codec.dumps(self.data), retry=self.retry
         )
 
 
+class RawEvent(Event):
+    """An event whose data is kept as the raw bytes received from upstream"""
+
+    data: bytes
+
+    def to_json(self) -> JSONEvent:
+        """Decodes the event data, for when a pipeline stage needs to inspect it"""
+        return JSONEvent.from_event(self)
+
+
 class AsyncStreamer(Generic[T]):
     def __init__(
         self, upstream_aiter: AsyncIterator[T], encoding: str = DEFAULT_ENCODING
@@ -68,6 +88,101 @@ class AsyncStreamer(Generic[T]):
         self.encoding = encoding
 
 
+class EventFramer(object):
+    """
+    Incrementally splits a byte stream into raw event blocks. Incoming chunks are appended to
+    a single growing buffer, which is scanned once for event boundaries, so the cost of framing
+    is linear in the size of the stream regardless of how the upstream chunks it.
+    """
+
+    __slots__ = ("buffer", "offset", "has_cr")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        # position from which to resume scanning for a boundary
+        self.offset = 0
+        # whether the stream uses CR or CRLF line endings, which require a slower scan
+        self.has_cr = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add a chunk to the buffer and return the complete event blocks it produced
+        :param chunk: The bytes received from upstream
+        :return: A list of event blocks, without their trailing boundary
+        """
+        if self.has_cr or b"\r" in chunk:
+            self.has_cr = True
+            return self._feed_any(chunk)
+
+        buffer = self.buffer
+        if buffer:
+            buffer += chunk
+            if buffer.find(b"\n\n", self.offset) < 0:
+                self.offset = max(len(buffer) - 1, 0)
+                return []
+            # copy once to split the completed events out of the buffer
+            chunk = bytes(buffer)
+            buffer.clear()
+        elif b"\n\n" not in chunk:
+            buffer += chunk
+            self.offset = max(len(buffer) - 1, 0)
+            return []
+
+        blocks = chunk.split(b"\n\n")
+        buffer += blocks.pop()
+        self.offset = max(len(buffer) - 1, 0)
+        return blocks
+
+    def _feed_any(self, chunk: bytes) -> List[bytes]:
+        buffer = self.buffer
+        buffer += chunk
+        blocks = []
+        start = 0
+        end, length = self._find_boundary(buffer, self.offset)
+
+        if end >= 0:
+            with memoryview(buffer) as view:
+                while end >= 0:
+                    blocks.append(bytes(view[start:end]))
+                    start = end + length
+                    end, length = self._find_boundary(buffer, start)
+            del buffer[:start]
+
+        # a boundary may straddle two chunks, so rescan the tail of the buffer next time
+        self.offset = max(len(buffer) - EVENT_BOUNDARY_MAX_LENGTH + 1, 0)
+        return blocks
+
+    @staticmethod
+    def _find_boundary(buffer: bytearray, start: int) -> Tuple[int, int]:
+        """
+        :return: A tuple of the position and length of the earliest boundary, or -1 for the
+            position if there is none
+        """
+        end = buffer.find(b"\n\n", start)
+        # most streams only use LF line endings, which avoids scanning for the others
+        cr = buffer.find(b"\r", start, end if end >= 0 else len(buffer))
+        if cr < 0:
+            return end, 2
+
+        length = 2
+        for boundary in (b"\r\r", b"\r\n\r\n"):
+            pos = buffer.find(boundary, cr, end if end >= 0 else len(buffer))
+            if pos >= 0 and (end < 0 or pos < end):
+                end, length = pos, len(boundary)
+        return end, length
+
+    def flush(self) -> Optional[bytes]:
+        """
+        :return: Any remaining bytes in the buffer, which form an unterminated event block
+        """
+        if not self.buffer:
+            return None
+        block = bytes(self.buffer)
+        self.buffer.clear()
+        self.offset = 0
+        return block
+
+
 class AsyncStreamReader(AsyncStreamer[bytes]):
     """
     Based on https://github.com/mpetazzoni/sseclient/blob/main/sseclient/__init__.py
@@ -77,84 +192,122 @@ class AsyncStreamReader(AsyncStreamer[bytes]):
         - Adds type hinting
         - More explicit event attributes
         - Generalized some functionality through inheritance
+        - Buffer-based framing and single-pass field parsing
     """
 
-    async def _read(self) -> AsyncGenerator[bytes, None]:
-        data = b""
-        async for chunk in self.upstream_aiter:
-            for line in chunk.splitlines(True):
-                data += line
-                if data.endswith((b"\r\r", b"\n\n", b"\r\n\r\n")):
-                    yield data
-                    data = b""
-        if data:
-            yield data
+    event_class = Event
+
+    def _decode_data(self, data: bytes) -> Union[str, bytes]:
+        return data.decode(self.encoding)
+
+    def _parse(self, block: bytes) -> Optional[Event]:
+        """
+        Parse the fields of a raw event block, only decoding the values of known fields
+        :param block: The raw event block, without its trailing boundary
+        :return: The event, or None if the block shouldn't be dispatched
+        """
+        # Split before decoding so splitlines() only uses \r and \n
+        lines = block.splitlines()
+
+        # Fast path for the most common event, a single data line
+        if len(lines) == 1 and lines[0][:6] == b"data: ":
+            return self.event_class(data=self._decode_data(lines[0][6:]))
+
+        event_id = None
+        event_type = None
+        retry = None
+        data_lines = []
+
+        for line in lines:
+            # Lines starting with a separator are comments and are to be ignored, along
+            # with empty lines
+            if not line or line[0] == SEPARATOR_BYTE:
+                continue
+
+            field, _, value = line.partition(SEPARATOR_BYTES)
+
+            # From the spec:
+            # "If value starts with a single U+0020 SPACE character, remove it from value."
+            if value[:1] == b" ":
+                value = value[1:]
+
+            # The data field may come over multiple lines and their values are
+            # concatenated with each other, separated by a newline
+            if field == b"data":
+                data_lines.append(value)
+            elif field == b"event":
+                event_type = value
+            elif field == b"id":
+                event_id = value
+            elif field == b"retry":
+                retry = value
+            # Ignore unknown fields
+
+        # Events with no data are not dispatched.
+        if not data_lines:
+            return None
+
+        encoding = self.encoding
+        return self.event_class(
+            id=event_id.decode(encoding) if event_id is not None else None,
+            # Empty event names default to 'message'
+            event=event_type.decode(encoding) if event_type else DEFAULT_EVENT_TYPE,
+            data=self._decode_data(b"\n".join(data_lines)),
+            retry=retry.decode(encoding) if retry is not None else None,
+        )
 
     async def stream(self) -> AsyncGenerator[Event, None]:
-        async for chunk in self._read():
-            event = Event()
-            # Split before decoding so splitlines() only uses \r and \n
-            for line in chunk.splitlines():
-                # Decode the line.
-                line = line.decode(self.encoding)
-
-                # Lines starting with a separator are comments and are to be
-                # ignored.
-                if not line.strip() or line.startswith(SEPARATOR):
-                    continue
-
-                data = line.split(SEPARATOR, 1)
-                field = data[0]
-
-                # Ignore unknown fields.
-                if field not in Event.__slots__:
-                    continue
-
-                if len(data) > 1:
-                    # From the spec:
-                    # "If value starts with a single U+0020 SPACE character,
-                    # remove it from value."
-                    if data[1].startswith(" "):
-                        value = data[1][1:]
-                    else:
-                        value = data[1]
-                else:
-                    # If no value is present after the separator,
-                    # assume an empty value.
-                    value = ""
-
-                # The data field may come over multiple lines and their values
-                # are concatenated with each other.
-                if field == "data":
-                    setattr(event, field, value + "\n")
-                else:
-                    setattr(event, field, value)
-
-            # Events with no data are not dispatched.
-            if not event.data:
-                continue
+        framer = EventFramer()
+        async for chunk in self.upstream_aiter:
+            for block in framer.feed(chunk):
+                event = self._parse(block)
+                if event is not None:
+                    # Dispatch the event
+                    yield event
 
-            # If the data field ends with a newline, remove it.
-            if event.data.endswith("\n"):
-                event.data = event.data[0:-1]
+        block = framer.flush()
+        if block:
+            event = self._parse(block)
+            if event is not None:
+                yield event
 
-            # Empty event names default to 'message'
-            event.event = event.event or DEFAULT_EVENT_TYPE
 
-            # Dispatch the event
-            yield event
+class AsyncRawStreamReader(AsyncStreamReader):
+    """Reads events without decoding their data, which is kept as bytes"""
+
+    event_class = RawEvent
+
+    def _decode_data(self, data: bytes) -> bytes:
+        return data
 
 
 class AsyncJSONStreamReader(AsyncStreamReader):
+    done_symbol = DEFAULT_DONE_SYMBOL
+
+    def _is_done(self, event: Event) -> bool:
+        return event.event == "done" or event.data == self.done_symbol
+
+    def _convert(self, event: Event) -> Event:
+        return JSONEvent.from_event(event)
+
     async def stream(self) -> AsyncGenerator[JSONEvent, None]:
         is_done = False
 
         async for event in super().stream():
-            if is_done or event.event == "done" or event.data == DEFAULT_DONE_SYMBOL:
+            if is_done or self._is_done(event):
                 is_done = True
                 # ensure the entire body is consumed, even if we're done
                 continue
-            yield JSONEvent.from_event(event)
+            yield self._convert(event)
+
+
+class AsyncRawJSONStreamReader(AsyncJSONStreamReader, AsyncRawStreamReader):
+    """Reads a stream of JSON events, passing through their data without decoding it"""
+
+    done_symbol = DEFAULT_DONE_BYTES
+
+    def _convert(self, event: RawEvent) -> RawEvent:
+        return event
 
 
 class AsyncStreamWriter(AsyncStreamer[Event]):
@@ -167,36 +320,185 @@ class AsyncStreamWriter(AsyncStreamer[Event]):
         super().__init__(upstream_aiter, encoding)
         self.done_event = done_event or Event(data=DEFAULT_DONE_SYMBOL)
 
-    async def _write(self, event: Event) -> AsyncGenerator[bytes, None]:
+    def encode(self, event: Event) -> bytes:
+        """
+        Encodes an event into a single bytes object
+        :param event: The event to encode, with either str or bytes data
+        :return: The encoded event, including its trailing boundary
+        """
+        data = event.data
+        if not isinstance(data, bytes):
+            data = data.encode(self.encoding)
+        # each line of multi-line data needs its own field
+        if b"\n" in data:
+            data = data.replace(b"\n", b"\ndata: ")
+
+        if (
+            event.id is None
+            and event.retry is None
+            and (not event.event or event.event == DEFAULT_EVENT_TYPE)
+        ):
+            return b"data: " + data + b"\n\n"
+
+        fields = []
         if event.event and event.event != DEFAULT_EVENT_TYPE:
-            yield f"event: {event.event}\n".encode(self.encoding)
+            fields.append(f"event: {event.event}\n".encode(self.encoding))
 
-        yield f"data: {event.data}\n".encode(self.encoding)
+        fields.append(b"data: " + data + b"\n")
 
         if event.id is not None:
-            yield f"id: {event.id}\n".encode(self.encoding)
+            fields.append(f"id: {event.id}\n".encode(self.encoding))
         if event.retry is not None:
-            yield f"retry: {event.retry}\n".encode(self.encoding)
+            fields.append(f"retry: {event.retry}\n".encode(self.encoding))
 
-        yield "\n".encode(self.encoding)
+        fields.append(b"\n")
+        return b"".join(fields)
 
     async def stream(self) -> AsyncGenerator[bytes, None]:
         async for event in self.upstream_aiter:
-            async for chunk in self._write(event):
-                yield chunk
+            yield self.encode(event)
 
-        async for chunk in self._write(self.done_event):
-            yield chunk
+        yield self.encode(self.done_event)
 
 
 class AsyncJSONStreamWriter(AsyncStreamWriter, AsyncStreamer[JSONEvent]):
-    async def _write(
-        self, event: Union[JSONEvent, Event]
-    ) -> AsyncGenerator[bytes, None]:
+    def encode(self, event: Union[JSONEvent, Event]) -> bytes:
         if isinstance(event, JSONEvent):
-            async for chunk in super()._write(event.to_plain()):
-                yield chunk
-            return
+            event = event.to_plain()
+        return super().encode(event)
+
 
-        async for chunk in super()._write(event):
-            yield chunk
+class AsyncJSONStreamPipe(AsyncRawJSONStreamReader):
+    """
+    Fuses reading, transforming and writing a stream of JSON events into a single generator,
+    which turns each upstream chunk directly into one pre-encoded downstream chunk
+    """
+
+    def __init__(
+        self,
+        upstream_aiter: AsyncIterator[bytes],
+        transform: Optional[Callable[[RawEvent], Event]] = None,
+        encoding: str = DEFAULT_ENCODING,
+        done_event: Optional[Event] = None,
+    ):
+        super().__init__(upstream_aiter, encoding)
+        self.transform = transform
+        self.writer = AsyncJSONStreamWriter(None, encoding, done_event=done_event)
+        self.is_done = False
+
+    def _pipe(self, blocks: List[bytes]) -> bytes:
+        encode = self.writer.encode
+        transform = self.transform
+        encoded = []
+
+        for block in blocks:
+            event = self._parse(block)
+            if event is None:
+                continue
+            if self._is_done(event):
+                self.is_done = True
+                break
+            if transform is not None:
+                event = transform(event)
+            encoded.append(encode(event))
+
+        return b"".join(encoded)
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        framer = EventFramer()
+
+        async for chunk in self.upstream_aiter:
+            blocks = framer.feed(chunk)
+            # ensure the entire body is consumed, even if we're done
+            if blocks and not self.is_done:
+                encoded = self._pipe(blocks)
+                if encoded:
+                    yield encoded
+
+        block = framer.flush()
+        if block and not self.is_done:
+            encoded = self._pipe([block])
+            if encoded:
+                yield encoded
+
+        yield self.writer.encode(self.writer.done_event)
+
+
+class AsyncStreamCoalescer(AsyncStreamer[bytes]):
+    """
+    Coalesces encoded chunks into fewer, larger chunks, so a burst of events from upstream is
+    sent downstream together. The first chunk, and any chunk arriving after a quiet period of at
+    least `max_delay`, is sent immediately, so coalescing never delays an isolated event. Within
+    a burst, chunks are held for at most `max_delay` seconds, or until `max_bytes` is reached.
+    """
+
+    def __init__(
+        self,
+        upstream_aiter: AsyncIterator[bytes],
+        max_delay: float,
+        max_bytes: int,
+        encoding: str = DEFAULT_ENCODING,
+    ):
+        super().__init__(upstream_aiter, encoding)
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+
+    async def stream(self) -> AsyncGenerator[bytes, None]:
+        loop = asyncio.get_running_loop()
+        upstream_aiter = self.upstream_aiter
+        pending = []
+        pending_bytes = 0
+        deadline = 0.0
+        # the last chunk sent, which starts at -max_delay so the first chunk is sent immediately
+        last_sent = loop.time() - self.max_delay
+        next_chunk: Optional[asyncio.Future] = None
+
+        try:
+            while True:
+                if not pending:
+                    try:
+                        if next_chunk is not None:
+                            chunk = await next_chunk
+                        else:
+                            chunk = await upstream_aiter.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        next_chunk = None
+
+                    now = loop.time()
+                    if now - last_sent >= self.max_delay:
+                        last_sent = now
+                        yield chunk
+                        continue
+                    pending.append(chunk)
+                    pending_bytes = len(chunk)
+                    deadline = last_sent + self.max_delay
+
+                timeout = deadline - loop.time()
+                if pending_bytes < self.max_bytes and timeout > 0:
+                    # wait for the next chunk without cancelling it, if the deadline passes first
+                    if next_chunk is None:
+                        next_chunk = asyncio.ensure_future(upstream_aiter.__anext__())
+                    done, _ = await asyncio.wait((next_chunk,), timeout=timeout)
+                    if done:
+                        try:
+                            chunk = next_chunk.result()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            next_chunk = None
+                        pending.append(chunk)
+                        pending_bytes += len(chunk)
+                        continue
+
+                last_sent = loop.time()
+                yield b"".join(pending)
+                pending.clear()
+                pending_bytes = 0
+
+            if pending:
+                yield b"".join(pending)
+        finally:
+            if next_chunk is not None:
+                next_chunk.cancel()
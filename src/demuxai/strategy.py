@@ -1,3 +1,4 @@
+import random
 import time
 from abc import ABC
 from abc import abstractmethod
@@ -71,8 +72,8 @@ class FailoverStrategy(Strategy[T]):
                 self.current = thing
                 return thing
 
-        # Fallback to the first one if all are unhealthy
-        self.current = things[0]
+        # Fallback to the one which failed the longest ago if all are unhealthy
+        self.current = min(things, key=self._failed_until.__getitem__)
         return self.current
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -80,33 +81,129 @@ class FailoverStrategy(Strategy[T]):
             self._failed_until[self.current] = time.time() + self._cooldown
 
 
-class FastestStrategy(Strategy[Union[T, TimingReporter]]):
-    def __init__(self, alpha: float = 0.2):
+class LeastOutstandingStrategy(Strategy[Union[T, TimingReporter]]):
+    """
+    Picks the provider with the fewest requests in flight, out of `choices` providers sampled at
+    random (power of two choices by default), or out of all of them when `choices` is 0. When
+    `weighted`, the requests in flight are weighted by a quantile of the provider's recent time to
+    first byte, so a slower provider is given proportionally fewer concurrent requests. A request
+    is only in flight once the strategy is entered for the provider it chose, until it's exited.
+    """
+
+    def __init__(
+        self,
+        choices: int = 2,
+        weighted: bool = False,
+        quantile: float = 0.5,
+        seed: Optional[int] = None,
+    ):
         super().__init__()
-        self._latencies: Dict[Union[T, TimingReporter], float] = {}
-        self._alpha = alpha
+        self._choices = choices
+        self._weighted = weighted
+        self._quantile = quantile
+        self._random = random.Random(seed)
+        self._in_flight: Dict[Union[T, TimingReporter], int] = {}
+
+    def in_flight(self, thing: Union[T, TimingReporter]) -> int:
+        return self._in_flight.get(thing, 0)
+
+    def _cost(self, thing: Union[T, TimingReporter]) -> float:
+        # the request being routed is included, so that weights apply to idle providers too
+        cost = self._in_flight.get(thing, 0) + 1
+        if self._weighted:
+            # providers without recent timings are unweighted, so they're tried
+            cost *= thing.quantile("time_to_first_byte", self._quantile) or 1
+        return cost
+
+    def next(self, things: List[Union[T, TimingReporter]]) -> Union[T, TimingReporter]:
+        if not things:
+            raise ValueError("No providers available for LeastOutstandingStrategy")
+
+        if 0 < self._choices < len(things):
+            candidates = self._random.sample(things, self._choices)
+        else:
+            # shuffled, so ties are broken at random
+            candidates = self._random.sample(things, len(things))
+
+        self.current = min(candidates, key=self._cost)
+        return self.current
+
+    async def __aenter__(self) -> "LeastOutstandingStrategy[T]":
+        # a provider which was chosen but never sent the request, like the loser of a hedge
+        # cancelled before it started, isn't counted
+        if self.current is not None:
+            self._in_flight[self.current] = self._in_flight.get(self.current, 0) + 1
+        return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if not exc_type and self.current and self.current.duration:
-            current_avg = self._latencies.get(self.current)
-            if current_avg is None:
-                self._latencies[self.current] = self.current.duration
-            else:
-                # Exponential Moving Average
-                self._latencies[self.current] = (
-                    self._alpha * self.current.duration
-                ) + ((1 - self._alpha) * current_avg)
+        if self.current is not None and self._in_flight.get(self.current):
+            self._in_flight[self.current] -= 1
+
+
+OBJECTIVE_TTFB = "ttfb"
+OBJECTIVE_THROUGHPUT = "throughput"
+OBJECTIVES = (OBJECTIVE_TTFB, OBJECTIVE_THROUGHPUT)
+
+
+class FastestStrategy(Strategy[Union[T, TimingReporter]]):
+    """
+    Picks the provider with the lowest score, from a quantile of its recent timings, where the
+    objective is either the time to first byte, or the throughput, as the time per output token.
+    When `expected_tokens` is set, the score is instead the expected time for a response of that
+    many tokens, balancing both. Providers without recent timings are tried first, and with
+    probability `epsilon` another provider is explored, so one that got faster is noticed.
+    """
+
+    def __init__(
+        self,
+        objective: str = OBJECTIVE_TTFB,
+        quantile: float = 0.9,
+        epsilon: float = 0.05,
+        expected_tokens: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        super().__init__()
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective for FastestStrategy: '{objective}'")
+        self._objective = objective
+        self._quantile = quantile
+        self._epsilon = epsilon
+        self._expected_tokens = expected_tokens
+        self._random = random.Random(seed)
+
+    def score(self, thing: Union[T, TimingReporter]) -> float:
+        """
+        :param thing: The provider to score
+        :return: The provider's score, where lower is better, or 0 without recent timings
+        """
+        ttfb = thing.quantile("time_to_first_byte", self._quantile)
+        if not ttfb:
+            return 0
+        if self._objective == OBJECTIVE_TTFB and not self._expected_tokens:
+            return ttfb
+
+        itl = thing.quantile("inter_token_latency", self._quantile)
+        if self._expected_tokens:
+            return ttfb + self._expected_tokens * itl
+        # responses which weren't streamed have no inter-token latency
+        return itl or ttfb
 
     def next(self, things: List[Union[T, TimingReporter]]) -> Union[T, TimingReporter]:
         if not things:
             raise ValueError("No providers available for FastestStrategy")
 
-        # Exploration: Prioritize items with no stats
-        unknown = [t for t in things if t not in self._latencies]
-        if unknown:
-            self.current = unknown[0]
-            return self.current
-
-        # Exploitation: Pick lowest latency
-        self.current = min(things, key=lambda t: self._latencies.get(t, float("inf")))
-        return self.current
+        scores = {}
+        for thing in things:
+            score = self.score(thing)
+            if not score:
+                # Exploration: Prioritize items with no recent stats
+                self.current = thing
+                return thing
+            scores[thing] = score
+
+        # Exploitation: Pick lowest score
+        best = min(things, key=scores.__getitem__)
+        if len(things) > 1 and self._random.random() < self._epsilon:
+            best = self._random.choice([thing for thing in things if thing is not best])
+        self.current = best
+        return best
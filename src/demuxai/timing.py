@@ -1,12 +1,58 @@
+import math
 import time
 from abc import ABC
+from bisect import bisect_right
+from collections import deque
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
 from typing import Optional
+from typing import Tuple
+
+
+# a monotonic clock, since timings are only ever compared with each other
+clock = time.perf_counter
+
+Sample = Tuple[Optional[float], ...]
+
+
+def _elapsed(since: Optional[float], until: Optional[float]) -> Optional[float]:
+    if since is None or until is None:
+        return None
+    return until - since
+
+
+def sample_timing(timing: "Timing") -> Sample:
+    """Each of the `MEASURES` of the timing, or None for those it didn't record"""
+    return (
+        _elapsed(timing.start_time, timing.first_byte_time),
+        _elapsed(timing.start_time, timing.end_time),
+        _elapsed(timing.first_byte_time, timing.end_time),
+        _elapsed(timing.start_time, timing.first_token_time),
+        timing.inter_token_latency if timing.token_count > 1 else None,
+    )
+
+
+# the measures of a timing, in the order they're sampled
+MEASURES = (
+    "time_to_first_byte",
+    "duration",
+    "response_duration",
+    "time_to_first_token",
+    "inter_token_latency",
+)
+QUANTILES = (0.5, 0.9, 0.99)
+# the time window for provider statistics, in seconds
+DEFAULT_WINDOW_SECONDS = 600.0
 
 
 class TimingReporter(ABC):
     time_to_first_byte: float
     duration: float
     response_duration: float
+    time_to_first_token: float
+    inter_token_latency: float
 
     def __str__(self):
         return (
@@ -16,56 +62,335 @@ class TimingReporter(ABC):
 
 
 class TimingStatistics(TimingReporter):
-    __slots__ = ("limit", "timings")
+    """
+    Averages over a rolling window of timings, which holds at most `limit` of the most recent
+    timings, and optionally only those added within the last `max_age` seconds. Running sums are
+    kept for each measure, so adding a timing and reading an average are constant time.
+    """
+
+    __slots__ = ("limit", "max_age", "_samples", "_sums", "_counts")
 
-    def __init__(self, limit: int = 100):
+    measures = MEASURES
+
+    def __init__(self, limit: int = 100, max_age: Optional[float] = None):
         self.limit = limit
-        self.timings = []
+        self.max_age = max_age
+        # the time each timing was added, the timing and its sampled measures
+        self._samples: Deque[Tuple[float, "Timing", Sample]] = deque()
+        self._sums = [0.0] * len(self.measures)
+        self._counts = [0] * len(self.measures)
+
+    @property
+    def timings(self) -> List["Timing"]:
+        self._expire()
+        return [timing for _, timing, _ in self._samples]
 
     def add(self, timing: "Timing"):
-        self.timings.append(timing)
-        if len(self.timings) > self.limit:
-            self.timings.pop(0)
+        sample = sample_timing(timing)
+        self._samples.append((clock(), timing, sample))
+        sums = self._sums
+        counts = self._counts
+        for index, value in enumerate(sample):
+            if value is not None:
+                sums[index] += value
+                counts[index] += 1
+
+        if len(self._samples) > self.limit:
+            self._evict()
+        self._expire()
+
+    def _evict(self):
+        _, _, sample = self._samples.popleft()
+        if not self._samples:
+            # reset, rather than leave behind the rounding error of the running sums
+            self._sums = [0.0] * len(self.measures)
+            self._counts = [0] * len(self.measures)
+            return
+
+        sums = self._sums
+        counts = self._counts
+        for index, value in enumerate(sample):
+            if value is not None:
+                sums[index] -= value
+                counts[index] -= 1
+
+    def _expire(self):
+        if self.max_age is None:
+            return
+        expiry = clock() - self.max_age
+        samples = self._samples
+        while samples and samples[0][0] < expiry:
+            self._evict()
+
+    def _mean(self, index: int) -> float:
+        self._expire()
+        count = self._counts[index]
+        if not count:
+            return 0
+        return self._sums[index] / count
 
     @property
     def time_to_first_byte(self):
-        if not self.timings:
-            return 0
-        return sum([timing.time_to_first_byte for timing in self.timings]) / len(
-            self.timings
-        )
+        return self._mean(0)
 
     @property
     def duration(self):
-        if not self.timings:
-            return 0
-        return sum([timing.duration for timing in self.timings]) / len(self.timings)
+        return self._mean(1)
 
     @property
     def response_duration(self):
-        if not self.timings:
+        return self._mean(2)
+
+    @property
+    def time_to_first_token(self):
+        return self._mean(3)
+
+    @property
+    def inter_token_latency(self):
+        return self._mean(4)
+
+
+class QuantileSketch(object):
+    """
+    A DDSketch style quantile sketch. Values are counted in logarithmically sized buckets, so any
+    quantile is estimated within a relative error of `accuracy`. Once there are more than
+    `max_buckets`, the lowest buckets are collapsed together, which bounds the memory while
+    keeping the upper quantiles accurate. Sketches with the same accuracy merge by adding counts.
+    """
+
+    __slots__ = (
+        "accuracy",
+        "max_buckets",
+        "gamma",
+        "_log_gamma",
+        "buckets",
+        "zero_count",
+        "count",
+        "sum",
+        "min",
+        "max",
+        "_indexes",
+        "_cumulative",
+    )
+
+    # values at or below this are counted as zero, which avoids unbounded negative indexes
+    min_value = 1e-6
+
+    def __init__(self, accuracy: float = 0.01, max_buckets: int = 512):
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # the sorted bucket indexes and their cumulative counts, built on the first read after a
+        # change, so repeated reads bisect them rather than sorting the buckets each time
+        self._indexes: Optional[List[int]] = None
+        self._cumulative: List[int] = []
+
+    def add(self, value: float):
+        self._indexes = None
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+
+        index = math.ceil(math.log(value) / self._log_gamma)
+        buckets = self.buckets
+        buckets[index] = buckets.get(index, 0) + 1
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        buckets = self.buckets
+        while len(buckets) > self.max_buckets:
+            lowest = min(buckets)
+            count = buckets.pop(lowest)
+            next_lowest = min(buckets)
+            buckets[next_lowest] += count
+
+    def merge(self, other: "QuantileSketch"):
+        """
+        Add the values counted by another sketch to this one
+        :param other: A sketch with the same accuracy
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("Only sketches with the same accuracy can be merged")
+        self._indexes = None
+        buckets = self.buckets
+        for index, count in other.buckets.items():
+            buckets[index] = buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: The quantile, between 0 and 1
+        :return: The estimated value at the quantile, or 0 when the sketch is empty
+        """
+        if not self.count:
             return 0
-        return sum([timing.response_duration for timing in self.timings]) / len(
-            self.timings
-        )
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if rank < cumulative:
+            return max(self.min, 0)
+
+        if self._indexes is None:
+            self._sort()
+        position = bisect_right(self._cumulative, rank)
+        if position == len(self._indexes):
+            return self.max
+        # the midpoint of the bucket, in terms of relative error
+        value = 2 * self.gamma ** self._indexes[position] / (self.gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def _sort(self):
+        buckets = self.buckets
+        indexes = sorted(buckets)
+        cumulative = []
+        total = self.zero_count
+        for index in indexes:
+            total += buckets[index]
+            cumulative.append(total)
+        self._indexes = indexes
+        self._cumulative = cumulative
+
+
+class TimingSketches(object):
+    """
+    Quantile sketches of each of the `MEASURES` of timings. Sketches are kept for the current and
+    the previous window of `window` seconds, and are read merged, so the quantiles reflect between
+    one and two windows of the most recent timings. The merged sketches are kept until a timing
+    is added or the windows rotate, so reading quantiles between timings doesn't merge them again.
+    """
+
+    __slots__ = (
+        "window",
+        "accuracy",
+        "_current",
+        "_previous",
+        "_rotated_at",
+        "_merged",
+    )
+
+    def __init__(self, window: float = DEFAULT_WINDOW_SECONDS, accuracy: float = 0.01):
+        self.window = window
+        self.accuracy = accuracy
+        self._current = self._new_sketches()
+        self._previous = self._new_sketches()
+        self._rotated_at = clock()
+        self._merged: List[Optional[QuantileSketch]] = [None] * len(MEASURES)
+
+    def _new_sketches(self) -> List[QuantileSketch]:
+        return [QuantileSketch(self.accuracy) for _ in MEASURES]
+
+    def _rotate(self):
+        now = clock()
+        elapsed = now - self._rotated_at
+        if elapsed < self.window:
+            return
+        if elapsed < 2 * self.window:
+            self._previous = self._current
+        else:
+            self._previous = self._new_sketches()
+        self._current = self._new_sketches()
+        self._rotated_at = now
+        self._merged = [None] * len(MEASURES)
+
+    def add(self, timing: "Timing"):
+        self._rotate()
+        for index, value in enumerate(sample_timing(timing)):
+            if value is not None:
+                self._current[index].add(value)
+                self._merged[index] = None
+
+    def sketch(self, measure: str) -> QuantileSketch:
+        """
+        :param measure: One of `MEASURES`
+        :return: A sketch of the measure over the recent windows, which is shared between reads, so
+            shouldn't be added to
+        """
+        self._rotate()
+        index = MEASURES.index(measure)
+        sketch = self._merged[index]
+        if sketch is None:
+            sketch = self._merged[index] = QuantileSketch(self.accuracy)
+            sketch.merge(self._previous[index])
+            sketch.merge(self._current[index])
+        return sketch
+
+    def quantile(self, measure: str, q: float) -> float:
+        return self.sketch(measure).quantile(q)
+
+    def quantiles(
+        self, measure: str, qs: Iterable[float] = QUANTILES
+    ) -> Dict[float, float]:
+        sketch = self.sketch(measure)
+        return {q: sketch.quantile(q) for q in qs}
 
 
 class Timing(TimingReporter):
-    __slots__ = ("start_time", "first_byte_time", "end_time")
+    """
+    Timing of a single request, optionally attributed to the provider and model which served it.
+    Tokens are only counted, along with the time of the first and last, so marking one costs a
+    clock read and never allocates.
+    """
 
-    def __init__(self):
+    __slots__ = (
+        "provider_id",
+        "model",
+        "start_time",
+        "first_byte_time",
+        "first_token_time",
+        "last_token_time",
+        "token_count",
+        "end_time",
+    )
+
+    def __init__(self, provider_id: Optional[str] = None, model: Optional[str] = None):
+        self.provider_id = provider_id
+        self.model = model
         self.start_time: Optional[float] = None
         self.first_byte_time: Optional[float] = None
+        self.first_token_time: Optional[float] = None
+        self.last_token_time: Optional[float] = None
+        self.token_count = 0
         self.end_time: Optional[float] = None
 
+    @property
+    def started(self) -> bool:
+        return self.start_time is not None
+
     def start(self):
-        self.start_time = time.time()
+        self.start_time = clock()
 
     def set_first_byte_received(self):
-        self.first_byte_time = time.time()
+        self.first_byte_time = clock()
+
+    def add_token(self):
+        now = clock()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.last_token_time = now
+        self.token_count += 1
 
     def end(self):
-        self.end_time = time.time()
+        self.end_time = clock()
 
     def __enter__(self):
         self.start()
@@ -95,3 +420,16 @@ class Timing(TimingReporter):
         if self.first_byte_time is None:
             raise AssertionError("First byte not received")
         return self.end_time - self.first_byte_time
+
+    @property
+    def time_to_first_token(self) -> float:
+        if self.first_token_time is None:
+            raise AssertionError("First token not received")
+        return self.first_token_time - self.start_time
+
+    @property
+    def inter_token_latency(self) -> float:
+        """The mean time between tokens, or 0 when fewer than two were received"""
+        if self.token_count < 2:
+            return 0
+        return (self.last_token_time - self.first_token_time) / (self.token_count - 1)
@@ -1,11 +1,19 @@
 import collections
+import json
+import re
 import time
 import weakref
 from asyncio import Lock
+from functools import lru_cache
 from typing import Any
 from typing import Callable
 from typing import Coroutine
+from typing import Dict
 from typing import Generic
+from typing import Iterator
+from typing import Optional
+from typing import Pattern
+from typing import Tuple
 from typing import Type
 from typing import TypeVar
 
@@ -137,3 +145,412 @@ def recursive_update(original_dict, update_dict):
                 new_value = value(original_dict.get(key))
             original_dict[key] = new_value
     return original_dict
+
+
+JSON_BRACKET = re.compile(rb"[\[\]{}]")
+# matches the opening quote of a string, or a bracket
+JSON_TOKEN = re.compile(rb'["\[\]{}]')
+# matches a scalar value other than a string
+JSON_SCALAR = re.compile(rb"[^\s,\]}]+")
+JSON_OBJECT_START = re.compile(rb"\s*{")
+# matches the key of a member, with the colon that follows
+JSON_KEY = re.compile(rb'\s*("[^"\\]*(?:\\.[^"\\]*)*")\s*:\s*')
+# matches what follows the value of a member
+JSON_SEPARATOR = re.compile(rb"\s*([,}])")
+JSON_WHITESPACE = b" \t\n\r"
+# the bytes which end a scalar value other than a string, scanning backwards
+JSON_DELIMITERS = b' \t\n\r,:[]{}"'
+BACKSLASH = ord("\\")
+COLON = ord(":")
+COMMA = ord(",")
+OPENING_BRACE = ord("{")
+CLOSING_BRACE = ord("}")
+QUOTE = ord('"')
+
+
+@lru_cache(maxsize=32)
+def _json_key(key: str) -> bytes:
+    return json.dumps(key, ensure_ascii=False).encode("utf-8")
+
+
+@lru_cache(maxsize=32)
+def _json_string_member(key: str) -> Pattern[bytes]:
+    escaped_key = re.escape(_json_key(key))
+    return re.compile(escaped_key + rb'\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+@lru_cache(maxsize=128)
+def _json_string_contents(value: str) -> bytes:
+    # dump to escape the value, then strip the quotes
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")[1:-1]
+
+
+def _json_top_level(raw: bytes, end: int) -> bool:
+    # whether the end is plainly outside any string of the object, and not nested, as there's no
+    # bracket but the opening of the object before it, and no escaped quote to miscount
+    start = raw.find(b"{", 0, end)
+    return (
+        start >= 0
+        and not raw[:start].strip()
+        and JSON_BRACKET.search(raw, start + 1, end) is None
+        and raw.find(b"\\", start, end) < 0
+        and raw.count(b'"', start, end) % 2 == 0
+    )
+
+
+def _json_object_end(raw: bytes) -> int:
+    # the position of the brace closing an object, found from the end, as searching for it with a
+    # regex would try every brace in the document
+    end = len(raw)
+    while end and raw[end - 1] in JSON_WHITESPACE:
+        end -= 1
+    return end - 1 if end and raw[end - 1] == CLOSING_BRACE else -1
+
+
+def find_json_string(raw: bytes, key: str) -> Optional[Tuple[int, int]]:
+    """
+    Finds a top-level string value in a raw JSON object, without decoding the document.
+
+    The key is matched directly when only plain members precede it, as in a streamed chunk,
+    otherwise the object is scanned key by key, and only as far as the key.
+    :param raw: The encoded JSON object
+    :param key: The top-level key to find
+    :return: The start and end positions of the string's contents (excluding the quotes), or
+        None if the key isn't present at the top level with a string value
+    """
+    match = _json_string_member(key).search(raw)
+    if match is not None and _json_top_level(raw, match.start()):
+        return match.span(1)
+    try:
+        for member, start, end in JSONScanner(raw).members():
+            if member == key:
+                if raw.startswith(b'"', start):
+                    return start + 1, end - 1
+                return None
+    except ValueError:
+        pass
+    return None
+
+
+def prefix_json_string(raw: bytes, key: str, prefix: str) -> Optional[bytes]:
+    """
+    Prefixes a top-level string value in a raw JSON object, leaving the rest of the document
+    untouched.
+    :param raw: The encoded JSON object
+    :param key: The top-level key whose value should be prefixed
+    :param prefix: The prefix to prepend to the value
+    :return: The updated document, or None if the key isn't present at the top level with a
+        string value
+    """
+    span = find_json_string(raw, key)
+    if span is None:
+        return None
+    start = span[0]
+    return raw[:start] + _json_string_contents(prefix) + raw[start:]
+
+
+class JSONScanner(object):
+    """
+    Scans the top-level members of a raw JSON object key by key, skipping over their values
+    without decoding them. Strings are skipped with `bytes.find`, so a long string, like an
+    embedded image, costs next to nothing, while every other step of the scan runs in Python.
+    """
+
+    __slots__ = ("raw", "steps", "position")
+
+    def __init__(self, raw: bytes, limit: Optional[int] = None):
+        """
+        :param raw: The encoded JSON object
+        :param limit: The most steps to take, past which the scan fails, since decoding the
+            document outright is cheaper by then
+        """
+        self.raw = raw
+        self.steps = limit
+        # where the members which are yet to be scanned start, or end when scanning backwards
+        self.position = 0
+
+    def _step(self):
+        if self.steps is not None:
+            self.steps -= 1
+            if self.steps < 0:
+                raise ValueError("JSON scan exceeded its limit")
+
+    def _string_end(self, start: int) -> int:
+        raw = self.raw
+        end = raw.find(b'"', start + 1)
+        # a quote preceded by an odd number of backslashes is escaped
+        while end > 0 and raw[end - 1] == BACKSLASH:
+            self._step()
+            position = end - 2
+            while raw[position] == BACKSLASH:
+                position -= 1
+            if (end - position) % 2:
+                break
+            end = raw.find(b'"', end + 1)
+        if end < 0:
+            raise ValueError("Unterminated JSON string")
+        return end + 1
+
+    def _string_start(self, end: int) -> int:
+        # the opening quote of the string which the quote at `end` closes
+        raw = self.raw
+        start = raw.rfind(b'"', 0, end)
+        while start > 0 and raw[start - 1] == BACKSLASH:
+            self._step()
+            position = start - 2
+            while raw[position] == BACKSLASH:
+                position -= 1
+            if (start - position) % 2:
+                break
+            start = raw.rfind(b'"', 0, start)
+        if start < 0:
+            raise ValueError("Unterminated JSON string")
+        return start
+
+    def _space_start(self, end: int) -> int:
+        raw = self.raw
+        while end > 0 and raw[end - 1] in JSON_WHITESPACE:
+            end -= 1
+        return end
+
+    def _value_end(self, start: int) -> int:
+        raw = self.raw
+        if raw.startswith(b'"', start):
+            return self._string_end(start)
+        if not raw.startswith((b"{", b"["), start):
+            match = JSON_SCALAR.match(raw, start)
+            if match is None:
+                raise ValueError("Missing JSON value")
+            return match.end()
+
+        depth = 0
+        position = start
+        while True:
+            self._step()
+            match = JSON_TOKEN.search(raw, position)
+            if match is None:
+                raise ValueError("Unterminated JSON value")
+            token = match.group()
+            if token == b'"':
+                position = self._string_end(match.start())
+                continue
+            position = match.end()
+            if token in (b"{", b"["):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return position
+
+    def members(self) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yields each top-level member as the scan reaches it
+        :return: The key of each member, with the start and end positions of its value
+        :raises ValueError: When the document isn't an object, or the scan exceeds its limit
+        """
+        raw = self.raw
+        match = JSON_OBJECT_START.match(raw)
+        if match is None:
+            raise ValueError("JSON document isn't an object")
+        position = self.position = match.end()
+        first = True
+        while True:
+            self._step()
+            key = JSON_KEY.match(raw, position)
+            if key is None:
+                # only an empty object lacks a first key
+                separator = first and JSON_SEPARATOR.match(raw, position)
+                if separator and separator.group(1) == b"}":
+                    return
+                raise ValueError("Missing JSON key")
+            start = key.end()
+            end = self._value_end(start)
+            yield json.loads(key.group(1)), start, end
+            separator = JSON_SEPARATOR.match(raw, end)
+            if separator is None:
+                raise ValueError("Missing JSON separator")
+            if separator.group(1) == b"}":
+                return
+            position = self.position = separator.end()
+            first = False
+
+    def reversed_members(self) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yields each top-level member from the last, as the scan reaches it, for as long as their
+        values are strings or other scalars, since scanning backwards over a container can't tell
+        its brackets apart from those of the strings within it
+        :return: The key of each member, with the start and end positions of its value
+        :raises ValueError: When the document isn't an object, the scan reaches a container, or
+            exceeds its limit
+        """
+        raw = self.raw
+        end = self.position = _json_object_end(raw)
+        if end < 0:
+            raise ValueError("JSON document isn't an object")
+        while True:
+            self._step()
+            end = self._space_start(end)
+            if end and raw[end - 1] == QUOTE:
+                start = self._string_start(end - 1)
+            else:
+                start = end
+                while start > 0 and raw[start - 1] not in JSON_DELIMITERS:
+                    start -= 1
+                if start == end:
+                    raise ValueError("JSON value isn't a string or scalar")
+
+            colon = self._space_start(start) - 1
+            if colon < 0 or raw[colon] != COLON:
+                raise ValueError("Missing JSON colon")
+            key_end = self._space_start(colon)
+            if not key_end or raw[key_end - 1] != QUOTE:
+                raise ValueError("Missing JSON key")
+            key_start = self._string_start(key_end - 1)
+            separator = self._space_start(key_start) - 1
+            if separator < 0 or raw[separator] not in (COMMA, OPENING_BRACE):
+                raise ValueError("Missing JSON separator")
+            if raw[separator] == OPENING_BRACE and raw[:separator].strip():
+                raise ValueError("JSON document isn't an object")
+
+            yield json.loads(raw[key_start:key_end]), start, end
+            self.position = key_start
+            if raw[separator] == OPENING_BRACE:
+                return
+            end = separator
+
+
+class JSONMembers(dict):
+    """
+    The start and end positions of the values of the top-level members of a raw JSON object, by
+    key. When the scan from the start of the object is cut short, the members at its end are
+    scanned backwards, and `gap` is the span between the two, which is left unscanned.
+    """
+
+    __slots__ = ("raw", "gap", "_missing")
+
+    def __init__(self, raw: bytes):
+        super().__init__()
+        self.raw = raw
+        self.gap: Optional[Tuple[int, int]] = None
+        # whether each key the index doesn't have is surely missing from the gap
+        self._missing: Dict[str, bool] = {}
+
+    def settles(self, key: str) -> bool:
+        """
+        Whether the index settles if the key is a member. A member the scan found is taken as
+        it is, like the scan stopping once it finds a member, while a key the scan didn't find
+        is settled to be missing unless it could be among the members in the gap.
+        :param key: The key of the member
+        """
+        if self.gap is None or key in self:
+            return True
+        missing = self._missing.get(key)
+        if missing is None:
+            missing = self._missing[key] = not (
+                self._in_gap(_json_key(key)) or self._escapes(key)
+            )
+        return missing
+
+    def _in_gap(self, spelling: bytes) -> bool:
+        start, end = self.gap
+        return self.raw.find(spelling, start, end) >= 0
+
+    def _escapes(self, key: str) -> bool:
+        # whether the gap could spell the key with escapes, of which a `\u` escape spells any
+        # character, which is looked for once for any ASCII key
+        spelling = b"\\u00" if key.isascii() else b"\\u"
+        escaped = self._missing.get(spelling)
+        if escaped is None:
+            escaped = self._missing[spelling] = self._in_gap(spelling)
+        return escaped or ("/" in key and self._in_gap(b"\\/"))
+
+
+def json_members(raw: bytes, limit: Optional[int] = None) -> Optional[JSONMembers]:
+    """
+    Indexes the top-level members of a raw JSON object, without decoding their values. Should the
+    scan exceed its limit, the members at the end of the object are scanned backwards instead,
+    since the few members a client sends after a long conversation are as cheap to find.
+    :param raw: The encoded JSON object
+    :param limit: The most steps each scan may take, see `JSONScanner`
+    :return: The index of the members, or None if the document isn't an object, or gives a key
+        more than once
+    """
+    members = JSONMembers(raw)
+    scanner = JSONScanner(raw, limit)
+    try:
+        for key, start, end in scanner.members():
+            if key in members:
+                # decoders disagree on which of the two counts
+                return None
+            members[key] = (start, end)
+        return members
+    except ValueError:
+        if scanner.steps is None or scanner.steps >= 0:
+            # not the limit, so not valid
+            return None
+
+    head_end = scanner.position
+    scanner = JSONScanner(raw, limit)
+    tail = []
+    try:
+        for key, start, end in scanner.reversed_members():
+            if start < head_end:
+                break
+            tail.append((key, start, end))
+    except ValueError:
+        pass
+    for key, start, end in reversed(tail):
+        if key in members:
+            return None
+        members[key] = (start, end)
+    tail_start = max(scanner.position, head_end)
+    if raw[head_end:tail_start].strip(b" \t\n\r,"):
+        members.gap = (head_end, tail_start)
+    return members
+
+
+def set_json_members(
+    raw: bytes,
+    values: Dict[str, bytes],
+    members: Optional[JSONMembers] = None,
+) -> Optional[bytes]:
+    """
+    Sets top-level members of a raw JSON object, leaving the rest of the document untouched. The
+    value of an existing member is replaced, otherwise the member is appended to the object.
+    :param raw: The encoded JSON object
+    :param values: The encoded JSON values, by key
+    :param members: The index of the object from `json_members`, when it's already at hand
+    :return: The updated document, or None if the object can't be indexed
+    """
+    if members is None:
+        members = json_members(raw)
+        if members is None:
+            return None
+
+    replaced = []
+    appended = []
+    for key, value in values.items():
+        span = members.get(key)
+        if span is None:
+            appended.append(_json_key(key) + b":" + value)
+        else:
+            replaced.append((span, value))
+
+    parts = []
+    position = 0
+    for (start, end), value in sorted(replaced):
+        parts.append(raw[position:start])
+        parts.append(value)
+        position = end
+    if appended:
+        # as the last members of the object, they override any of the same key in the gap
+        start = _json_object_end(raw)
+        if start < position:
+            return None
+        parts.append(raw[position:start])
+        if members or members.gap is not None:
+            parts.append(b",")
+        parts.append(b",".join(appended))
+        position = start
+    parts.append(raw[position:])
+    return b"".join(parts)
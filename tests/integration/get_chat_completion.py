@@ -4,6 +4,7 @@ from types import SimpleNamespace
 
 from demuxai.context import ChatCompletionContext
 from demuxai.sse import JSONEvent
+from demuxai.sse import RawEvent
 from helper import provider
 
 
@@ -32,6 +33,8 @@ async def get_chat_completion():
         assert response.status_code < 300
         async for r in r_aiter:
             data = r
+            if isinstance(r, RawEvent):
+                r = r.to_json()
             if isinstance(r, JSONEvent):
                 data = r.to_dict()
             print(json.dumps(data, indent=4))
@@ -4,6 +4,7 @@ from types import SimpleNamespace
 
 from demuxai.context import CompletionContext
 from demuxai.sse import JSONEvent
+from demuxai.sse import RawEvent
 from helper import provider
 
 
@@ -29,6 +30,8 @@ async def get_fim_completion():
         assert response.status_code < 300
         async for r in r_aiter:
             data = r
+            if isinstance(r, RawEvent):
+                r = r.to_json()
             if isinstance(r, JSONEvent):
                 data = r.to_dict()
             print(json.dumps(data, indent=4))
@@ -0,0 +1,510 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+from demuxai.breaker import STATE_CLOSED
+from demuxai.breaker import STATE_OPEN
+from demuxai.context import ChatCompletionContext
+from demuxai.context import Context
+from demuxai.exceptions import ProviderConfigurationError
+from demuxai.exceptions import ProviderOverloadedError
+from demuxai.exceptions import ProviderUnavailableError
+from demuxai.model import CAPABILITY_COMPLETION
+from demuxai.model import CAPABILITY_FIM
+from demuxai.model import CAPABILITY_TOOLS
+from demuxai.model import Model
+from demuxai.provider import ProviderFullCompletionResponse
+from demuxai.provider import ProviderModelsResponse
+from demuxai.provider import ProviderStreamingCompletionResponse
+from demuxai.providers.composite import CompositeMember
+from demuxai.providers.composite import CompositeProvider
+from demuxai.providers.composite import CompositeProviderRegistry
+from demuxai.providers.composite import CompositeResponse
+from demuxai.providers.composite import CompositeStreamingCompletionResponse
+from demuxai.providers.composite import FailoverCompositeProvider
+from demuxai.providers.composite import FastestCompositeProvider
+from demuxai.providers.composite import LeastOutstandingCompositeProvider
+from demuxai.providers.composite import RoundRobinCompositeProvider
+from demuxai.providers.service import ServiceProvider
+from demuxai.settings.composite import CompositeProviderSettings
+from demuxai.settings.composite import CompositeSettings
+from demuxai.settings.provider import ProviderSettings
+from demuxai.sse import JSONEvent
+from demuxai.strategy import OBJECTIVE_THROUGHPUT
+from demuxai.timing import clock
+from demuxai.timing import Timing
+
+
+class FakeCompletionResponse(ProviderFullCompletionResponse[None]):
+    async def receive(self):
+        yield {"model": self.context.model}
+
+
+class FakeStreamingCompletionResponse(ProviderStreamingCompletionResponse[None]):
+    __slots__ = ("error", "delay", "model")
+
+    def __init__(self, provider, context, error=None, delay=0):
+        super().__init__(provider, context)
+        self.error = error
+        self.delay = delay
+        self.model = context.model
+
+    @asynccontextmanager
+    async def open(self):
+        if self.error:
+            raise self.error
+        yield None
+
+    async def receive(self):
+        await self.provider.wait(self.delay)
+        yield JSONEvent(data={"model": self.model})
+
+
+class FakeProvider(ServiceProvider):
+    def __init__(self, local_id: str, capabilities=None, error=None):
+        super().__init__(ProviderSettings(local_id, "fake", cache_seconds=0))
+        self.capabilities = capabilities or []
+        self.error = error
+        self.delay = 0
+        self.requests = []
+        self.cancelled = 0
+        # whether responses are timed, as those of a service provider are
+        self.timed = False
+
+    async def wait(self, delay):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def _get_models(self, context):
+        models = [Model(f"{self.id}/qwen", 0, self.id, self.capabilities, [])]
+        return ProviderModelsResponse(self, context, models)
+
+    async def get_completion(self, context):
+        return await self.get_chat_completion(context)
+
+    async def get_chat_completion(self, context):
+        self.requests.append(dict(context.payload))
+        if context.streaming:
+            return FakeStreamingCompletionResponse(
+                self, context, error=self.error, delay=self.delay
+            )
+        await self.wait(self.delay)
+        if self.error:
+            raise self.error
+        response = FakeCompletionResponse(self, context)
+        if self.timed:
+            response.timing = self.start_timing(context)
+        return response
+
+    async def get_fim_completion(self, context):
+        return await self.get_chat_completion(context)
+
+    async def get_embeddings(self, context):
+        return await self.get_chat_completion(context)
+
+
+def chat_context(stream: bool = False) -> ChatCompletionContext:
+    request = SimpleNamespace(
+        url=SimpleNamespace(path="/v1/chat/completions"),
+        query_params=None,
+        _json={"model": "mix", "stream": stream},
+    )
+    return ChatCompletionContext(request)
+
+
+class CompositeProviderTestCase(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.provider1 = FakeProvider(
+            "local", capabilities=[CAPABILITY_COMPLETION, CAPABILITY_FIM]
+        )
+        self.provider2 = FakeProvider(
+            "hosted",
+            capabilities=[CAPABILITY_TOOLS, CAPABILITY_COMPLETION],
+            error=httpx.ConnectError("down"),
+        )
+        self.providers = {"local": self.provider1, "hosted": self.provider2}
+        self.settings = CompositeSettings(
+            "mix",
+            "roundrobin",
+            [
+                CompositeProviderSettings("qwen", "local", temperature=0.2),
+                CompositeProviderSettings("qwen", "hosted"),
+            ],
+            name="Mix",
+            temperature=0.5,
+        )
+
+    def test_registry(self):
+        registry = CompositeProviderRegistry()
+        self.assertIs(registry.get("roundrobin"), RoundRobinCompositeProvider)
+        self.assertIs(registry.get("failover"), FailoverCompositeProvider)
+
+    def test_create(self):
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        self.assertEqual(composite.id, "mix")
+        self.assertEqual(len(composite.members), 2)
+        member1, member2 = composite.members
+        self.assertIsInstance(member1, CompositeMember)
+        self.assertEqual(member1.id, "local/qwen")
+        self.assertEqual(member1.temperature, 0.2)
+        self.assertIs(member2.provider, self.provider2)
+        self.assertEqual(member2.temperature, 0.5)
+
+    def test_create__strategy_options(self):
+        self.settings.strategy = {"objective": OBJECTIVE_THROUGHPUT, "epsilon": 0}
+        composite = FastestCompositeProvider.create(self.settings, self.providers)
+        self.assertEqual(composite.strategy._objective, OBJECTIVE_THROUGHPUT)
+        self.assertEqual(composite.strategy._epsilon, 0)
+
+    def test_create__unknown_provider(self):
+        self.settings.providers.append(CompositeProviderSettings("qwen", "missing"))
+        with self.assertRaises(ProviderConfigurationError):
+            CompositeProvider.create(self.settings, self.providers)
+
+    async def test_get_models(self):
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        response = await composite.get_models(
+            Context(SimpleNamespace(url=SimpleNamespace(path="/v1/models"), _json={}))
+        )
+        async with response.stream() as models:
+            models = [model async for model in models]
+        self.assertEqual(len(models), 1)
+        model_dict = models[0].to_dict()
+        self.assertEqual(model_dict["id"], "mix")
+        self.assertEqual(model_dict["owned_by"], "mix")
+        self.assertEqual(model_dict["capabilities"], [CAPABILITY_COMPLETION])
+        self.assertEqual(model_dict["name"], "Mix")
+
+    async def test_get_chat_completion(self):
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        context = chat_context()
+        response = await composite.get_chat_completion(context)
+        self.assertIsInstance(response, CompositeResponse)
+        async with response.stream() as response_aiter:
+            results = [data async for data in response_aiter]
+
+        self.assertEqual(results, [{"model": "qwen"}])
+        self.assertEqual(context.raw_model, "local/qwen")
+        self.assertEqual(
+            self.provider1.requests,
+            [{"model": "qwen", "stream": False, "temperature": 0.2}],
+        )
+
+    async def test_get_chat_completion__slashed_remote_id(self):
+        self.provider1.timed = True
+        self.settings.providers[0].remote_id = "openai/gpt-4o"
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        context = chat_context()
+        response = await composite.get_chat_completion(context)
+        async with response.stream() as response_aiter:
+            _ = [data async for data in response_aiter]
+
+        self.assertEqual(context.raw_model, "local/openai/gpt-4o")
+        self.assertEqual(context.model, "openai/gpt-4o")
+        self.assertEqual(self.provider1.requests[0]["model"], "openai/gpt-4o")
+        # timed under the remote ID, from which the member reads its timings
+        self.assertEqual(list(self.provider1.model_timing), ["openai/gpt-4o"])
+        member = composite.members[0]
+        self.assertGreater(member.quantile("duration", 0.5), 0)
+        self.assertGreater(member.duration, 0)
+
+    async def test_get_chat_completion__round_robin(self):
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        await composite.get_chat_completion(chat_context())
+        with self.assertRaises(httpx.ConnectError):
+            await composite.get_chat_completion(chat_context())
+        await composite.get_chat_completion(chat_context())
+        self.assertEqual(len(self.provider1.requests), 2)
+        self.assertEqual(len(self.provider2.requests), 1)
+
+    async def test_get_chat_completion__streaming(self):
+        self.provider1.error = httpx.ConnectError("down")
+        self.provider2.error = None
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        # the request is reissued to the next member, once the stream failed to open
+        context = chat_context(stream=True)
+        response = await composite.get_chat_completion(context)
+        self.assertIsInstance(response, CompositeStreamingCompletionResponse)
+        async with response.stream_encoded() as response_aiter:
+            chunks = [chunk async for chunk in response_aiter]
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(chunks[0], b'data: {"model":"qwen"}\n\n')
+        self.assertEqual(len(self.provider1.requests), 1)
+        # the temperature of the failed member isn't carried over
+        self.assertEqual(
+            self.provider2.requests,
+            [{"model": "qwen", "stream": True, "temperature": 0.5}],
+        )
+
+        # the failed member is skipped afterwards
+        context = chat_context(stream=True)
+        response = await composite.get_chat_completion(context)
+        async with response.stream_encoded() as response_aiter:
+            _ = [chunk async for chunk in response_aiter]
+        self.assertEqual(context.raw_model, "hosted/qwen")
+        self.assertEqual(len(self.provider1.requests), 1)
+
+    async def test_get_chat_completion__streaming_all_failed(self):
+        self.provider1.error = httpx.ConnectError("down")
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+        response = await composite.get_chat_completion(chat_context(stream=True))
+        with self.assertRaisesRegex(httpx.ConnectError, "down"):
+            async with response.stream_encoded() as response_aiter:
+                _ = [chunk async for chunk in response_aiter]
+        self.assertEqual(len(self.provider1.requests), 1)
+        self.assertEqual(len(self.provider2.requests), 1)
+
+    async def test_get_chat_completion__streaming_first_byte_timeout(self):
+        self.provider1.delay = 1
+        self.provider2.error = None
+        self.settings.first_byte_timeout = 0.01
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        context = chat_context(stream=True)
+        response = await composite.get_chat_completion(context)
+        async with response.stream() as response_aiter:
+            events = [event async for event in response_aiter]
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, {"model": "qwen"})
+
+        # timing out is a failure of the member, which is skipped afterwards
+        response = await composite.get_chat_completion(chat_context(stream=True))
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(len(self.provider1.requests), 1)
+
+    async def test_get_chat_completion__breaker(self):
+        self.settings.breaker = {"failure_threshold": 1}
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        await composite.get_chat_completion(chat_context())
+        with self.assertRaises(httpx.ConnectError):
+            await composite.get_chat_completion(chat_context())
+
+        member1, member2 = composite.members
+        self.assertEqual(composite.breakers.state(member2), STATE_OPEN)
+        # the open member is skipped, even though it's next in the rotation
+        for _ in range(3):
+            await composite.get_chat_completion(chat_context())
+        self.assertEqual(len(self.provider1.requests), 4)
+        self.assertEqual(len(self.provider2.requests), 1)
+
+    async def test_get_chat_completion__unavailable(self):
+        self.settings.breaker = {"failure_threshold": 1}
+        self.provider1.error = httpx.ConnectError("down")
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        for _ in range(2):
+            with self.assertRaises(httpx.ConnectError):
+                await composite.get_chat_completion(chat_context())
+        with self.assertRaises(ProviderUnavailableError):
+            await composite.get_chat_completion(chat_context())
+
+    async def test_get_chat_completion__overloaded(self):
+        self.settings.breaker = {"failure_threshold": 1}
+        self.provider1.error = ProviderOverloadedError("shed")
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        with self.assertRaises(ProviderOverloadedError):
+            await composite.get_chat_completion(chat_context())
+        # shedding the request isn't a failure of the member
+        member1, member2 = composite.members
+        self.assertEqual(composite.breakers.state(member1), STATE_CLOSED)
+
+    async def test_get_chat_completion__client_error(self):
+        self.settings.breaker = {"failure_threshold": 1}
+        request = httpx.Request("POST", "http://local/v1/chat/completions")
+        response = httpx.Response(400, request=request)
+        self.provider1.error = httpx.HTTPStatusError(
+            "bad", request=request, response=response
+        )
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+        for _ in range(2):
+            with self.assertRaises(httpx.HTTPStatusError):
+                await composite.get_chat_completion(chat_context())
+        # a bad request is no failure of the member, which is neither ejected nor failed over
+        member1, member2 = composite.members
+        self.assertEqual(composite.breakers.state(member1), STATE_CLOSED)
+        self.assertEqual(len(self.provider1.requests), 2)
+        self.assertEqual(len(self.provider2.requests), 0)
+
+    async def test_get_chat_completion__rate_limited(self):
+        self.provider2.error = None
+        self.provider1.rate_limited = lambda now=None: True
+        composite = RoundRobinCompositeProvider.create(self.settings, self.providers)
+        for _ in range(2):
+            await composite.get_chat_completion(chat_context())
+        # the member close to its rate limit is avoided
+        self.assertEqual(len(self.provider1.requests), 0)
+        self.assertEqual(len(self.provider2.requests), 2)
+
+        self.provider2.rate_limited = lambda now=None: True
+        await composite.get_chat_completion(chat_context())
+        self.assertEqual(len(self.provider1.requests), 1)
+
+    async def test_get_chat_completion__least_outstanding(self):
+        self.provider2.error = None
+        composite = LeastOutstandingCompositeProvider.create(
+            self.settings, self.providers
+        )
+        strategy = composite.strategy
+        # a member chosen for a request which is never sent to it isn't in flight
+        request = await composite._select(chat_context())
+        self.assertEqual(strategy.in_flight(request.member), 0)
+
+        response = await composite.get_chat_completion(chat_context())
+        self.assertEqual(strategy.in_flight(response.member), 1)
+        async with response.stream() as response_aiter:
+            [data async for data in response_aiter]
+        self.assertEqual(strategy.in_flight(response.member), 0)
+
+    async def test_get_fim_completion__race(self):
+        self.provider1.delay = 1
+        self.provider2.error = None
+        self.settings.race = {"delay": 0.01}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        context = chat_context()
+        response = await composite.get_fim_completion(context)
+        async with response.stream() as response_aiter:
+            results = [data async for data in response_aiter]
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(results, [{"model": "qwen"}])
+        # the request of the slower member was cancelled, and timed up to then
+        self.assertEqual(self.provider1.cancelled, 1)
+        self.assertGreaterEqual(
+            self.provider1.quantile("time_to_first_token", 0.5, model="qwen"), 0.01
+        )
+        self.assertEqual(
+            [request["temperature"] for request in self.provider2.requests], [0.5]
+        )
+
+    async def test_get_fim_completion__race_cancelled(self):
+        self.provider1.delay = 1
+        self.provider2.error = None
+        self.provider2.delay = 1
+        self.settings.race = {"delay": 0}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        task = asyncio.ensure_future(composite.get_fim_completion(chat_context()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.provider1.cancelled, 1)
+        self.assertEqual(self.provider2.cancelled, 1)
+        # the client cancelled the request, rather than either member losing the race, so
+        # neither is timed
+        self.assertEqual(list(self.provider1.model_timing), [])
+        self.assertEqual(list(self.provider2.model_timing), [])
+
+    async def test_get_fim_completion__race_primary_first(self):
+        self.provider2.error = None
+        self.provider2.delay = 1
+        self.settings.race = {"delay": 0.5}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        response = await composite.get_fim_completion(chat_context())
+        self.assertEqual(response.member.id, "local/qwen")
+        # the second member is only started after the delay
+        self.assertEqual(self.provider2.requests, [])
+
+    async def test_get_fim_completion__race_streaming(self):
+        self.provider1.delay = 1
+        self.provider2.error = None
+        self.settings.race = {"delay": 0.01}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        response = await composite.get_fim_completion(chat_context(stream=True))
+        async with response.stream_encoded() as response_aiter:
+            chunks = [chunk async for chunk in response_aiter]
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(chunks[0], b'data: {"model":"qwen"}\n\n')
+        self.assertEqual(self.provider1.cancelled, 1)
+        self.assertEqual(len(self.provider1.requests), 1)
+        # neither member is left in flight in the strategy
+        self.assertIs(composite.strategy.next(composite.members), composite.members[0])
+
+    async def test_get_fim_completion__race_without_timings(self):
+        self.provider1.delay = 0.02
+        self.provider2.error = None
+        self.settings.race = {"quantile": 0.9}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        response = await composite.get_fim_completion(chat_context())
+        # without a delay, a member without timings isn't raced
+        self.assertEqual(response.member.id, "local/qwen")
+        self.assertEqual(self.provider2.requests, [])
+        self.assertEqual(composite.hedges.requests, 0)
+
+        timing = Timing(provider_id="local", model="qwen")
+        timing.start_time = clock() - 0.01
+        timing.first_byte_time = timing.first_token_time = timing.end_time = clock()
+        self.provider1.add_timing(timing)
+        self.provider1.delay = 1
+        response = await composite.get_fim_completion(chat_context())
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(composite.hedges.requests, 1)
+
+    async def test_get_fim_completion__race_budget(self):
+        self.provider1.delay = 0.02
+        self.provider2.error = None
+        self.settings.race = {"delay": 0, "budget": 10}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+        composite.race_budget.tokens = 1
+
+        for _ in range(3):
+            await composite.get_fim_completion(chat_context())
+        # only the first request was raced, before the budget ran out
+        self.assertEqual(composite.hedges.requests, 3)
+        self.assertEqual(composite.hedges.hedged, 1)
+        self.assertEqual(len(self.provider2.requests), 1)
+
+    async def test_get_chat_completion__not_raced(self):
+        self.provider1.delay = 0.05
+        self.provider2.error = None
+        self.settings.race = {"delay": 0}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+        response = await composite.get_chat_completion(chat_context())
+        self.assertEqual(response.member.id, "local/qwen")
+        self.assertEqual(self.provider2.requests, [])
+
+    async def test_get_chat_completion__hedge(self):
+        self.provider1.delay = 1
+        self.provider2.error = None
+        self.settings.hedge = {"delay": 0.01}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+
+        response = await composite.get_chat_completion(chat_context())
+        self.assertEqual(response.member.id, "hosted/qwen")
+        self.assertEqual(self.provider1.cancelled, 1)
+        self.assertEqual(composite.hedges.requests, 1)
+        self.assertEqual(composite.hedges.hedged, 1)
+        self.assertEqual(composite.hedges.won, 1)
+
+    async def test_get_embeddings__hedge_budget(self):
+        self.provider1.delay = 0.02
+        self.provider2.error = None
+        self.settings.hedge = {"delay": 0, "budget": 10}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+        composite.hedge_budget.tokens = 1
+
+        for _ in range(3):
+            await composite.get_embeddings(chat_context())
+        # only the first request was hedged, before the budget ran out
+        self.assertEqual(composite.hedges.requests, 3)
+        self.assertEqual(composite.hedges.hedged, 1)
+        self.assertEqual(len(self.provider2.requests), 1)
+
+    async def test_get_chat_completion__streaming_not_hedged(self):
+        self.provider1.delay = 0.02
+        self.settings.hedge = {"delay": 0}
+        composite = FailoverCompositeProvider.create(self.settings, self.providers)
+        response = await composite.get_chat_completion(chat_context(stream=True))
+        async with response.stream_encoded() as response_aiter:
+            _ = [chunk async for chunk in response_aiter]
+        self.assertEqual(response.member.id, "local/qwen")
+        self.assertEqual(composite.hedges.requests, 0)
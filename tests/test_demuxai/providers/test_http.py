@@ -0,0 +1,497 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from demuxai import codec
+from demuxai.codec import Offloader
+from demuxai.context import ChatCompletionContext
+from demuxai.context import EmbeddingContext
+from demuxai.exceptions import ProviderOverloadedError
+from demuxai.limiter import ConcurrencyLimiters
+from demuxai.providers.http import HTTPCompletionResponse
+from demuxai.providers.http import HTTPEmbeddingResponse
+from demuxai.providers.http import HTTPServiceProvider
+from demuxai.providers.http import HTTPStreamingCompletionResponse
+from demuxai.settings.provider import ProviderSettings
+from demuxai.sse import JSONEvent
+from demuxai.sse import RawEvent
+
+from .base import BaseProviderTestCase
+
+
+async def async_iter(items):
+    for item in items:
+        yield item
+
+
+class DummyHTTPProvider(HTTPServiceProvider):
+    async def _get_models(self, context):
+        pass
+
+    class Meta:
+        type = "test-http"
+
+
+class HTTPCompletionResponseTestCase(BaseProviderTestCase):
+    provider_class = DummyHTTPProvider
+    provider_type = "test-http"
+
+    def setUp(self):
+        super().setUp()
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/chat/completions"),
+            query_params=None,
+            _json={"model": "qwen"},
+        )
+        self.context = ChatCompletionContext(request)
+
+    async def _receive(self, content, decode=False):
+        upstream_response = httpx.Response(
+            200,
+            content=content,
+            headers={"content-type": "application/json; charset=utf-8"},
+        )
+        response = HTTPCompletionResponse(
+            self.provider, self.context, upstream_response
+        )
+        response.decode = decode
+        async with response.stream() as response_aiter:
+            return response, [data async for data in response_aiter]
+
+    async def test_receive__passthrough(self):
+        response, results = await self._receive(
+            b'{"id":"1","model":"qwen","choices":[{"message":{"content":"hi"}}]}'
+        )
+        self.assertEqual(
+            results,
+            [
+                b'{"id":"1","model":"test-test-http/qwen",'
+                b'"choices":[{"message":{"content":"hi"}}]}'
+            ],
+        )
+        self.assertEqual(
+            response.headers["content-type"], "application/json; charset=utf-8"
+        )
+
+    async def test_receive__without_model(self):
+        _, results = await self._receive(b'{"id":"1"}')
+        self.assertEqual(results, [b'{"id":"1"}'])
+
+    async def test_receive__falls_back_to_decoding(self):
+        _, results = await self._receive(b'{"id":"1","model":null}')
+        self.assertEqual(results, [b'{"id":"1","model":"test-test-http/None"}'])
+
+    async def test_receive__falls_back_to_decoding__nested_model(self):
+        content = b'{"id":"1","choices":[{"model":"qwen"}]}'
+        _, results = await self._receive(content)
+        self.assertEqual(results, [content])
+
+    async def test_receive__decode(self):
+        _, results = await self._receive(b'{"id":"1","model":"qwen"}', decode=True)
+        self.assertEqual(results, [{"id": "1", "model": "test-test-http/qwen"}])
+
+    async def test_receive__blocking_recorded(self):
+        offloader = Offloader()
+        with patch.object(codec, "offloader", offloader):
+            await self._receive(b'{"id":"1","model":"qwen"}')
+            await self._receive(b'{"id":"1","model":"qwen"}', decode=True)
+        self.assertEqual(offloader.blocking.count, 2)
+        self.assertEqual(offloader.offloaded, 0)
+
+    async def test_receive__offloaded(self):
+        offloader = Offloader(threshold=8)
+        self.addCleanup(offloader.shutdown)
+        with patch.object(codec, "offloader", offloader):
+            _, results = await self._receive(b'{"id":"1","model":"qwen"}')
+            _, decoded = await self._receive(b'{"id":"1","model":"qwen"}', decode=True)
+        self.assertEqual(results, [b'{"id":"1","model":"test-test-http/qwen"}'])
+        self.assertEqual(decoded, [{"id": "1", "model": "test-test-http/qwen"}])
+        self.assertEqual(offloader.offloaded, 2)
+
+    def test_start_timing__slashed_model(self):
+        self.context.update(model="openai/gpt-4o")
+        timing = self.provider.start_timing(self.context)
+        self.assertEqual(timing.model, "openai/gpt-4o")
+
+    async def test_receive__timing(self):
+        response, _ = await self._receive(b'{"id":"1"}')
+        self.assertFalse(response.timing.started)
+        self.assertEqual(self.provider.timing.timings, [])
+
+        upstream_response = httpx.Response(200, content=b'{"id":"1"}')
+        response = HTTPCompletionResponse(
+            self.provider, self.context, upstream_response
+        )
+        response.timing = self.provider.start_timing(self.context)
+        response.timing.set_first_byte_received()
+        async with response.stream() as response_aiter:
+            _ = [data async for data in response_aiter]
+
+        timing = response.timing
+        self.assertEqual(self.provider.timing.timings, [timing])
+        self.assertEqual(self.provider.model_timing["qwen"].timings, [timing])
+        self.assertEqual(timing.provider_id, "test-test-http")
+        self.assertEqual(timing.model, "qwen")
+        self.assertEqual(timing.token_count, 1)
+        self.assertIsNotNone(timing.end_time)
+
+
+class HTTPEmbeddingResponseTestCase(BaseProviderTestCase):
+    provider_class = DummyHTTPProvider
+    provider_type = "test-http"
+
+    async def test_receive__passthrough(self):
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/embeddings"),
+            query_params=None,
+            _json={"model": "embed", "input": "hi"},
+        )
+        context = EmbeddingContext(request)
+        upstream_response = httpx.Response(
+            200,
+            content=b'{"object":"list","data":[{"embedding":[0.1,-0.2]}],"model":"embed"}',
+            headers={"content-type": "application/json"},
+        )
+        response = HTTPEmbeddingResponse(self.provider, context, upstream_response)
+        async with response.stream() as response_aiter:
+            results = [data async for data in response_aiter]
+        self.assertEqual(
+            results,
+            [
+                b'{"object":"list","data":[{"embedding":[0.1,-0.2]}],'
+                b'"model":"test-test-http/embed"}'
+            ],
+        )
+
+
+class HTTPStreamingCompletionResponseTestCase(BaseProviderTestCase):
+    provider_class = DummyHTTPProvider
+    provider_type = "test-http"
+
+    def setUp(self):
+        super().setUp()
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/chat/completions"),
+            query_params=None,
+            _json={"model": "qwen", "stream": True},
+        )
+        self.context = ChatCompletionContext(request)
+
+    async def _receive(self, chunks, decode=False):
+        response = HTTPStreamingCompletionResponse(self.provider, self.context, None)
+        response.decode = decode
+        response.upstream_aiter = async_iter(chunks)
+        return [event async for event in response.receive()]
+
+    async def test_receive__rewrites_model_bytes(self):
+        events = await self._receive(
+            [
+                b'data: {"id":"1","model":"qwen","choices":[{"delta":{"content":"a b"}}]}\n\n',
+                b"data: [DONE]\n\n",
+            ]
+        )
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], RawEvent)
+        self.assertEqual(
+            events[0].data,
+            b'{"id":"1","model":"test-test-http/qwen",'
+            b'"choices":[{"delta":{"content":"a b"}}]}',
+        )
+
+    async def test_receive__without_model(self):
+        events = await self._receive([b'data: {"id":"1"}\n\n'])
+        self.assertIsInstance(events[0], RawEvent)
+        self.assertEqual(events[0].data, b'{"id":"1"}')
+
+    async def test_receive__falls_back_to_decoding(self):
+        events = await self._receive([b'data: {"id":"1","model":null}\n\n'])
+        self.assertIsInstance(events[0], JSONEvent)
+        self.assertEqual(events[0].data, {"id": "1", "model": "test-test-http/None"})
+
+    async def test_receive__nested_model_untouched(self):
+        events = await self._receive([b'data: {"choices":[{"model":"x"}]}\n\n'])
+        self.assertIsInstance(events[0], JSONEvent)
+        self.assertEqual(events[0].data, {"choices": [{"model": "x"}]})
+
+    async def test_receive__decode(self):
+        events = await self._receive(
+            [b'data: {"id":"1","model":"qwen"}\n\n'], decode=True
+        )
+        self.assertIsInstance(events[0], JSONEvent)
+        self.assertEqual(events[0].data, {"id": "1", "model": "test-test-http/qwen"})
+
+    async def test_transmit__fused(self):
+        response = HTTPStreamingCompletionResponse(self.provider, self.context, None)
+        response.upstream_aiter = async_iter(
+            [b'data: {"id":"1","model":"qwen"}\n\ndata: [DONE]\n\n']
+        )
+        chunks = [chunk async for chunk in response.transmit()]
+        self.assertEqual(
+            chunks,
+            [
+                b'data: {"id":"1","model":"test-test-http/qwen"}\n\n',
+                b"data: [DONE]\n\n",
+            ],
+        )
+
+    async def test_stream_encoded__timing(self):
+        chunks = [
+            b'data: {"id":"1","model":"qwen"}\n\ndata: {"id":"1","model":"qwen"}\n\n',
+            b"data: [DONE]\n\n",
+        ]
+
+        class UpstreamResponse(object):
+            status_code = 200
+            headers = {}
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, exc_type, exc_val, exc_tb):
+                pass
+
+            def aiter_bytes(self):
+                return async_iter(chunks)
+
+        response = HTTPStreamingCompletionResponse(
+            self.provider, self.context, UpstreamResponse()
+        )
+        response.timing = self.provider.start_timing(self.context)
+        async with response.stream_encoded() as response_aiter:
+            _ = [chunk async for chunk in response_aiter]
+
+        timing = response.timing
+        self.assertEqual(self.provider.model_timing["qwen"].timings, [timing])
+        self.assertEqual(timing.token_count, 2)
+        self.assertGreaterEqual(timing.first_token_time, timing.first_byte_time)
+        self.assertGreaterEqual(timing.end_time, timing.last_token_time)
+
+    async def test_transmit__decode(self):
+        response = HTTPStreamingCompletionResponse(self.provider, self.context, None)
+        response.decode = True
+        response.upstream_aiter = async_iter([b'data: {"id":"1","model":"qwen"}\n\n'])
+        chunks = [chunk async for chunk in response.transmit()]
+        self.assertEqual(
+            chunks,
+            [
+                b'data: {"id":"1","model":"test-test-http/qwen"}\n\n',
+                b"data: [DONE]\n\n",
+            ],
+        )
+
+    async def test_prepare__retryable_status(self):
+        request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+        upstream = httpx.Response(503, request=request)
+        response = HTTPStreamingCompletionResponse(self.provider, self.context, None)
+        await response.prepare(upstream)
+        self.assertEqual(response.status_code, 503)
+
+        response.raise_for_retryable_status = True
+        with self.assertRaises(httpx.HTTPStatusError):
+            await response.prepare(upstream)
+
+        # statuses a retry wouldn't fix are still streamed downstream
+        await response.prepare(httpx.Response(400, request=request))
+        self.assertEqual(response.status_code, 400)
+
+
+class HTTPServiceProviderTestCase(BaseProviderTestCase):
+    provider_class = DummyHTTPProvider
+    provider_type = "test-http"
+
+    def setUp(self):
+        super().setUp()
+        self.provider.settings.retry = {"attempts": 3, "base_delay": 0}
+        self.provider = DummyHTTPProvider(self.provider.settings)
+        self.responses = []
+        self.requests = []
+        self.provider._client = httpx.AsyncClient(
+            base_url="http://upstream",
+            transport=httpx.MockTransport(self._handle),
+        )
+
+    async def asyncTearDown(self):
+        await self.provider.shutdown()
+
+    def _handle(self, request):
+        self.requests.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def _context(self, stream=False):
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/chat/completions"),
+            query_params=None,
+            _json={"model": "qwen", "stream": stream},
+        )
+        return ChatCompletionContext(request)
+
+    async def test_post_completion__retried(self):
+        self.responses = [
+            httpx.ConnectError("refused"),
+            httpx.Response(503),
+            httpx.Response(200, json={"id": "1", "model": "qwen"}),
+        ]
+        response = await self.provider.get_chat_completion(self._context())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.responses, [])
+
+    async def test_post_completion__forwards_raw_body(self):
+        self.responses = [httpx.Response(200, json={"id": "1", "model": "qwen"})]
+        context = self._context()
+        context.raw_body = b'{ "model" : "qwen", "stream": false }'
+        await self.provider.get_chat_completion(context)
+        self.assertEqual(self.requests[0].content, context.raw_body)
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    async def test_post_completion__splices_updates(self):
+        self.responses = [httpx.Response(200, json={"id": "1", "model": "qwen"})]
+        context = self._context()
+        context.raw_body = b'{ "model" : "test/qwen", "stream": false }'
+        context.update(model="qwen")
+        await self.provider.get_chat_completion(context)
+        self.assertEqual(
+            self.requests[0].content, b'{ "model" : "qwen", "stream": false }'
+        )
+
+    async def test_post_completion__splices_small_updates(self):
+        self.responses = [httpx.Response(200, json={"id": "1", "model": "qwen"})]
+        context = self._context()
+        context.raw_body = b'{ "model" : "test/qwen", "stream": false }'
+        context.update(model="qwen")
+        await self.provider.get_chat_completion(context)
+        self.assertEqual(
+            self.requests[0].content, b'{ "model" : "qwen", "stream": false }'
+        )
+
+    async def test_post_completion__not_retryable(self):
+        self.responses = [httpx.Response(400), httpx.Response(200)]
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.provider.get_chat_completion(self._context())
+        self.assertEqual(len(self.responses), 1)
+
+    async def test_post_completion__budget(self):
+        self.provider.retrier.budget.tokens = 0
+        self.responses = [httpx.Response(503), httpx.Response(200)]
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.provider.get_chat_completion(self._context())
+        self.assertEqual(len(self.responses), 1)
+
+    async def test_stream__retried_before_first_byte(self):
+        self.responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.ReadTimeout("timeout"),
+            httpx.Response(
+                200, content=b'data: {"id":"1","model":"qwen"}\n\ndata: [DONE]\n\n'
+            ),
+        ]
+        response = await self.provider.get_chat_completion(self._context(True))
+        async with response.stream_encoded() as response_aiter:
+            chunks = [chunk async for chunk in response_aiter]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b"".join(chunks),
+            b'data: {"id":"1","model":"test-test-http/qwen"}\n\ndata: [DONE]\n\n',
+        )
+
+    async def test_stream__exhausted(self):
+        self.responses = [httpx.Response(503)] * 3 + [httpx.Response(200)]
+        response = await self.provider.get_chat_completion(self._context(True))
+        async with response.stream_encoded() as response_aiter:
+            _ = [chunk async for chunk in response_aiter]
+        # the status of the last attempt is passed through
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.responses), 1)
+
+    async def test_concurrency__stream_holds_limit(self):
+        self.provider.limiters = ConcurrencyLimiters(
+            initial_limit=1, max_limit=1, queue_size=0
+        )
+        self.responses = [httpx.Response(200, content=b"data: [DONE]\n\n")]
+        response = await self.provider.get_chat_completion(self._context(True))
+        async with response.stream_encoded() as response_aiter:
+            limiter = self.provider.get_limiter(self._context())
+            self.assertEqual(limiter.in_flight, 1)
+            with self.assertRaises(ProviderOverloadedError):
+                await self.provider.get_chat_completion(self._context())
+            _ = [chunk async for chunk in response_aiter]
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.shed, 1)
+
+    async def test_concurrency__overload(self):
+        self.provider.limiters = ConcurrencyLimiters(initial_limit=10, backoff=0.5)
+        self.responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={"id": "1", "model": "qwen"}),
+        ]
+        await self.provider.get_chat_completion(self._context())
+        limiter = self.provider.get_limiter(self._context())
+        self.assertEqual(limiter.limit, 5)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertIsNotNone(limiter.baseline)
+
+    async def test_rate_limit__updated(self):
+        self.responses = [
+            httpx.Response(
+                200,
+                json={"id": "1", "model": "qwen"},
+                headers={
+                    "X-RateLimit-Limit-Requests": "10",
+                    "X-RateLimit-Remaining-Requests": "0",
+                    "X-RateLimit-Reset-Requests": "1m",
+                },
+            ),
+        ]
+        await self.provider.get_chat_completion(self._context())
+        rate_limit = self.provider.rate_limits.get()
+        self.assertEqual(rate_limit.windows["requests"].remaining, 0)
+        self.assertTrue(self.provider.rate_limited())
+
+        # the request would wait too long for the reset, so it's shed
+        with self.assertRaises(ProviderOverloadedError) as context:
+            await self.provider.get_chat_completion(self._context())
+        self.assertGreaterEqual(context.exception.retry_after, 59)
+
+    async def test_api_keys__rotated(self):
+        self.provider = DummyHTTPProvider(
+            ProviderSettings("test-http", "test-http", api_key=["key-a", "key-b"])
+        )
+        self.provider._client = httpx.AsyncClient(
+            base_url="http://upstream",
+            transport=httpx.MockTransport(self._handle),
+        )
+        exhausted = {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "1m",
+        }
+        self.responses = [
+            httpx.Response(200, json={}),
+            httpx.Response(200, json={}, headers=exhausted),
+            httpx.Response(200, json={}),
+            httpx.Response(200, json={}),
+        ]
+        for _ in range(4):
+            await self.provider.get_chat_completion(self._context())
+        keys = [request.headers["Authorization"] for request in self.requests]
+        # requests are spread across the keys, until one is exhausted
+        self.assertEqual(
+            keys,
+            ["Bearer key-a", "Bearer key-b", "Bearer key-a", "Bearer key-a"],
+        )
+        self.assertFalse(self.provider.rate_limited())
+
+    async def test_build_client__pool(self):
+        settings = ProviderSettings(
+            "test-http",
+            "test-http",
+            url="http://upstream",
+            timeout_seconds=60,
+            pool={"max_connections": 4},
+        )
+        provider = DummyHTTPProvider(settings)
+        self.assertIsNone(provider.pool)
+        client = provider.client
+        self.assertEqual(provider.pool.transport._pool._max_connections, 4)
+        await client.aclose()
@@ -56,6 +56,11 @@ class CompositeSettingsTestCase(TestCase):
             "description": "test_description",
             "temperature": 0.7,
             "metadata": {"key": "value"},
+            "strategy": {"objective": "throughput"},
+            "breaker": {"failure_threshold": 3},
+            "race": {"delay": 0.2},
+            "hedge": {"budget": 5},
+            "first_byte_timeout": 5,
             "extra_key": "extra_value",
             "providers": [
                 {
@@ -72,6 +77,11 @@ class CompositeSettingsTestCase(TestCase):
         self.assertEqual(model_settings.description, "test_description")
         self.assertEqual(model_settings.temperature, 0.7)
         self.assertEqual(model_settings.metadata, {"key": "value"})
+        self.assertEqual(model_settings.strategy, {"objective": "throughput"})
+        self.assertEqual(model_settings.breaker, {"failure_threshold": 3})
+        self.assertEqual(model_settings.race, {"delay": 0.2})
+        self.assertEqual(model_settings.hedge, {"budget": 5})
+        self.assertEqual(model_settings.first_byte_timeout, 5)
         self.assertFalse(hasattr(model_settings, "extra_key"))
         self.assertIsInstance(model_settings.providers, list)
         self.assertEqual(len(model_settings.providers), 1)
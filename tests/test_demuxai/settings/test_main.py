@@ -16,6 +16,11 @@ class SettingsTestCase(TestCase):
         self.assertEqual(settings.cache_seconds, 1800)
         self.assertEqual(settings.timeout_seconds, 120)
         self.assertEqual(settings.api_key, "test_api_key")
+        self.assertEqual(settings.stream_flush_ms, 0)
+        self.assertEqual(settings.stream_flush_bytes, 16384)
+        self.assertEqual(settings.json_codec, "auto")
+        self.assertEqual(settings.json_offload_bytes, 1048576)
+        self.assertEqual(settings.warmup_seconds, 0)
         self.assertEqual(settings.extra, {"extra_setting": "extra_value"})
 
         self.assertEqual(len(settings.providers), 2)
@@ -177,3 +182,22 @@ demuxai:
             settings = Settings.load(f.name)
 
         self.assertSettings(settings)
+
+    def test_from_yaml_dict__stream_flush(self):
+        settings = Settings.from_yaml_dict(
+            {"stream_flush_ms": 20, "stream_flush_bytes": 4096}
+        )
+        self.assertEqual(settings.stream_flush_ms, 20)
+        self.assertEqual(settings.stream_flush_bytes, 4096)
+
+    def test_from_yaml_dict__json_codec(self):
+        settings = Settings.from_yaml_dict({"json_codec": "orjson"})
+        self.assertEqual(settings.json_codec, "orjson")
+
+    def test_from_yaml_dict__json_offload_bytes(self):
+        settings = Settings.from_yaml_dict({"json_offload_bytes": 0})
+        self.assertEqual(settings.json_offload_bytes, 0)
+
+    def test_from_yaml_dict__warmup_seconds(self):
+        settings = Settings.from_yaml_dict({"warmup_seconds": 2.5})
+        self.assertEqual(settings.warmup_seconds, 2.5)
@@ -16,6 +16,10 @@ class ProviderSettingsTestCase(TestCase):
             "timeout_seconds": 60,
             "include_models": ["model1", "model2"],
             "exclude_models": ["model3", "model4"],
+            "retry": {"attempts": 2},
+            "concurrency": {"initial_limit": 4},
+            "rate_limit": {"max_wait": 1},
+            "pool": {"http2": True},
             "extra_key": "extra_value",
         }
         provider_settings = ProviderSettings.from_yaml_dict("local_id", yaml_dict)
@@ -29,8 +33,30 @@ class ProviderSettingsTestCase(TestCase):
         self.assertEqual(provider_settings.timeout_seconds, 60)
         self.assertEqual(provider_settings.include_models, ["model1", "model2"])
         self.assertEqual(provider_settings.exclude_models, ["model3", "model4"])
+        self.assertEqual(provider_settings.retry, {"attempts": 2})
+        self.assertEqual(provider_settings.concurrency, {"initial_limit": 4})
+        self.assertEqual(provider_settings.rate_limit, {"max_wait": 1})
+        self.assertEqual(provider_settings.pool, {"http2": True})
         self.assertEqual(provider_settings.extra, {"extra_key": "extra_value"})
 
+    def test_from_yaml_dict__api_keys(self):
+        yaml_dict = {"type": "test_type", "api_key": ["key1", "key2"]}
+        provider_settings = ProviderSettings.from_yaml_dict("local_id", yaml_dict)
+        self.assertEqual(provider_settings.api_keys, ["key1", "key2"])
+        self.assertEqual(provider_settings.api_key, "key1")
+
+        provider_settings = ProviderSettings("local_id", "test_type", api_key="key1")
+        self.assertEqual(provider_settings.api_keys, ["key1"])
+
+    def test_from_yaml_dict__concurrency(self):
+        yaml_dict = {"type": "test_type"}
+        provider_settings = ProviderSettings.from_yaml_dict("local_id", dict(yaml_dict))
+        self.assertIsNone(provider_settings.concurrency)
+
+        yaml_dict["concurrency"] = True
+        provider_settings = ProviderSettings.from_yaml_dict("local_id", dict(yaml_dict))
+        self.assertEqual(provider_settings.concurrency, {})
+
     def test_from_yaml_dict__with_missing_type(self):
         yaml_dict = {
             "name": "test_provider",
@@ -0,0 +1,127 @@
+import asyncio
+from copy import deepcopy
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+from unittest import mock
+
+from demuxai.app import App
+from demuxai.context import ChatCompletionContext
+from demuxai.context import Context
+from demuxai.exceptions import ProviderNotFoundError
+from demuxai.providers.composite import FailoverCompositeProvider
+from demuxai.settings.main import Settings
+
+from .providers.test_composite import chat_context
+from .providers.test_composite import FakeProvider
+
+
+SETTINGS = {
+    "providers": {
+        "local": {"type": "fake"},
+        "hosted": {"type": "fake"},
+    },
+    "composites": {
+        "mix": {
+            "type": "failover",
+            "providers": [
+                {"remote_id": "qwen", "provider_id": "local"},
+                {"remote_id": "qwen", "provider_id": "hosted"},
+            ],
+        },
+    },
+}
+
+
+class AppTestCase(IsolatedAsyncioTestCase):
+    @mock.patch("demuxai.app.provider_registry.get")
+    async def asyncSetUp(self, mock_get):
+        mock_get.return_value = lambda settings: FakeProvider(settings.id)
+        self.app = await App.create(Settings.from_yaml_dict(deepcopy(SETTINGS)))
+
+    def test_create(self):
+        self.assertEqual(len(self.app.providers), 2)
+        self.assertEqual(len(self.app.composites), 1)
+        composite = self.app.composites[0]
+        self.assertIsInstance(composite, FailoverCompositeProvider)
+        self.assertEqual(
+            [member.id for member in composite.members], ["local/qwen", "hosted/qwen"]
+        )
+        self.assertIs(composite.members[1].provider, self.app.routes["hosted"])
+
+    async def test_get_models(self):
+        context = Context(SimpleNamespace(url=SimpleNamespace(path="/v1/models")))
+        response = await self.app.get_models(context)
+        async with response.stream() as models:
+            model_ids = [model.id async for model in models]
+        self.assertEqual(model_ids, ["local/qwen", "hosted/qwen", "mix"])
+
+    async def test_get_chat_completion__provider(self):
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/chat/completions"),
+            query_params=None,
+            _json={"model": "hosted/qwen"},
+        )
+        await self.app.get_chat_completion(ChatCompletionContext(request))
+        self.assertEqual(self.app.routes["hosted"].requests, [{"model": "qwen"}])
+
+    async def test_get_chat_completion__provider__slashed_model(self):
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/chat/completions"),
+            query_params=None,
+            _json={"model": "hosted/openai/gpt-4o"},
+        )
+        context = ChatCompletionContext(request)
+        await self.app.get_chat_completion(context)
+        self.assertEqual(
+            self.app.routes["hosted"].requests, [{"model": "openai/gpt-4o"}]
+        )
+        self.assertEqual(context.provider_id, "hosted")
+        self.assertEqual(context.model, "openai/gpt-4o")
+
+    async def test_get_chat_completion__composite(self):
+        context = chat_context()
+        response = await self.app.get_chat_completion(context)
+        self.assertIs(response.provider, self.app.composites[0])
+        self.assertEqual(context.raw_model, "local/qwen")
+        self.assertEqual(len(self.app.routes["local"].requests), 1)
+
+    async def test_get_chat_completion__not_found(self):
+        request = SimpleNamespace(
+            url=SimpleNamespace(path="/v1/chat/completions"),
+            query_params=None,
+            _json={"model": "missing"},
+        )
+        with self.assertRaises(ProviderNotFoundError):
+            await self.app.get_chat_completion(ChatCompletionContext(request))
+
+    async def test_warm_up(self):
+        self.assertTrue(self.app.ready)
+        self.app.settings.warmup_seconds = 1
+        self.app.ready = False
+        local = self.app.routes["local"]
+        local._get_models = mock.AsyncMock(side_effect=RuntimeError("down"))
+        hosted = self.app.routes["hosted"]
+        hosted._get_models = mock.AsyncMock(wraps=hosted._get_models)
+
+        with self.assertLogs("uvicorn", level="WARNING") as logs:
+            await self.app.warm_up()
+        self.assertTrue(self.app.ready)
+        self.assertIn("Warming up provider 'local' failed", logs.output[0])
+        # the models of the other provider were prefetched
+        hosted._get_models.assert_awaited_once()
+
+    async def test_warm_up__deadline(self):
+        self.app.settings.warmup_seconds = 0.01
+        self.app.ready = False
+        hosted = self.app.routes["hosted"]
+
+        async def get_models(context):
+            await asyncio.sleep(1)
+
+        hosted._get_models = get_models
+        with self.assertLogs("uvicorn", level="WARNING") as logs:
+            await self.app.warm_up()
+        self.assertTrue(self.app.ready)
+        self.assertIn(
+            "Warming up provider 'hosted' passed the deadline", logs.output[0]
+        )
@@ -0,0 +1,132 @@
+from unittest import TestCase
+
+from demuxai.breaker import CircuitBreaker
+from demuxai.breaker import CircuitBreakers
+from demuxai.breaker import STATE_CLOSED
+from demuxai.breaker import STATE_HALF_OPEN
+from demuxai.breaker import STATE_OPEN
+
+
+class CircuitBreakerTestCase(TestCase):
+    def test_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, ejection_time=10)
+        breaker.record(True, now=0)
+        breaker.record(True, now=1)
+        breaker.record(False, now=2)
+        breaker.record(True, now=3)
+        breaker.record(True, now=4)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+        breaker.record(True, now=5)
+        self.assertEqual(breaker.state, STATE_OPEN)
+        self.assertFalse(breaker.allows(now=14))
+        self.assertTrue(breaker.allows(now=15))
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+
+    def test_error_rate(self):
+        breaker = CircuitBreaker(
+            failure_threshold=10, error_rate=0.5, minimum_requests=4, window=10
+        )
+        breaker.record(True, now=0)
+        breaker.record(False, now=1)
+        breaker.record(True, now=2)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+        breaker.record(True, now=3)
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+    def test_error_rate__window(self):
+        breaker = CircuitBreaker(
+            failure_threshold=10, error_rate=0.5, minimum_requests=4, window=10
+        )
+        breaker.record(True, now=0)
+        breaker.record(True, now=1)
+        # the failures have expired from the window
+        for now in range(20, 23):
+            breaker.record(False, now=now)
+        breaker.record(True, now=23)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, ejection_time=10, probes=2)
+        breaker.record(True, now=0)
+        self.assertTrue(breaker.allows(now=10))
+        breaker.acquire(now=10)
+        self.assertTrue(breaker.allows(now=10))
+        breaker.acquire(now=10)
+        # only as many probes as allowed are in flight
+        self.assertFalse(breaker.allows(now=10))
+
+        breaker.record(False, now=11)
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+        breaker.record(False, now=12)
+        self.assertEqual(breaker.state, STATE_CLOSED)
+        self.assertEqual(breaker.trips, 0)
+
+    def test_release(self):
+        breaker = CircuitBreaker(failure_threshold=1, ejection_time=10)
+        breaker.record(True, now=0)
+        breaker.acquire(now=10)
+        self.assertFalse(breaker.allows(now=10))
+        # a cancelled probe frees its slot, without closing the breaker
+        breaker.release()
+        self.assertTrue(breaker.allows(now=10))
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+
+    def test_half_open__backoff(self):
+        breaker = CircuitBreaker(
+            failure_threshold=1, ejection_time=10, max_ejection_time=25
+        )
+        breaker.record(True, now=0)
+        self.assertEqual(breaker.open_until, 10)
+
+        breaker.acquire(now=10)
+        breaker.record(True, now=10)
+        self.assertEqual(breaker.open_until, 30)
+
+        breaker.acquire(now=30)
+        breaker.record(True, now=30)
+        self.assertEqual(breaker.open_until, 55)
+
+    def test_record__while_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, ejection_time=10)
+        breaker.record(True, now=0)
+        breaker.record(True, now=1)
+        self.assertEqual(breaker.trips, 1)
+        self.assertEqual(breaker.open_until, 10)
+
+
+class CircuitBreakersTestCase(TestCase):
+    def test_available(self):
+        breakers = CircuitBreakers(failure_threshold=1)
+        breakers.record("local", True, now=0)
+        self.assertEqual(breakers.available(["local", "hosted"], now=1), ["hosted"])
+        self.assertEqual(breakers.state("local", now=2), STATE_OPEN)
+        self.assertEqual(breakers.state("hosted", now=2), STATE_CLOSED)
+
+    def test_outlier_ejection(self):
+        breakers = CircuitBreakers(latency_factor=3.0, minimum_requests=2)
+        for now in range(2):
+            breakers.record("local", False, latency=1.0, now=now)
+            breakers.record("hosted", False, latency=1.5, now=now)
+            breakers.record("remote", False, latency=5.0, now=now)
+
+        self.assertEqual(breakers.state("remote", now=2), STATE_OPEN)
+        self.assertEqual(breakers.state("local", now=2), STATE_CLOSED)
+        self.assertEqual(breakers.state("hosted", now=2), STATE_CLOSED)
+
+    def test_outlier_ejection__last_closed(self):
+        breakers = CircuitBreakers(
+            latency_factor=3.0, minimum_requests=1, failure_threshold=1
+        )
+        breakers.record("local", False, latency=1.0, now=0)
+        breakers.record("remote", False, latency=5.0, now=0)
+        self.assertEqual(breakers.state("remote", now=2), STATE_OPEN)
+
+        # the remaining member isn't ejected, even when slower than the one ejected
+        breakers.record("local", False, latency=100.0, now=1)
+        self.assertEqual(breakers.state("local", now=2), STATE_CLOSED)
+
+    def test_outlier_ejection__disabled(self):
+        breakers = CircuitBreakers(latency_factor=None, minimum_requests=1)
+        breakers.record("local", False, latency=1.0, now=0)
+        breakers.record("remote", False, latency=5.0, now=0)
+        self.assertEqual(breakers.state("remote", now=2), STATE_CLOSED)
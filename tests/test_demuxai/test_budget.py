@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+from demuxai.budget import RetryBudget
+
+
+class RetryBudgetTestCase(TestCase):
+    def test_withdraw(self):
+        budget = RetryBudget(percent=50, max_tokens=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        # each request deposits half a token
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_deposit__max_tokens(self):
+        budget = RetryBudget(percent=10, max_tokens=1)
+        for _ in range(100):
+            budget.deposit()
+        self.assertEqual(budget.tokens, 1)
@@ -0,0 +1,138 @@
+from unittest import IsolatedAsyncioTestCase
+from unittest import mock
+from unittest import skipUnless
+from unittest import TestCase
+
+from demuxai import codec
+from demuxai.codec import CodecRegistry
+from demuxai.codec import JSONCodec
+from demuxai.codec import MsgspecCodec
+from demuxai.codec import Offloader
+from demuxai.codec import OrjsonCodec
+from demuxai.exceptions import CodecUnavailableError
+from demuxai.exceptions import UnregisteredError
+
+
+CHUNK = {
+    "id": "chatcmpl-1",
+    "model": "qwen",
+    "choices": [{"index": 0, "delta": {"content": "héllo \n"}, "finish_reason": None}],
+}
+
+
+class CodecTestMixin(object):
+    codec_class = JSONCodec
+
+    def setUp(self):
+        self.codec = self.codec_class()
+
+    def test_dumps(self):
+        data = self.codec.dumps(CHUNK)
+        self.assertIsInstance(data, bytes)
+        self.assertTrue(data.startswith(b'{"id":"chatcmpl-1","model":"qwen"'))
+
+    def test_loads(self):
+        self.assertEqual(self.codec.loads(self.codec.dumps(CHUNK)), CHUNK)
+
+    def test_loads__str(self):
+        self.assertEqual(self.codec.loads('{"a": [1, 2]}'), {"a": [1, 2]})
+
+    def test_loads__buffer(self):
+        self.assertEqual(self.codec.loads(bytearray(b'{"a": 1}')), {"a": 1})
+        self.assertEqual(self.codec.loads(memoryview(b'{"a": 1}')), {"a": 1})
+
+    def test_loads__invalid(self):
+        with self.assertRaises(ValueError):
+            self.codec.loads(b'{"a": ')
+
+
+class JSONCodecTestCase(CodecTestMixin, TestCase):
+    codec_class = JSONCodec
+
+
+@skipUnless(OrjsonCodec.is_available(), "orjson is not installed")
+class OrjsonCodecTestCase(CodecTestMixin, TestCase):
+    codec_class = OrjsonCodec
+
+
+@skipUnless(MsgspecCodec.is_available(), "msgspec is not installed")
+class MsgspecCodecTestCase(CodecTestMixin, TestCase):
+    codec_class = MsgspecCodec
+
+
+class UnavailableCodec(JSONCodec):
+    name = "unavailable"
+    module = "demuxai_missing_module"
+
+
+class CodecRegistryTestCase(TestCase):
+    def setUp(self):
+        self.registry = CodecRegistry()
+        self.registry.add(UnavailableCodec.name, UnavailableCodec)
+        self.registry.add(JSONCodec.name, JSONCodec)
+
+    def test_get_codec__auto(self):
+        self.assertIsInstance(self.registry.get_codec(), JSONCodec)
+        self.assertNotIsInstance(self.registry.get_codec(), UnavailableCodec)
+
+    def test_get_codec__name(self):
+        self.assertIsInstance(self.registry.get_codec("json"), JSONCodec)
+
+    def test_get_codec__unavailable(self):
+        with self.assertRaises(CodecUnavailableError):
+            self.registry.get_codec("unavailable")
+
+    def test_get_codec__unregistered(self):
+        with self.assertRaises(UnregisteredError):
+            self.registry.get_codec("missing")
+
+
+class UseTestCase(TestCase):
+    def tearDown(self):
+        codec.use()
+
+    def test_use(self):
+        current = codec.use("json")
+        self.assertIs(codec.current, current)
+        self.assertIsInstance(current, JSONCodec)
+        self.assertEqual(codec.dumps({"a": 1}), b'{"a":1}')
+
+    @mock.patch("demuxai.codec.registry.get_codec")
+    def test_use__auto(self, mock_get_codec):
+        mock_get_codec.return_value = JSONCodec()
+        codec.use()
+        mock_get_codec.assert_called_once_with("auto")
+        self.assertIs(codec.current, mock_get_codec.return_value)
+
+
+class OffloaderTestCase(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.offloader = Offloader(threshold=8)
+        self.addCleanup(self.offloader.shutdown)
+
+    async def test_run__inline(self):
+        self.assertEqual(await self.offloader.run(bytes.upper, b"small"), b"SMALL")
+        self.assertEqual(self.offloader.offloaded, 0)
+        self.assertEqual(self.offloader.blocking.count, 1)
+        self.assertIsNone(self.offloader._executor)
+
+    async def test_run__offloaded(self):
+        body = b'{"a": "large"}'
+        self.assertEqual(await self.offloader.run(bytes.upper, body), body.upper())
+        self.assertEqual(self.offloader.offloaded, 1)
+        self.assertEqual(self.offloader.blocking.count, 0)
+
+    async def test_run__decode(self):
+        body = b'{"a": "large"}'
+        self.assertEqual(await self.offloader.run(codec.decode, body), {"a": "large"})
+        self.assertEqual(self.offloader.offloaded, 1)
+
+    async def test_run__disabled(self):
+        self.offloader.threshold = 0
+        await self.offloader.run(bytes.upper, b'{"a": "large"}')
+        self.assertEqual(self.offloader.offloaded, 0)
+
+    def test_offload(self):
+        self.addCleanup(codec.offload)
+        self.assertIs(codec.offload(None), codec.offloader)
+        self.assertIsNone(codec.offloader.threshold)
@@ -2,7 +2,10 @@ from unittest import IsolatedAsyncioTestCase
 from unittest import TestCase
 from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
+from unittest.mock import patch
 
+from demuxai import codec
+from demuxai.codec import Offloader
 from demuxai.context import ChatCompletionContext
 from demuxai.context import CompletionContext
 from demuxai.context import Context
@@ -107,15 +110,205 @@ class ContextTestCase(IsolatedAsyncioTestCase):
         context.update(test=True)
         self.assertEqual(context.payload, {"test": True})
 
+    def test_for_path(self):
+        context = Context.for_path("/v1/models")
+        self.assertEqual(context.url_path, "/v1/models")
+        self.assertEqual(context.payload, {})
+
+    def test_copy(self):
+        self.mock_request._json = {"model": "qwen", "prompt": "a"}
+        context = ModelContext(self.mock_request)
+        copied = context.copy()
+        copied.update(model="local/codestral", prompt="b")
+        copied.url_path = "/v1/fim/completions"
+
+        self.assertIsInstance(copied, ModelContext)
+        self.assertEqual(copied.raw_model, "local/codestral")
+        self.assertEqual(copied.payload, {"model": "local/codestral", "prompt": "b"})
+        self.assertEqual(context.raw_model, "qwen")
+        self.assertEqual(context.payload, {"model": "qwen", "prompt": "a"})
+        self.assertEqual(context.url_path, self.mock_request.url.path)
+
     async def test_from_request(self):
         mock_raw_request = AsyncMock()
         mock_raw_request.method = "POST"
-        mock_raw_request._json = mock_raw_request.json.return_value = {"key": "value"}
+        mock_raw_request.body.return_value = b'{"key": "value"}'
 
         context = await Context.from_request(mock_raw_request)
-        mock_raw_request.json.assert_awaited_once()
+        mock_raw_request.body.assert_awaited_once()
         self.assertEqual(context.raw_request, mock_raw_request)
         self.assertEqual(context.payload, {"key": "value"})
+        self.assertEqual(context.raw_body, b'{"key": "value"}')
+        self.assertTrue(context.timing.started)
+
+    async def test_from_request__decoded(self):
+        mock_raw_request = AsyncMock()
+        mock_raw_request.method = "POST"
+        mock_raw_request.body.return_value = b'{"key": "a", "key": "b"}'
+
+        offloader = Offloader()
+        with patch.object(codec, "offloader", offloader):
+            context = await Context.from_request(mock_raw_request)
+        # can't be indexed, so it's decoded up front, through the offloader
+        self.assertEqual(context._payload, {"key": "b"})
+        self.assertEqual(offloader.blocking.count, 1)
+
+    @patch("demuxai.context.INDEX_MIN_STEPS", 1)
+    async def test_from_request__decoded_gap(self):
+        mock_raw_request = AsyncMock()
+        mock_raw_request.method = "POST"
+        mock_raw_request.body.return_value = b'{"a": [1], "key": "value", "b": [2]}'
+
+        offloader = Offloader(threshold=8)
+        self.addCleanup(offloader.shutdown)
+        with patch.object(codec, "offloader", offloader):
+            context = await Context.from_request(mock_raw_request)
+        # large enough to offload, and the index leaves a gap
+        self.assertEqual(context._payload, {"a": [1], "key": "value", "b": [2]})
+        self.assertEqual(offloader.offloaded, 1)
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    async def test_from_request__indexed(self):
+        mock_raw_request = AsyncMock()
+        mock_raw_request.method = "POST"
+        mock_raw_request.body.return_value = b'{"key": "value"}'
+
+        offloader = Offloader()
+        with patch.object(codec, "offloader", offloader):
+            context = await Context.from_request(mock_raw_request)
+        self.assertIsNone(context._payload)
+        self.assertEqual(offloader.blocking.count, 0)
+        self.assertEqual(context.get("key"), "value")
+
+    async def test_from_request__invalid(self):
+        mock_raw_request = AsyncMock()
+        mock_raw_request.method = "POST"
+        mock_raw_request.body.return_value = b'{"key": '
+
+        context = await Context.from_request(mock_raw_request)
+        self.assertIsNone(context._payload)
+        with self.assertRaises(ValueError):
+            _ = context.payload
+
+    def test_encode(self):
+        self.mock_request._json = {"model": "qwen"}
+        context = Context(self.mock_request)
+        self.assertEqual(context.encode(), b'{"model":"qwen"}')
+
+    def test_encode_raw_body(self):
+        raw_body = b'{"model": "qwen", "messages": []}'
+        self.mock_request._json = {"model": "qwen", "messages": []}
+        context = Context(self.mock_request)
+        context.raw_body = raw_body
+        self.assertIs(context.encode(), raw_body)
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    def test_encode_updated(self):
+        self.mock_request._json = {"model": "local/qwen", "messages": []}
+        context = ModelContext(self.mock_request)
+        context.raw_body = b'{"model": "local/qwen", "messages": []}'
+        copied = context.copy()
+        copied.update(model="qwen", temperature=0.5)
+
+        self.assertEqual(
+            copied.encode(), b'{"model": "qwen", "messages": [],"temperature":0.5}'
+        )
+        self.assertEqual(context.encode(), context.raw_body)
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    def test_encode_updated__escaped_key(self):
+        context = ModelContext(self.mock_request)
+        context.raw_body = b'{"note\\"model":"a","model":"local/qwen"}'
+        context.update(model="qwen")
+        self.assertEqual(context.encode(), b'{"note\\"model":"a","model":"qwen"}')
+
+    def test_encode_updated__small(self):
+        context = ModelContext(self.mock_request)
+        context.raw_body = b'{"model": "local/qwen", "messages": []}'
+        context.update(model="qwen")
+        self.assertEqual(context.encode(), b'{"model": "qwen", "messages": []}')
+
+    @patch("demuxai.context.INDEX_MIN_STEPS", 2)
+    def test_encode_updated__tail(self):
+        context = ModelContext(self.mock_request)
+        context.raw_body = (
+            b'{"messages": [{"role": "user", "content": "hi"}], "model": "local/qwen"}'
+        )
+        context.update(model="qwen", temperature=0.5)
+        self.assertEqual(
+            context.encode(),
+            b'{"messages": [{"role": "user", "content": "hi"}], "model": "qwen"'
+            b',"temperature":0.5}',
+        )
+        self.assertIsNone(context._payload)
+
+    @patch("demuxai.context.INDEX_MIN_STEPS", 1)
+    def test_encode_updated__gap(self):
+        context = ModelContext(self.mock_request)
+        context.raw_body = b'{"a": [1], "model": "local/qwen", "b": [2]}'
+        context.update(model="qwen")
+        # the model in the gap of the index is overridden by appending it, as the last member wins
+        self.assertEqual(
+            context.encode(),
+            b'{"a": [1], "model": "local/qwen", "b": [2],"model":"qwen"}',
+        )
+        self.assertEqual(
+            codec.decode(context.encode()), {"a": [1], "model": "qwen", "b": [2]}
+        )
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    def test_get__raw_body(self):
+        context = ChatCompletionContext(self.mock_request)
+        context.raw_body = (
+            b'{"messages": [{"role": "user", "content": "{\\"stream\\": false}"}],'
+            b' "stream": true, "stop": ["\\n"]}'
+        )
+        self.assertTrue(context.streaming)
+        self.assertEqual(context.stop_tokens, ["\n"])
+        self.assertIsNone(context.temperature)
+        # routing members don't decode the rest of the payload
+        self.assertIsNone(context._payload)
+
+        context.update(stream=False)
+        self.assertFalse(context.streaming)
+        self.assertEqual(context.payload["stream"], False)
+        self.assertEqual(len(context.payload["messages"]), 1)
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    def test_get__decoded_once(self):
+        context = CompletionContext(self.mock_request)
+        context.raw_body = b'{"prompt": "a", "suffix": "b", "stop": ["\\n"]}'
+        self.assertTrue(context.is_fim)
+        with patch("demuxai.context.codec.loads", wraps=codec.loads) as loads:
+            self.assertTrue(context.is_fim)
+        loads.assert_not_called()
+        self.assertIs(context.stop_tokens, context.stop_tokens)
+        self.assertIsNone(context._payload)
+
+    @patch("demuxai.context.INDEX_MIN_STEPS", 2)
+    def test_get__tail(self):
+        context = ChatCompletionContext(self.mock_request)
+        context.raw_body = (
+            b'{"messages": [{"role": "user", "content": "hi"}], "stream": true}'
+        )
+        self.assertTrue(context.streaming)
+        self.assertIsNone(context.temperature)
+        self.assertIsNone(context._payload)
+
+    @patch("demuxai.context.INDEX_MIN_STEPS", 1)
+    def test_get__gap(self):
+        context = ChatCompletionContext(self.mock_request)
+        context.raw_body = b'{"messages": [], "stream": true, "stop": ["\\n"]}'
+        self.assertTrue(context.streaming)
+        self.assertEqual(
+            context._payload, {"messages": [], "stream": True, "stop": ["\n"]}
+        )
+
+    def test_get__invalid(self):
+        context = Context(self.mock_request)
+        context.raw_body = b'{"model": }'
+        with self.assertRaises(ValueError):
+            context.get("model")
 
 
 class ModelContextTestCase(IsolatedAsyncioTestCase):
@@ -153,6 +346,27 @@ class ModelContextTestCase(IsolatedAsyncioTestCase):
         self.assertEqual(context.provider_id, "my-provider")
         self.assertEqual(context.model, "llama3")
 
+    def test_remote_model(self):
+        context = ModelContext(self.mock_request)
+        context.update(model="openai/gpt-4o")
+        # the model is split again, but the model sent upstream is kept whole
+        self.assertEqual(context.model, "gpt-4o")
+        self.assertEqual(context.remote_model, "openai/gpt-4o")
+
+    @patch("demuxai.context.INDEX_BYTES_PER_STEP", 1)
+    def test_update__model__raw_body(self):
+        context = ModelContext(self.mock_request)
+        context.raw_body = b'{"model": "my-provider/qwen"}'
+        context.update(model="llama3")
+        self.assertEqual(context.raw_model, "my-provider/llama3")
+        self.assertEqual(context.encode(), b'{"model": "llama3"}')
+
+    def test_raw_model__set(self):
+        context = ModelContext(self.mock_request)
+        context.raw_model = "fast"
+        self.assertIsNone(context.provider_id)
+        self.assertEqual(context.model, "fast")
+
 
 class ModelGenerationContextTestCase(IsolatedAsyncioTestCase):
     def setUp(self):
@@ -0,0 +1,141 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+from demuxai.hedge import hedge
+from demuxai.hedge import lost
+
+
+def client_error() -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    response = httpx.Response(400, request=request)
+    return httpx.HTTPStatusError("bad", request=request, response=response)
+
+
+class HedgeTestCase(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.started = []
+        self.cancelled = []
+        self.lost = []
+        self.discarded = []
+
+    async def _result(self, name, delay, error=None):
+        self.started.append(name)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError as e:
+            self.cancelled.append(name)
+            if lost(e):
+                self.lost.append(name)
+            raise
+        if error:
+            raise error
+        return name
+
+    async def _discard(self, result):
+        self.discarded.append(result)
+
+    async def test_primary_first(self):
+        result = await hedge(
+            self._result("primary", 0),
+            lambda: self._result("secondary", 0),
+            0.1,
+            self._discard,
+        )
+        self.assertEqual(result, "primary")
+        self.assertEqual(self.started, ["primary"])
+
+    async def test_secondary_wins(self):
+        result = await hedge(
+            self._result("primary", 1),
+            lambda: self._result("secondary", 0),
+            0.01,
+            self._discard,
+        )
+        self.assertEqual(result, "secondary")
+        self.assertEqual(self.cancelled, ["primary"])
+        self.assertEqual(self.lost, ["primary"])
+
+    async def test_primary_wins_after_delay(self):
+        result = await hedge(
+            self._result("primary", 0.02),
+            lambda: self._result("secondary", 1),
+            0.01,
+            self._discard,
+        )
+        self.assertEqual(result, "primary")
+        self.assertEqual(self.started, ["primary", "secondary"])
+        self.assertEqual(self.cancelled, ["secondary"])
+
+    async def test_primary_fails(self):
+        result = await hedge(
+            self._result("primary", 0, error=httpx.ConnectError("down")),
+            lambda: self._result("secondary", 0),
+            1,
+            self._discard,
+        )
+        # the secondary is started right away, without waiting on the delay
+        self.assertEqual(result, "secondary")
+
+    async def test_primary_fails__client_error(self):
+        with self.assertRaises(httpx.HTTPStatusError):
+            await hedge(
+                self._result("primary", 0, error=client_error()),
+                lambda: self._result("secondary", 0),
+                1,
+                self._discard,
+            )
+        # retrying a bad request wouldn't help
+        self.assertEqual(self.started, ["primary"])
+
+    async def test_primary_fails__client_error_after_delay(self):
+        with self.assertRaises(httpx.HTTPStatusError):
+            await hedge(
+                self._result("primary", 0.02, error=client_error()),
+                lambda: self._result("secondary", 1),
+                0.01,
+                self._discard,
+            )
+        self.assertEqual(self.cancelled, ["secondary"])
+        # the secondary didn't lose to the primary, which failed
+        self.assertEqual(self.lost, [])
+
+    async def test_both_fail(self):
+        with self.assertRaisesRegex(httpx.ConnectError, "primary"):
+            await hedge(
+                self._result("primary", 0.02, error=httpx.ConnectError("primary")),
+                lambda: self._result(
+                    "secondary", 0, error=httpx.ConnectError("secondary")
+                ),
+                0.01,
+                self._discard,
+            )
+
+    async def test_discard(self):
+        primary = asyncio.get_running_loop().create_future()
+
+        async def secondary():
+            primary.set_result("primary")
+            return "secondary"
+
+        # both succeed at once, so the primary wins and the secondary is discarded
+        result = await hedge(primary, secondary, 0, self._discard)
+        self.assertEqual(result, "primary")
+        self.assertEqual(self.discarded, ["secondary"])
+
+    async def test_cancelled(self):
+        task = asyncio.ensure_future(
+            hedge(
+                self._result("primary", 1),
+                lambda: self._result("secondary", 1),
+                0,
+                self._discard,
+            )
+        )
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        # neither lost to the other, as the caller was cancelled
+        self.assertEqual(sorted(self.cancelled), ["primary", "secondary"])
+        self.assertEqual(self.lost, [])
@@ -0,0 +1,141 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+from demuxai.exceptions import ProviderOverloadedError
+from demuxai.limiter import ConcurrencyLimiter
+from demuxai.limiter import ConcurrencyLimiters
+
+
+REQUEST = httpx.Request("POST", "http://localhost/v1/chat/completions")
+
+
+def status_error(status_code):
+    response = httpx.Response(status_code, request=REQUEST)
+    return httpx.HTTPStatusError("error", request=REQUEST, response=response)
+
+
+class ConcurrencyLimiterTestCase(IsolatedAsyncioTestCase):
+    async def test_acquire__queued(self):
+        limiter = ConcurrencyLimiter(initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.queued, 1)
+        self.assertFalse(waiter.done())
+
+        limiter.release()
+        await waiter
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.queued, 0)
+
+    async def test_acquire__queue_full(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, queue_size=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(ProviderOverloadedError) as context:
+            await limiter.acquire()
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        self.assertEqual(limiter.shed, 1)
+        waiter.cancel()
+
+    async def test_acquire__max_queue_time(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, max_queue_time=0.01)
+        await limiter.acquire()
+        with self.assertRaises(ProviderOverloadedError):
+            await limiter.acquire()
+        self.assertEqual(limiter.queued, 0)
+        self.assertEqual(limiter.in_flight, 1)
+
+    async def test_acquire__cancelled(self):
+        limiter = ConcurrencyLimiter(initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(limiter.queued, 0)
+
+        limiter.release()
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_acquire__standing_queue_shed(self):
+        limiter = ConcurrencyLimiter(initial_limit=1, queue_target=1, queue_interval=2)
+        await limiter.acquire()
+        with patch("demuxai.limiter.clock", return_value=0):
+            waiters = [asyncio.create_task(limiter.acquire()) for _ in range(3)]
+            await asyncio.sleep(0)
+
+        # the first waiter starts the interval the queue stood above its target
+        with patch("demuxai.limiter.clock", return_value=1.5):
+            limiter.release()
+            await waiters[0]
+        # within the interval, the next waiter is still admitted
+        with patch("demuxai.limiter.clock", return_value=2):
+            limiter.release()
+            await waiters[1]
+        # once the queue stood above its target for the interval, it sheds
+        with patch("demuxai.limiter.clock", return_value=4):
+            limiter.release()
+            with self.assertRaises(ProviderOverloadedError):
+                await waiters[2]
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.shed, 1)
+
+    async def test_record__increase(self):
+        limiter = ConcurrencyLimiter(initial_limit=2, max_limit=3)
+        limiter.in_flight = 2
+        limiter.record(1.0)
+        self.assertEqual(limiter.limit, 2.5)
+        for _ in range(10):
+            limiter.record(1.0)
+        self.assertEqual(limiter.limit, 3)
+
+        # an unused limit doesn't grow
+        limiter = ConcurrencyLimiter(initial_limit=4)
+        limiter.record(1.0)
+        self.assertEqual(limiter.limit, 4)
+
+    async def test_record__decrease(self):
+        limiter = ConcurrencyLimiter(initial_limit=10, min_limit=8, backoff=0.9)
+        limiter.record(exc=status_error(429))
+        self.assertEqual(limiter.limit, 9)
+        limiter.record(exc=httpx.ReadTimeout("timeout"))
+        self.assertEqual(limiter.limit, 8.1)
+        limiter.record(exc=status_error(503))
+        self.assertEqual(limiter.limit, 8)
+
+        # errors of the request itself don't signal overload
+        limiter.record(exc=status_error(400))
+        self.assertEqual(limiter.limit, 8)
+
+    async def test_record__latency(self):
+        limiter = ConcurrencyLimiter(initial_limit=10, tolerance=2.0, backoff=0.5)
+        limiter.record(1.0)
+        self.assertEqual(limiter.baseline, 1.0)
+        limiter.record(3.0)
+        self.assertEqual(limiter.limit, 5)
+        self.assertGreater(limiter.baseline, 1.0)
+
+    async def test_context_manager(self):
+        limiter = ConcurrencyLimiter(initial_limit=10)
+        with self.assertRaises(httpx.HTTPStatusError):
+            async with limiter:
+                self.assertEqual(limiter.in_flight, 1)
+                raise status_error(503)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.limit, 9)
+
+
+class ConcurrencyLimitersTestCase(IsolatedAsyncioTestCase):
+    def test_get(self):
+        limiters = ConcurrencyLimiters(initial_limit=4)
+        self.assertIs(limiters.get("qwen"), limiters.get("llama"))
+        self.assertEqual(limiters.get().limit, 4)
+
+        limiters = ConcurrencyLimiters(per_model=True)
+        self.assertIsNot(limiters.get("qwen"), limiters.get("llama"))
@@ -0,0 +1,133 @@
+from demuxai.codec import Offloader
+from demuxai.limiter import ConcurrencyLimiters
+from demuxai.metrics import render_metrics
+from demuxai.pool import PoolTransport
+from demuxai.providers.composite import RoundRobinCompositeProvider
+from demuxai.settings.composite import CompositeProviderSettings
+from demuxai.settings.composite import CompositeSettings
+from demuxai.timing import Timing
+
+from .providers.base import BaseProviderTestCase
+from .providers.test_http import DummyHTTPProvider
+
+
+class RenderMetricsTestCase(BaseProviderTestCase):
+    provider_class = DummyHTTPProvider
+    provider_type = "test-http"
+
+    def _timing(self, model: str, duration: float) -> Timing:
+        timing = Timing(provider_id=self.provider.id, model=model)
+        timing.start_time = 0
+        timing.first_byte_time = duration / 2
+        timing.end_time = duration
+        return timing
+
+    def test_render_metrics(self):
+        for _ in range(10):
+            self.provider.add_timing(self._timing("qwen", 1.0))
+        self.provider.add_timing(self._timing('say "hi"', 2.0))
+
+        metrics = render_metrics([self.provider])
+        self.assertIn("# TYPE demuxai_duration_seconds summary\n", metrics)
+        self.assertIn(
+            'demuxai_duration_seconds{provider="test-test-http",model="qwen",quantile="0.5"} '
+            "1.000000\n",
+            metrics,
+        )
+        self.assertIn(
+            'demuxai_duration_seconds_count{provider="test-test-http",model="qwen"} 10\n',
+            metrics,
+        )
+        self.assertIn(
+            'demuxai_time_to_first_byte_seconds_sum{provider="test-test-http",model="qwen"} '
+            "5.000000\n",
+            metrics,
+        )
+        self.assertIn('model="say \\"hi\\""', metrics)
+        # no tokens were timed
+        self.assertNotIn("demuxai_inter_token_latency_seconds{", metrics)
+
+    def test_render_metrics__empty(self):
+        metrics = render_metrics([self.provider])
+        self.assertNotIn("{", metrics)
+
+    def test_render_metrics__hedges(self):
+        settings = CompositeSettings(
+            "mix", "roundrobin", [CompositeProviderSettings("qwen", self.provider.id)]
+        )
+        composite = RoundRobinCompositeProvider.create(
+            settings, {self.provider.id: self.provider}
+        )
+        composite.hedges.requests = 10
+        composite.hedges.hedged = 2
+        composite.hedges.won = 1
+
+        metrics = render_metrics([self.provider], [composite])
+        self.assertIn("# TYPE demuxai_composite_hedged_total counter\n", metrics)
+        self.assertIn(
+            'demuxai_composite_hedge_requests_total{composite="mix"} 10\n', metrics
+        )
+        self.assertIn('demuxai_composite_hedged_total{composite="mix"} 2\n', metrics)
+        self.assertIn(
+            'demuxai_composite_hedge_wins_total{composite="mix"} 1\n', metrics
+        )
+
+    def test_render_metrics__limiters(self):
+        self.provider.limiters = ConcurrencyLimiters(per_model=True, initial_limit=4)
+        self.provider.limiters.get("qwen").in_flight = 3
+
+        metrics = render_metrics([self.provider])
+        self.assertIn("# TYPE demuxai_concurrency_limit gauge\n", metrics)
+        self.assertIn(
+            'demuxai_concurrency_limit{provider="test-test-http",model="qwen"} 4\n',
+            metrics,
+        )
+        self.assertIn(
+            'demuxai_concurrency_in_flight{provider="test-test-http",model="qwen"} 3\n',
+            metrics,
+        )
+        self.assertIn(
+            'demuxai_concurrency_shed_total{provider="test-test-http",model="qwen"} 0\n',
+            metrics,
+        )
+
+    def test_render_metrics__rate_limits(self):
+        self.provider.rate_limits.get().update(
+            {"x-ratelimit-limit-tokens": "1000", "x-ratelimit-remaining-tokens": "10"}
+        )
+
+        metrics = render_metrics([self.provider])
+        self.assertIn("# TYPE demuxai_ratelimit_remaining gauge\n", metrics)
+        self.assertIn(
+            'demuxai_ratelimit_remaining{provider="test-test-http",limit="tokens"} 10\n',
+            metrics,
+        )
+        self.assertIn(
+            'demuxai_ratelimit_limit{provider="test-test-http",limit="tokens"} 1000\n',
+            metrics,
+        )
+
+    def test_render_metrics__pool(self):
+        self.provider.pool = PoolTransport()
+        self.provider.pool.waiting = 2
+        self.provider.pool.waits.add(0.5)
+
+        metrics = render_metrics([self.provider])
+        self.assertIn(
+            'demuxai_pool_connections{provider="test-test-http",state="in_use"} 0\n',
+            metrics,
+        )
+        self.assertIn('demuxai_pool_waiting{provider="test-test-http"} 2\n', metrics)
+        self.assertIn(
+            'demuxai_pool_wait_seconds_count{provider="test-test-http"} 1\n', metrics
+        )
+
+    def test_render_metrics__offloader(self):
+        offloader = Offloader()
+        offloader.blocking.add(0.25)
+        offloader.offloaded = 3
+
+        metrics = render_metrics([self.provider], offloader=offloader)
+        self.assertIn('demuxai_codec_blocking_seconds{quantile="0.5"} 0.2', metrics)
+        self.assertIn("demuxai_codec_blocking_seconds_count 1\n", metrics)
+        self.assertIn("demuxai_codec_offloaded_total 3\n", metrics)
@@ -0,0 +1,71 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+from demuxai.exceptions import ProviderConfigurationError
+from demuxai.pool import PoolTransport
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """Traces a request like httpcore, once it gets a connection"""
+
+    def __init__(self):
+        self.connected = asyncio.Event()
+        self.traced = []
+
+    async def handle_async_request(self, request):
+        await self.connected.wait()
+        await request.extensions["trace"]("connection.connect_tcp.started", {})
+        self.traced.append(request)
+        return httpx.Response(200)
+
+
+class PoolTransportTestCase(IsolatedAsyncioTestCase):
+    def test_init(self):
+        pool = PoolTransport(max_connections=4, keepalive_expiry=1)
+        pool_limits = pool.transport._pool
+        self.assertEqual(pool_limits._max_connections, 4)
+        self.assertEqual(pool_limits._keepalive_expiry, 1)
+        self.assertEqual(pool.connections, [])
+        self.assertEqual(pool.in_use, 0)
+        self.assertEqual(pool.idle, 0)
+
+    def test_init__http2_unavailable(self):
+        with patch("demuxai.pool.importlib.util.find_spec", return_value=None):
+            with self.assertRaises(ProviderConfigurationError):
+                PoolTransport(http2=True)
+
+    async def test_handle_async_request__wait(self):
+        transport = TracingTransport()
+        pool = PoolTransport(transport=transport)
+        traced = []
+
+        async def trace(name, info):
+            traced.append(name)
+
+        request = httpx.Request("GET", "http://upstream", extensions={"trace": trace})
+        with patch("demuxai.pool.clock", side_effect=[1.0, 1.5]):
+            task = asyncio.create_task(pool.handle_async_request(request))
+            await asyncio.sleep(0)
+            self.assertEqual(pool.waiting, 1)
+            transport.connected.set()
+            response = await task
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(pool.waiting, 0)
+        self.assertEqual(pool.waits.count, 1)
+        self.assertAlmostEqual(pool.waits.sum, 0.5)
+        # the request's own trace is still called
+        self.assertEqual(traced, ["connection.connect_tcp.started"])
+
+    async def test_handle_async_request__pool_timeout(self):
+        class TimeoutTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                raise httpx.PoolTimeout("timeout")
+
+        pool = PoolTransport(transport=TimeoutTransport())
+        with self.assertRaises(httpx.PoolTimeout):
+            await pool.handle_async_request(httpx.Request("GET", "http://upstream"))
+        self.assertEqual(pool.waiting, 0)
+        self.assertEqual(pool.waits.count, 1)
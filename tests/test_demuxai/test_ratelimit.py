@@ -0,0 +1,145 @@
+from unittest import TestCase
+
+from demuxai.ratelimit import parse_duration
+from demuxai.ratelimit import RateLimit
+from demuxai.ratelimit import RateLimits
+
+
+HEADERS = {
+    "x-ratelimit-limit-requests": "100",
+    "x-ratelimit-remaining-requests": "50",
+    "x-ratelimit-reset-requests": "30s",
+    "x-ratelimit-limit-tokens": "10000",
+    "x-ratelimit-remaining-tokens": "9000",
+    "x-ratelimit-reset-tokens": "1m0s",
+}
+
+
+class ParseDurationTestCase(TestCase):
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("1.5"), 1.5)
+        self.assertEqual(parse_duration("1m30s"), 90)
+        self.assertEqual(parse_duration("20ms"), 0.02)
+        self.assertEqual(parse_duration("1h"), 3600)
+        self.assertIsNone(parse_duration("soon"))
+        self.assertIsNone(parse_duration("1m soon"))
+
+
+class RateLimitTestCase(TestCase):
+    def test_update(self):
+        rate_limit = RateLimit()
+        rate_limit.update(HEADERS, 200, now=0)
+        requests = rate_limit.windows["requests"]
+        self.assertEqual(requests.remaining, 50)
+        self.assertEqual(requests.limit, 100)
+        self.assertEqual(requests.reset_at, 30)
+        self.assertEqual(rate_limit.windows["tokens"].reset_at, 60)
+        self.assertEqual(rate_limit.headroom(now=0), 0.5)
+
+    def test_update__without_reset(self):
+        rate_limit = RateLimit(default_reset=10)
+        rate_limit.update({"x-ratelimit-remaining": "0"}, 200, now=0)
+        self.assertEqual(rate_limit.windows["requests"].reset_at, 10)
+        self.assertTrue(rate_limit.exhausted(now=5))
+        # once the window resets, it no longer applies
+        self.assertFalse(rate_limit.exhausted(now=10))
+        self.assertEqual(rate_limit.headroom(now=10), 1.0)
+
+    def test_update__retry_after(self):
+        rate_limit = RateLimit()
+        rate_limit.update({"retry-after": "5"}, 200, now=0)
+        self.assertFalse(rate_limit.exhausted(now=0))
+
+        rate_limit.update({"retry-after": "5"}, 429, now=0)
+        self.assertTrue(rate_limit.exhausted(now=0))
+        self.assertEqual(rate_limit.acquire(now=1), 4)
+        self.assertEqual(rate_limit.retry_after(now=1), 4)
+
+    def test_exhausted__reserve(self):
+        rate_limit = RateLimit(reserve=0.1)
+        rate_limit.update(HEADERS, 200, now=0)
+        self.assertFalse(rate_limit.exhausted(now=0))
+        rate_limit.windows["requests"].remaining = 10
+        self.assertTrue(rate_limit.exhausted(now=0))
+
+    def test_acquire(self):
+        rate_limit = RateLimit()
+        self.assertEqual(rate_limit.acquire(now=0), 0)
+
+        rate_limit.update(HEADERS, 200, now=0)
+        self.assertEqual(rate_limit.acquire(now=0), 0)
+        # only the request windows are counted down
+        self.assertEqual(rate_limit.windows["requests"].remaining, 49)
+        self.assertEqual(rate_limit.windows["tokens"].remaining, 9000)
+
+    def test_acquire__paced(self):
+        rate_limit = RateLimit(pace_below=0.2)
+        headers = dict(HEADERS, **{"x-ratelimit-remaining-requests": "10"})
+        rate_limit.update(headers, 200, now=0)
+        # what remains is spread until the reset
+        self.assertEqual(rate_limit.acquire(now=0), 0)
+        self.assertAlmostEqual(rate_limit.acquire(now=0), 3)
+        self.assertAlmostEqual(rate_limit.acquire(now=0), 6)
+
+    def test_acquire__exhausted(self):
+        rate_limit = RateLimit()
+        headers = dict(HEADERS, **{"x-ratelimit-remaining-tokens": "0"})
+        rate_limit.update(headers, 200, now=0)
+        self.assertEqual(rate_limit.acquire(now=0), 60)
+
+        self.assertIsNone(rate_limit.acquire(now=0, max_wait=5))
+        # nothing was reserved
+        self.assertEqual(rate_limit.windows["requests"].remaining, 49)
+        self.assertEqual(rate_limit.retry_after(now=0), 60)
+
+
+class RateLimitsTestCase(TestCase):
+    def test_keys(self):
+        rate_limits = RateLimits()
+        self.assertEqual([key.label for key in rate_limits.keys], [None])
+        self.assertIs(rate_limits.get(), rate_limits.keys[0].rate_limit)
+
+        rate_limits = RateLimits(["a", "b"])
+        self.assertEqual([key.label for key in rate_limits.keys], ["0", "1"])
+        self.assertEqual([key.value for key in rate_limits.keys], ["a", "b"])
+
+    def test_select(self):
+        rate_limits = RateLimits(["a", "b", "c"])
+        key_a, key_b, key_c = rate_limits.keys
+        # the least recently used key, when nothing is known of the budgets
+        self.assertIs(rate_limits.select(now=0), key_a)
+        key_a.rate_limit.acquire(now=1)
+        self.assertIs(rate_limits.select(now=1), key_b)
+
+        # the key with the most headroom
+        key_b.rate_limit.update(HEADERS, 200, now=1)
+        key_c.rate_limit.update(HEADERS, 200, now=1)
+        key_c.rate_limit.windows["requests"].remaining = 80
+        self.assertIs(rate_limits.select(now=1), key_a)
+        key_a.rate_limit.update(HEADERS, 200, now=1)
+        self.assertIs(rate_limits.select(now=1), key_c)
+
+        # the key with the fewest recent 429s
+        key_c.rate_limit.update({}, 429, now=1)
+        key_c.rate_limit.windows["requests"].remaining = 50
+        self.assertIs(rate_limits.select(now=2), key_b)
+
+    def test_select__exhausted(self):
+        rate_limits = RateLimits(["a", "b"])
+        key_a, key_b = rate_limits.keys
+        key_a.rate_limit.update({"retry-after": "10"}, 429, now=0)
+        key_b.rate_limit.update({"retry-after": "20"}, 429, now=0)
+        # the key available soonest, when all are exhausted
+        self.assertIs(rate_limits.select(now=0), key_a)
+        # until its window resets, an exhausted key is out of the rotation
+        self.assertIs(rate_limits.select(now=15), key_a)
+        key_a.rate_limit.acquire(now=15)
+        self.assertIs(rate_limits.select(now=30), key_b)
+
+    def test_exhausted(self):
+        rate_limits = RateLimits(["a", "b"])
+        self.assertFalse(rate_limits.exhausted(now=0))
+        rate_limits.get("0").update({"x-ratelimit-remaining": "0"}, 200, now=0)
+        self.assertFalse(rate_limits.exhausted(now=0))
+        rate_limits.get("1").update({"x-ratelimit-remaining": "0"}, 200, now=0)
+        self.assertTrue(rate_limits.exhausted(now=0))
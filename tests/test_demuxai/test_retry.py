@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from email.utils import format_datetime
+from unittest import IsolatedAsyncioTestCase
+from unittest import TestCase
+from unittest.mock import patch
+
+import httpx
+from demuxai.retry import classify
+from demuxai.retry import ERROR_CLIENT
+from demuxai.retry import ERROR_CONNECT
+from demuxai.retry import ERROR_OTHER
+from demuxai.retry import ERROR_RATE_LIMITED
+from demuxai.retry import ERROR_SERVER
+from demuxai.retry import ERROR_TIMEOUT
+from demuxai.retry import Retrier
+from demuxai.retry import retry_after
+
+
+REQUEST = httpx.Request("POST", "http://localhost/v1/chat/completions")
+
+
+def status_error(status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers, request=REQUEST)
+    return httpx.HTTPStatusError("error", request=REQUEST, response=response)
+
+
+class ClassifyTestCase(TestCase):
+    def test_classify(self):
+        self.assertEqual(classify(httpx.ConnectError("refused")), ERROR_CONNECT)
+        self.assertEqual(classify(httpx.ConnectTimeout("timeout")), ERROR_CONNECT)
+        self.assertEqual(classify(httpx.ReadTimeout("timeout")), ERROR_TIMEOUT)
+        self.assertEqual(classify(asyncio.TimeoutError()), ERROR_TIMEOUT)
+        self.assertEqual(classify(status_error(429)), ERROR_RATE_LIMITED)
+        self.assertEqual(classify(status_error(502)), ERROR_SERVER)
+        self.assertEqual(classify(status_error(400)), ERROR_CLIENT)
+        self.assertEqual(classify(ValueError()), ERROR_OTHER)
+
+    def test_retry_after(self):
+        self.assertIsNone(retry_after(status_error(429)))
+        self.assertIsNone(retry_after(httpx.ReadTimeout("timeout")))
+        self.assertEqual(retry_after(status_error(429, {"Retry-After": "2"})), 2.0)
+        self.assertIsNone(retry_after(status_error(429, {"Retry-After": "soon"})))
+
+        date = datetime.now(timezone.utc) + timedelta(seconds=30)
+        seconds = retry_after(status_error(503, {"Retry-After": format_datetime(date)}))
+        self.assertAlmostEqual(seconds, 30, delta=2)
+
+
+class RetrierTestCase(IsolatedAsyncioTestCase):
+    def test_next_delay__backoff(self):
+        retrier = Retrier(attempts=5, base_delay=1, max_delay=3, seed=1)
+        error = httpx.ConnectError("refused")
+        self.assertLessEqual(retrier.next_delay(1, error), 1)
+        self.assertLessEqual(retrier.next_delay(2, error), 2)
+        self.assertLessEqual(retrier.next_delay(4, error), 3)
+        self.assertIsNone(retrier.next_delay(5, error))
+
+    def test_next_delay__not_retryable(self):
+        retrier = Retrier()
+        self.assertIsNone(retrier.next_delay(1, status_error(400)))
+        self.assertIsNone(retrier.next_delay(1, ValueError()))
+
+        retrier = Retrier(retry_on=["connect"])
+        self.assertIsNone(retrier.next_delay(1, status_error(503)))
+
+    def test_next_delay__retry_after(self):
+        retrier = Retrier(base_delay=0.1, max_retry_after=5)
+        error = status_error(429, {"Retry-After": "2"})
+        self.assertEqual(retrier.next_delay(1, error), 2)
+
+        error = status_error(429, {"Retry-After": "60"})
+        self.assertIsNone(retrier.next_delay(1, error))
+
+    def test_next_delay__budget(self):
+        retrier = Retrier(budget=50)
+        retrier.budget.tokens = 1
+        error = httpx.ConnectError("refused")
+        self.assertIsNotNone(retrier.next_delay(1, error))
+        self.assertIsNone(retrier.next_delay(1, error))
+
+    async def test_call(self):
+        retrier = Retrier(attempts=3)
+        errors = [httpx.ConnectError("refused"), status_error(503)]
+
+        async def request():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        with patch("demuxai.retry.asyncio.sleep") as sleep:
+            self.assertEqual(await retrier.call(request), "ok")
+        self.assertEqual(sleep.call_count, 2)
+
+    async def test_call__exhausted(self):
+        retrier = Retrier(attempts=2)
+        calls = []
+
+        async def request():
+            calls.append(1)
+            raise status_error(503)
+
+        with patch("demuxai.retry.asyncio.sleep"):
+            with self.assertRaises(httpx.HTTPStatusError):
+                await retrier.call(request)
+        self.assertEqual(len(calls), 2)
+
+    async def test_call__not_retryable(self):
+        retrier = Retrier()
+        calls = []
+
+        async def request():
+            calls.append(1)
+            raise status_error(404)
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await retrier.call(request)
+        self.assertEqual(len(calls), 1)
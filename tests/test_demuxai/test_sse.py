@@ -1,15 +1,21 @@
-import json
+import asyncio
 from unittest import IsolatedAsyncioTestCase
 from unittest import TestCase
 
+from demuxai.sse import AsyncJSONStreamPipe
 from demuxai.sse import AsyncJSONStreamReader
 from demuxai.sse import AsyncJSONStreamWriter
+from demuxai.sse import AsyncRawJSONStreamReader
+from demuxai.sse import AsyncRawStreamReader
+from demuxai.sse import AsyncStreamCoalescer
 from demuxai.sse import AsyncStreamReader
 from demuxai.sse import AsyncStreamWriter
 from demuxai.sse import DEFAULT_DONE_SYMBOL
 from demuxai.sse import DEFAULT_EVENT_TYPE
 from demuxai.sse import Event
+from demuxai.sse import EventFramer
 from demuxai.sse import JSONEvent
+from demuxai.sse import RawEvent
 
 
 async def async_iter(items):
@@ -51,7 +57,7 @@ class TestJSONEvent(TestCase):
         plain = je.to_plain()
         self.assertIsInstance(plain, Event)
         self.assertNotIsInstance(plain, JSONEvent)
-        self.assertEqual(json.loads(plain.data), {"a": 1})
+        self.assertEqual(plain.data, b'{"a":1}')
         self.assertEqual(plain.id, "2")
 
     def test_roundtrip(self):
@@ -62,6 +68,49 @@ class TestJSONEvent(TestCase):
         self.assertEqual(restored.data, original)
 
 
+class TestRawEvent(TestCase):
+    def test_to_json(self):
+        raw = RawEvent(id="1", event="msg", data=b'{"key": "val"}', retry=100)
+        je = raw.to_json()
+        self.assertIsInstance(je, JSONEvent)
+        self.assertEqual(je.data, {"key": "val"})
+        self.assertEqual(je.id, "1")
+        self.assertEqual(je.event, "msg")
+        self.assertEqual(je.retry, 100)
+
+
+class TestEventFramer(TestCase):
+    def test_single_block(self):
+        framer = EventFramer()
+        self.assertEqual(framer.feed(b"data: hello\n\n"), [b"data: hello"])
+        self.assertIsNone(framer.flush())
+
+    def test_multiple_blocks_in_chunk(self):
+        framer = EventFramer()
+        blocks = framer.feed(b"data: one\n\ndata: two\r\n\r\ndata: three\r\r")
+        self.assertEqual(blocks, [b"data: one", b"data: two", b"data: three"])
+
+    def test_boundary_split_across_chunks(self):
+        framer = EventFramer()
+        self.assertEqual(framer.feed(b"data: one\r\n"), [])
+        self.assertEqual(framer.feed(b"\r"), [])
+        self.assertEqual(framer.feed(b"\ndata: two\n"), [b"data: one"])
+        self.assertEqual(framer.feed(b"\n"), [b"data: two"])
+
+    def test_byte_at_a_time(self):
+        framer = EventFramer()
+        blocks = []
+        for byte in b"data: a\n\ndata: b\n\n":
+            blocks.extend(framer.feed(bytes([byte])))
+        self.assertEqual(blocks, [b"data: a", b"data: b"])
+
+    def test_flush_remaining(self):
+        framer = EventFramer()
+        self.assertEqual(framer.feed(b"data: one\n\ndata: tw"), [b"data: one"])
+        self.assertEqual(framer.flush(), b"data: tw")
+        self.assertIsNone(framer.flush())
+
+
 class TestAsyncStreamReader(IsolatedAsyncioTestCase):
     async def test_simple_event(self):
         reader = AsyncStreamReader(async_iter([b"data: hello\n\n"]))
@@ -131,6 +180,25 @@ class TestAsyncStreamReader(IsolatedAsyncioTestCase):
         self.assertEqual(len(events), 1)
         self.assertEqual(events[0].data, "hello")
 
+    async def test_multiline_data(self):
+        raw = [b"data: first\ndata: second\ndata:\ndata: fourth\n\n"]
+        events = await collect(AsyncStreamReader(async_iter(raw)).stream())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, "first\nsecond\n\nfourth")
+
+    async def test_empty_data_dispatched(self):
+        raw = [b"data:\n\n"]
+        events = await collect(AsyncStreamReader(async_iter(raw)).stream())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, "")
+
+    async def test_multibyte_split_across_chunks(self):
+        raw = "data: h\u00e9llo\n\n".encode("utf-8")
+        split = raw.index(b"\xa9")
+        reader = AsyncStreamReader(async_iter([raw[:split], raw[split:]]))
+        events = await collect(reader.stream())
+        self.assertEqual(events[0].data, "h\u00e9llo")
+
     async def test_trailing_data_without_double_newline(self):
         raw = [b"data: trailing\n"]
         events = await collect(AsyncStreamReader(async_iter(raw)).stream())
@@ -159,6 +227,32 @@ class TestAsyncJSONStreamReader(IsolatedAsyncioTestCase):
         self.assertEqual(events[0].data, {"a": 1})
 
 
+class TestAsyncRawStreamReader(IsolatedAsyncioTestCase):
+    async def test_data_kept_as_bytes(self):
+        raw = [b"id: 1\ndata: first\ndata: second\n\ndata: hello\n\n"]
+        events = await collect(AsyncRawStreamReader(async_iter(raw)).stream())
+        self.assertEqual(len(events), 2)
+        self.assertIsInstance(events[0], RawEvent)
+        self.assertEqual(events[0].id, "1")
+        self.assertEqual(events[0].data, b"first\nsecond")
+        self.assertEqual(events[1].data, b"hello")
+
+
+class TestAsyncRawJSONStreamReader(IsolatedAsyncioTestCase):
+    async def test_data_not_decoded(self):
+        raw = [b'data: {"a": 1}\n\n']
+        events = await collect(AsyncRawJSONStreamReader(async_iter(raw)).stream())
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], RawEvent)
+        self.assertEqual(events[0].data, b'{"a": 1}')
+
+    async def test_done_symbol_stops(self):
+        raw = [b'data: {"a": 1}\n\ndata: [DONE]\n\ndata: {"b": 2}\n\n']
+        events = await collect(AsyncRawJSONStreamReader(async_iter(raw)).stream())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data, b'{"a": 1}')
+
+
 class TestAsyncStreamWriter(IsolatedAsyncioTestCase):
     async def test_simple_write(self):
         writer = AsyncStreamWriter(async_iter([Event(data="hello")]))
@@ -200,6 +294,23 @@ class TestAsyncStreamWriter(IsolatedAsyncioTestCase):
         self.assertIn("event: done\n", output)
         self.assertIn("data: bye\n", output)
 
+    async def test_one_chunk_per_event(self):
+        events = [Event(data="one"), Event(event="custom", id="2", data="two")]
+        chunks = await collect(AsyncStreamWriter(async_iter(events)).stream())
+        self.assertEqual(
+            chunks,
+            [
+                b"data: one\n\n",
+                b"event: custom\ndata: two\nid: 2\n\n",
+                f"data: {DEFAULT_DONE_SYMBOL}\n\n".encode(),
+            ],
+        )
+
+    async def test_multiline_data(self):
+        writer = AsyncStreamWriter(async_iter([Event(data="one\ntwo")]))
+        output = b"".join(await collect(writer.stream())).decode()
+        self.assertIn("data: one\ndata: two\n\n", output)
+
     async def test_empty_stream_still_sends_done(self):
         writer = AsyncStreamWriter(async_iter([]))
         output = b"".join(await collect(writer.stream())).decode()
@@ -210,9 +321,108 @@ class TestAsyncJSONStreamWriter(IsolatedAsyncioTestCase):
     async def test_json_event_serialized(self):
         writer = AsyncJSONStreamWriter(async_iter([JSONEvent(data={"key": "val"})]))
         output = b"".join(await collect(writer.stream())).decode()
-        self.assertIn('data: {"key": "val"}\n', output)
+        self.assertIn('data: {"key":"val"}\n', output)
 
     async def test_plain_event_passed_through(self):
         writer = AsyncJSONStreamWriter(async_iter([Event(data="plain")]))
         output = b"".join(await collect(writer.stream())).decode()
         self.assertIn("data: plain\n", output)
+
+    async def test_raw_event_written_as_is(self):
+        writer = AsyncJSONStreamWriter(async_iter([RawEvent(data=b'{"key":"val"}')]))
+        output = b"".join(await collect(writer.stream())).decode()
+        self.assertIn('data: {"key":"val"}\n', output)
+
+
+class TestAsyncJSONStreamPipe(IsolatedAsyncioTestCase):
+    async def test_passthrough(self):
+        raw = [b'data: {"a": 1}\n\ndata: {"b"', b": 2}\n\n"]
+        chunks = await collect(AsyncJSONStreamPipe(async_iter(raw)).stream())
+        self.assertEqual(
+            chunks,
+            [
+                b'data: {"a": 1}\n\n',
+                b'data: {"b": 2}\n\n',
+                f"data: {DEFAULT_DONE_SYMBOL}\n\n".encode(),
+            ],
+        )
+
+    async def test_one_chunk_per_upstream_chunk(self):
+        raw = [b'data: {"a": 1}\n\ndata: {"b": 2}\n\n']
+        chunks = await collect(AsyncJSONStreamPipe(async_iter(raw)).stream())
+        self.assertEqual(chunks[0], b'data: {"a": 1}\n\ndata: {"b": 2}\n\n')
+        self.assertEqual(len(chunks), 2)
+
+    async def test_transform(self):
+        def transform(event):
+            event.data = event.data.upper()
+            return event
+
+        raw = [b'data: {"a": "x"}\n\n']
+        pipe = AsyncJSONStreamPipe(async_iter(raw), transform=transform)
+        chunks = await collect(pipe.stream())
+        self.assertEqual(chunks[0], b'data: {"A": "X"}\n\n')
+
+    async def test_transform_to_json_event(self):
+        raw = [b'data: {"a": 1}\n\n']
+        pipe = AsyncJSONStreamPipe(async_iter(raw), transform=RawEvent.to_json)
+        chunks = await collect(pipe.stream())
+        self.assertEqual(chunks[0], b'data: {"a":1}\n\n')
+
+    async def test_done_stops_and_consumes(self):
+        consumed = []
+
+        async def upstream():
+            for chunk in [b'data: {"a": 1}\n\ndata: [DONE]\n\n', b'data: {"b": 2}\n\n']:
+                consumed.append(chunk)
+                yield chunk
+
+        chunks = await collect(AsyncJSONStreamPipe(upstream()).stream())
+        self.assertEqual(
+            chunks,
+            [b'data: {"a": 1}\n\n', f"data: {DEFAULT_DONE_SYMBOL}\n\n".encode()],
+        )
+        self.assertEqual(len(consumed), 2)
+
+    async def test_trailing_event(self):
+        raw = [b'data: {"a": 1}']
+        chunks = await collect(AsyncJSONStreamPipe(async_iter(raw)).stream())
+        self.assertEqual(chunks[0], b'data: {"a": 1}\n\n')
+
+    async def test_custom_done_event(self):
+        done = Event(event="done", data="bye")
+        pipe = AsyncJSONStreamPipe(async_iter([]), done_event=done)
+        chunks = await collect(pipe.stream())
+        self.assertEqual(chunks, [b"event: done\ndata: bye\n\n"])
+
+
+async def timed_iter(items):
+    for delay, item in items:
+        await asyncio.sleep(delay)
+        yield item
+
+
+class TestAsyncStreamCoalescer(IsolatedAsyncioTestCase):
+    async def test_isolated_chunks(self):
+        raw = [(0, b"a"), (0.05, b"b"), (0.05, b"c")]
+        coalescer = AsyncStreamCoalescer(timed_iter(raw), 0.01, 1024)
+        self.assertEqual(await collect(coalescer.stream()), [b"a", b"b", b"c"])
+
+    async def test_burst(self):
+        raw = [(0, b"a"), (0, b"b"), (0, b"c"), (0, b"d")]
+        coalescer = AsyncStreamCoalescer(timed_iter(raw), 0.05, 1024)
+        self.assertEqual(await collect(coalescer.stream()), [b"a", b"bcd"])
+
+    async def test_max_bytes(self):
+        raw = [(0, b"a"), (0, b"bb"), (0, b"cc"), (0, b"d")]
+        coalescer = AsyncStreamCoalescer(timed_iter(raw), 0.05, 4)
+        self.assertEqual(await collect(coalescer.stream()), [b"a", b"bbcc", b"d"])
+
+    async def test_deadline(self):
+        raw = [(0, b"a"), (0, b"b"), (0.1, b"c")]
+        coalescer = AsyncStreamCoalescer(timed_iter(raw), 0.05, 1024)
+        self.assertEqual(await collect(coalescer.stream()), [b"a", b"b", b"c"])
+
+    async def test_empty(self):
+        coalescer = AsyncStreamCoalescer(async_iter([]), 0.05, 1024)
+        self.assertEqual(await collect(coalescer.stream()), [])
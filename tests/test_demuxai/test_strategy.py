@@ -0,0 +1,127 @@
+from unittest import IsolatedAsyncioTestCase
+
+from demuxai.strategy import FastestStrategy
+from demuxai.strategy import LeastOutstandingStrategy
+from demuxai.strategy import OBJECTIVE_THROUGHPUT
+
+
+class Provider(object):
+    def __init__(self, ttfb: float, itl: float = 0):
+        self.quantiles = {"time_to_first_byte": ttfb, "inter_token_latency": itl}
+
+    def quantile(self, measure: str, q: float) -> float:
+        return self.quantiles.get(measure, 0)
+
+
+class FastestStrategyTestCase(IsolatedAsyncioTestCase):
+    async def test_next__ttfb(self):
+        strategy = FastestStrategy(epsilon=0)
+        slow = Provider(2.0, itl=0.01)
+        fast = Provider(1.0, itl=0.1)
+        self.assertIs(strategy.next([slow, fast]), fast)
+        self.assertIs(strategy.current, fast)
+
+    async def test_next__throughput(self):
+        strategy = FastestStrategy(objective=OBJECTIVE_THROUGHPUT, epsilon=0)
+        slow = Provider(2.0, itl=0.01)
+        fast = Provider(1.0, itl=0.1)
+        self.assertIs(strategy.next([slow, fast]), slow)
+
+    async def test_next__throughput_not_streamed(self):
+        strategy = FastestStrategy(objective=OBJECTIVE_THROUGHPUT, epsilon=0)
+        slow = Provider(2.0)
+        fast = Provider(1.0)
+        self.assertIs(strategy.next([slow, fast]), fast)
+
+    async def test_next__expected_tokens(self):
+        strategy = FastestStrategy(expected_tokens=100, epsilon=0)
+        slow = Provider(0.5, itl=0.05)
+        fast = Provider(1.0, itl=0.01)
+        self.assertEqual(strategy.score(slow), 5.5)
+        self.assertIs(strategy.next([slow, fast]), fast)
+
+    async def test_next__explores_unknown(self):
+        strategy = FastestStrategy(epsilon=0)
+        fast = Provider(1.0)
+        unknown = Provider(0)
+        self.assertIs(strategy.next([fast, unknown]), unknown)
+
+    async def test_next__epsilon(self):
+        strategy = FastestStrategy(epsilon=1, seed=1)
+        slow = Provider(2.0)
+        fast = Provider(1.0)
+        self.assertIs(strategy.next([slow, fast]), slow)
+        self.assertIs(strategy.next([fast]), fast)
+
+    def test_init__unknown_objective(self):
+        with self.assertRaises(ValueError):
+            FastestStrategy(objective="cheapest")
+
+    def test_next__empty(self):
+        with self.assertRaises(ValueError):
+            FastestStrategy().next([])
+
+
+async def enter(strategy: LeastOutstandingStrategy, things: list) -> Provider:
+    # choose a provider, and send it the request
+    thing = strategy.next(things)
+    await strategy.__aenter__()
+    return thing
+
+
+class LeastOutstandingStrategyTestCase(IsolatedAsyncioTestCase):
+    async def test_next(self):
+        strategy = LeastOutstandingStrategy(choices=0, seed=1)
+        local = Provider(1.0)
+        hosted = Provider(1.0)
+        first = await enter(strategy, [local, hosted])
+        second = await enter(strategy, [local, hosted])
+        self.assertIsNot(first, second)
+        self.assertEqual(strategy.in_flight(local), 1)
+        self.assertEqual(strategy.in_flight(hosted), 1)
+
+        strategy.current = first
+        await strategy.__aexit__(None, None, None)
+        self.assertEqual(strategy.in_flight(first), 0)
+        self.assertIs(strategy.next([local, hosted]), first)
+
+    async def test_next__not_entered(self):
+        strategy = LeastOutstandingStrategy(choices=0, seed=1)
+        local = Provider(1.0)
+        hosted = Provider(1.0)
+        chosen = strategy.next([local, hosted])
+        # the request was never sent to the chosen provider, so it isn't in flight
+        self.assertEqual(strategy.in_flight(chosen), 0)
+        other = await enter(strategy, [local, hosted])
+        self.assertEqual(strategy.in_flight(other), 1)
+        self.assertIsNot(strategy.next([local, hosted]), other)
+
+    async def test_next__weighted(self):
+        strategy = LeastOutstandingStrategy(choices=0, weighted=True, seed=1)
+        slow = Provider(3.0)
+        fast = Provider(1.0)
+        picks = [await enter(strategy, [slow, fast]) for _ in range(4)]
+        # the slow provider takes a request once the fast one has 3 in flight
+        self.assertEqual(picks, [fast, fast, fast, slow])
+
+    async def test_next__power_of_two_choices(self):
+        strategy = LeastOutstandingStrategy(seed=1)
+        things = [Provider(1.0) for _ in range(4)]
+        for _ in range(8):
+            await enter(strategy, things)
+        self.assertEqual(sum(strategy.in_flight(thing) for thing in things), 8)
+        self.assertLessEqual(max(strategy.in_flight(thing) for thing in things), 3)
+
+    async def test_exit__decrements_current(self):
+        strategy = LeastOutstandingStrategy()
+        thing = Provider(1.0)
+        strategy.next([thing])
+        with self.assertRaises(RuntimeError):
+            async with strategy:
+                self.assertEqual(strategy.in_flight(thing), 1)
+                raise RuntimeError("failed")
+        self.assertEqual(strategy.in_flight(thing), 0)
+
+    def test_next__empty(self):
+        with self.assertRaises(ValueError):
+            LeastOutstandingStrategy().next([])
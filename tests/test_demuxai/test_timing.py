@@ -1,7 +1,10 @@
 import time
+from unittest import mock
 from unittest import TestCase
 
+from demuxai.timing import QuantileSketch
 from demuxai.timing import Timing
+from demuxai.timing import TimingSketches
 from demuxai.timing import TimingStatistics
 
 
@@ -58,6 +61,30 @@ class TimingTestCase(TestCase):
         with self.assertRaises(AssertionError, msg="Timing not ended"):
             _ = timing.response_duration
 
+    def test_add_token(self):
+        timing = Timing(provider_id="ollama", model="qwen")
+        timing.start_time = 0
+        self.assertEqual(timing.inter_token_latency, 0)
+        with self.assertRaises(AssertionError, msg="First token not received"):
+            _ = timing.time_to_first_token
+
+        timing.add_token()
+        timing.add_token()
+        timing.add_token()
+        self.assertEqual(timing.token_count, 3)
+        self.assertGreater(timing.last_token_time, timing.first_token_time)
+
+        timing.first_token_time = 0.5
+        timing.last_token_time = 1.5
+        self.assertEqual(timing.time_to_first_token, 0.5)
+        self.assertEqual(timing.inter_token_latency, 0.5)
+
+    def test_started(self):
+        timing = Timing()
+        self.assertFalse(timing.started)
+        timing.start()
+        self.assertTrue(timing.started)
+
     def test_context_manager(self):
         with Timing() as timing:
             time.sleep(0.01)
@@ -143,6 +170,72 @@ class TimingStatisticsTestCase(TestCase):
         self.assertAlmostEqual(stats.duration, expected_duration)
         self.assertAlmostEqual(stats.response_duration, expected_response_duration)
 
+    def _timing(self, duration: float) -> Timing:
+        timing = Timing()
+        timing.start_time = 0
+        timing.first_byte_time = duration / 2
+        timing.end_time = duration
+        return timing
+
+    def test_add__running_sums(self):
+        stats = TimingStatistics(limit=2)
+        stats.add(self._timing(1.0))
+        stats.add(self._timing(2.0))
+        self.assertAlmostEqual(stats.duration, 1.5)
+        stats.add(self._timing(4.0))
+        self.assertAlmostEqual(stats.duration, 3.0)
+        self.assertAlmostEqual(stats.time_to_first_byte, 1.5)
+        self.assertAlmostEqual(stats.response_duration, 1.5)
+
+    def test_add__incomplete_timing(self):
+        stats = TimingStatistics()
+        stats.add(self._timing(1.0))
+        stats.add(Timing())
+        self.assertEqual(len(stats.timings), 2)
+        self.assertAlmostEqual(stats.duration, 1.0)
+
+    @mock.patch("demuxai.timing.clock")
+    def test_max_age(self, mock_clock):
+        stats = TimingStatistics(limit=10, max_age=60)
+        mock_clock.return_value = 100
+        stats.add(self._timing(1.0))
+        mock_clock.return_value = 130
+        stats.add(self._timing(3.0))
+        self.assertAlmostEqual(stats.duration, 2.0)
+
+        mock_clock.return_value = 161
+        self.assertAlmostEqual(stats.duration, 3.0)
+        self.assertEqual(len(stats.timings), 1)
+
+        mock_clock.return_value = 200
+        self.assertEqual(stats.duration, 0)
+        self.assertEqual(stats.timings, [])
+
+    def test_token_properties(self):
+        stats = TimingStatistics(limit=10)
+        self.assertEqual(stats.time_to_first_token, 0)
+        self.assertEqual(stats.inter_token_latency, 0)
+
+        timing1 = Timing()
+        timing1.start_time = 0
+        timing1.first_token_time = 0.2
+        timing1.last_token_time = 1.2
+        timing1.token_count = 11
+        stats.add(timing1)
+
+        timing2 = Timing()
+        timing2.start_time = 0
+        timing2.first_token_time = 0.4
+        timing2.last_token_time = 0.4
+        timing2.token_count = 1
+        stats.add(timing2)
+
+        # timings without tokens are excluded
+        stats.add(Timing())
+
+        self.assertAlmostEqual(stats.time_to_first_token, (0.2 + 0.4) / 2)
+        self.assertAlmostEqual(stats.inter_token_latency, 0.1)
+
     def test_str(self):
         stats = TimingStatistics(limit=10)
         self.assertEqual(str(stats), "0.000s / 0.000s / 0.000s")
@@ -154,3 +247,117 @@ class TimingStatisticsTestCase(TestCase):
         stats.add(timing1)
 
         self.assertEqual(str(stats), "0.123s / 0.333s / 0.456s")
+
+
+class QuantileSketchTestCase(TestCase):
+    def test_quantile(self):
+        sketch = QuantileSketch(accuracy=0.01)
+        for value in range(1, 1001):
+            sketch.add(value / 1000)
+        self.assertEqual(sketch.count, 1000)
+        for q, expected in ((0.5, 0.5), (0.9, 0.9), (0.99, 0.99)):
+            self.assertAlmostEqual(sketch.quantile(q), expected, delta=expected * 0.02)
+        self.assertAlmostEqual(sketch.quantile(0), 0.001, delta=0.001 * 0.02)
+        self.assertAlmostEqual(sketch.quantile(1), 1.0, delta=0.02)
+
+    def test_quantile__empty(self):
+        self.assertEqual(QuantileSketch().quantile(0.5), 0)
+
+    def test_quantile__zero(self):
+        sketch = QuantileSketch()
+        sketch.add(0)
+        sketch.add(0)
+        sketch.add(1)
+        self.assertEqual(sketch.quantile(0.5), 0)
+        self.assertAlmostEqual(sketch.quantile(1), 1, delta=0.02)
+
+    def test_max_buckets(self):
+        sketch = QuantileSketch(accuracy=0.01, max_buckets=16)
+        for value in range(1, 10001):
+            sketch.add(value / 1000)
+        self.assertLessEqual(len(sketch.buckets), 16)
+        self.assertAlmostEqual(sketch.quantile(0.99), 9.9, delta=9.9 * 0.02)
+
+    def test_merge(self):
+        sketch1 = QuantileSketch()
+        sketch2 = QuantileSketch()
+        for value in range(1, 501):
+            sketch1.add(value / 1000)
+        for value in range(501, 1001):
+            sketch2.add(value / 1000)
+        sketch1.merge(sketch2)
+        self.assertEqual(sketch1.count, 1000)
+        self.assertEqual(sketch1.max, 1.0)
+        self.assertAlmostEqual(sketch1.quantile(0.9), 0.9, delta=0.9 * 0.02)
+
+    def test_quantile__after_add(self):
+        sketch = QuantileSketch()
+        sketch.add(1)
+        self.assertAlmostEqual(sketch.quantile(1), 1, delta=0.02)
+        # the sorted buckets of the first read are rebuilt once a value is added
+        sketch.add(2)
+        self.assertAlmostEqual(sketch.quantile(1), 2, delta=0.04)
+        other = QuantileSketch()
+        other.add(4)
+        sketch.merge(other)
+        self.assertAlmostEqual(sketch.quantile(1), 4, delta=0.08)
+
+    def test_merge__different_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch(accuracy=0.01).merge(QuantileSketch(accuracy=0.02))
+
+
+class TimingSketchesTestCase(TestCase):
+    def _timing(self, duration: float) -> Timing:
+        timing = Timing()
+        timing.start_time = 0
+        timing.first_byte_time = duration / 2
+        timing.end_time = duration
+        return timing
+
+    @mock.patch("demuxai.timing.clock")
+    def test_add(self, mock_clock):
+        mock_clock.return_value = 0
+        sketches = TimingSketches(window=60)
+        for value in range(1, 101):
+            sketches.add(self._timing(value / 100))
+
+        self.assertAlmostEqual(sketches.quantile("duration", 0.5), 0.5, delta=0.01)
+        self.assertAlmostEqual(
+            sketches.quantile("time_to_first_byte", 0.5), 0.25, delta=0.005
+        )
+        self.assertEqual(sketches.sketch("time_to_first_token").count, 0)
+        self.assertEqual(list(sketches.quantiles("duration")), [0.5, 0.9, 0.99])
+
+    @mock.patch("demuxai.timing.clock")
+    def test_sketch__cached(self, mock_clock):
+        mock_clock.return_value = 0
+        sketches = TimingSketches(window=60)
+        sketches.add(self._timing(1.0))
+        sketch = sketches.sketch("duration")
+        self.assertIs(sketches.sketch("duration"), sketch)
+
+        sketches.add(self._timing(2.0))
+        self.assertIsNot(sketches.sketch("duration"), sketch)
+        self.assertEqual(sketches.sketch("duration").count, 2)
+
+        sketch = sketches.sketch("duration")
+        mock_clock.return_value = 61
+        self.assertIsNot(sketches.sketch("duration"), sketch)
+
+    @mock.patch("demuxai.timing.clock")
+    def test_rotate(self, mock_clock):
+        mock_clock.return_value = 0
+        sketches = TimingSketches(window=60)
+        sketches.add(self._timing(1.0))
+
+        mock_clock.return_value = 61
+        sketches.add(self._timing(2.0))
+        self.assertEqual(sketches.sketch("duration").count, 2)
+
+        mock_clock.return_value = 122
+        self.assertEqual(sketches.sketch("duration").count, 1)
+        self.assertEqual(sketches.quantile("duration", 0.5), 2.0)
+
+        mock_clock.return_value = 300
+        self.assertEqual(sketches.sketch("duration").count, 0)
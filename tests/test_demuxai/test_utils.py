@@ -10,7 +10,11 @@ from demuxai.utils import _NO_CACHE_VALUE
 from demuxai.utils import AsyncCacher
 from demuxai.utils import AsyncCacheTarget
 from demuxai.utils import CacheProvider
+from demuxai.utils import find_json_string
+from demuxai.utils import json_members
+from demuxai.utils import prefix_json_string
 from demuxai.utils import recursive_update
+from demuxai.utils import set_json_members
 
 
 class CacheProviderTestCase(TestCase):
@@ -312,3 +316,266 @@ class RecursiveUpdateTestCase(TestCase):
         result = recursive_update(original, update)
 
         self.assertEqual(result, {"a": 1, "b": 2})
+
+
+class FindJSONStringTestCase(TestCase):
+    def test_top_level(self):
+        raw = b'{"id": "x", "model": "qwen"}'
+        start, end = find_json_string(raw, "model")
+        self.assertEqual(raw[start:end], b"qwen")
+
+    def test_missing(self):
+        self.assertIsNone(find_json_string(b'{"id": "x"}', "model"))
+
+    def test_non_string_value(self):
+        self.assertIsNone(find_json_string(b'{"model": null}', "model"))
+
+    def test_nested_key_skipped(self):
+        raw = b'{"choices": [{"model": "nested"}], "model": "top"}'
+        start, end = find_json_string(raw, "model")
+        self.assertEqual(raw[start:end], b"top")
+
+    def test_only_nested_key(self):
+        raw = b'{"choices": [{"model": "nested"}]}'
+        self.assertIsNone(find_json_string(raw, "model"))
+
+    def test_not_an_object(self):
+        self.assertIsNone(find_json_string(b'[{"model": "nested"}]', "model"))
+
+    def test_key_inside_string_value(self):
+        raw = b'{"content": "{\\"model\\": \\"fake\\"}", "model": "real"}'
+        start, end = find_json_string(raw, "model")
+        self.assertEqual(raw[start:end], b"real")
+
+    def test_brackets_inside_string_value(self):
+        raw = b'{"content": "{[{", "model": "real"}'
+        start, end = find_json_string(raw, "model")
+        self.assertEqual(raw[start:end], b"real")
+
+    def test_escaped_value(self):
+        raw = b'{"model": "a\\"b"}'
+        start, end = find_json_string(raw, "model")
+        self.assertEqual(raw[start:end], b'a\\"b')
+
+    def test_escaped_quote_in_key(self):
+        raw = b'{"note\\"model": "fake", "model": "real"}'
+        start, end = find_json_string(raw, "model")
+        self.assertEqual(raw[start:end], b"real")
+
+
+class PrefixJSONStringTestCase(TestCase):
+    def test_prefix(self):
+        raw = b'{"id":"x","model":"qwen","choices":[{"delta":{"content":"hi"}}]}'
+        self.assertEqual(
+            prefix_json_string(raw, "model", "ollama/"),
+            b'{"id":"x","model":"ollama/qwen","choices":[{"delta":{"content":"hi"}}]}',
+        )
+
+    def test_missing(self):
+        self.assertIsNone(prefix_json_string(b'{"id": "x"}', "model", "ollama/"))
+
+    def test_prefix_escaped(self):
+        raw = b'{"model": "qwen"}'
+        self.assertEqual(
+            prefix_json_string(raw, "model", 'a"b/'), b'{"model": "a\\"b/qwen"}'
+        )
+
+    def test_prefix_escaped_quote_in_key(self):
+        raw = b'{"note\\"model":"qwen","model":"qwen"}'
+        self.assertEqual(
+            prefix_json_string(raw, "model", "ollama/"),
+            b'{"note\\"model":"qwen","model":"ollama/qwen"}',
+        )
+
+
+class JSONMembersTestCase(TestCase):
+    def test_members(self):
+        raw = (
+            b' { "model":"qwen", "messages" : [{"content": "a}\\"b"}],'
+            b'"stream": true , "n": -1.5e3, "stop": null}'
+        )
+        members = json_members(raw)
+        self.assertEqual(
+            {key: raw[start:end] for key, (start, end) in members.items()},
+            {
+                "model": b'"qwen"',
+                "messages": b'[{"content": "a}\\"b"}]',
+                "stream": b"true",
+                "n": b"-1.5e3",
+                "stop": b"null",
+            },
+        )
+
+    def test_escaped_key(self):
+        members = json_members(b'{"a\\"b": 1}')
+        self.assertEqual(list(members), ['a"b'])
+
+    def test_empty(self):
+        self.assertEqual(json_members(b" {} "), {})
+
+    def test_not_an_object(self):
+        self.assertIsNone(json_members(b'[{"model": "x"}]'))
+        self.assertIsNone(json_members(b'{"model": "x",}'))
+        self.assertIsNone(json_members(b'{"model": ["x"}'))
+
+    def test_escaped_quote_in_key(self):
+        members = json_members(b'{"note\\"model": "a", "model": "b"}')
+        self.assertEqual(list(members), ['note"model', "model"])
+
+    def test_escaped_backslash_before_quote(self):
+        raw = b'{"content": "a\\\\", "model": "b"}'
+        start, end = json_members(raw)["model"]
+        self.assertEqual(raw[start:end], b'"b"')
+
+    def test_duplicate_key(self):
+        self.assertIsNone(json_members(b'{"model": "a", "model": "b"}'))
+
+    def test_limit(self):
+        raw = (
+            b'{"model": "qwen", "messages": [{"content": "hi"}, {"content": "there"}]}'
+        )
+        members = json_members(raw, limit=12)
+        self.assertEqual(list(members), ["model", "messages"])
+        self.assertIsNone(members.gap)
+
+        # cut short in the messages, which are left in the gap
+        members = json_members(raw, limit=11)
+        self.assertEqual(list(members), ["model"])
+        self.assertEqual(raw[slice(*members.gap)].strip(), raw[18:-1])
+        self.assertTrue(members.settles("model"))
+        self.assertTrue(members.settles("stream"))
+        self.assertFalse(members.settles("messages"))
+
+    def test_limit__reversed(self):
+        raw = (
+            b'{"messages": [{"content": "a\\"b"}, {"content": "c"}], '
+            b'"model" :"a\\"b\\\\", "n": -1.5e3,"stream": true }'
+        )
+        # a step for each member, and for the escaped quote of the model
+        members = json_members(raw, limit=4)
+        self.assertEqual(
+            {key: raw[start:end] for key, (start, end) in members.items()},
+            {"model": b'"a\\"b\\\\"', "n": b"-1.5e3", "stream": b"true"},
+        )
+        self.assertEqual(raw[slice(*members.gap)].strip(b" ,")[:12], b'"messages": ')
+        self.assertFalse(members.settles("messages"))
+        self.assertTrue(members.settles("temperature"))
+
+    def test_limit__reversed_escaped_key(self):
+        raw = b'{"messages": [[1], [2]], "\\u006dodel": "a", "stream": true}'
+        members = json_members(raw, limit=2)
+        self.assertEqual(list(members), ["model", "stream"])
+
+        raw = b'{"messages": [["\\u00e9"], [2]], "stream": true}'
+        members = json_members(raw, limit=2)
+        # the gap could spell the key with escapes
+        self.assertFalse(members.settles("model"))
+
+        raw = b'{"messages": [["a\\/b"], [2]], "stream": true}'
+        members = json_members(raw, limit=2)
+        self.assertTrue(members.settles("model"))
+        self.assertFalse(members.settles("a/b"))
+
+    def test_limit__reversed_duplicate_key(self):
+        raw = b'{"model": "a", "messages": [[1], [2]], "model": "b"}'
+        self.assertIsNone(json_members(raw, limit=3))
+
+    def test_limit__reversed_meets(self):
+        raw = b'{"a": 1, "b": 2, "c": 3, "image": "\\"\\"", "stream": true}'
+        # cut short in the image, which the reversed scan reaches
+        members = json_members(raw, limit=5)
+        self.assertEqual(list(members), ["a", "b", "c", "image", "stream"])
+        self.assertEqual(raw[slice(*members["image"])], b'"\\"\\""')
+        self.assertIsNone(members.gap)
+
+    def test_limit__long_string(self):
+        raw = b'{"model": "qwen", "image": "' + b"a" * 100000 + b'"}'
+        self.assertEqual(list(json_members(raw, limit=2)), ["model", "image"])
+
+
+class SetJSONMembersTestCase(TestCase):
+    def test_replace_string(self):
+        raw = b'{"model": "qwen", "messages": [{"role": "user", "content": "hi"}]}'
+        self.assertEqual(
+            set_json_members(raw, {"model": b'"qwen3"'}),
+            b'{"model": "qwen3", "messages": [{"role": "user", "content": "hi"}]}',
+        )
+
+    def test_replace_scalar(self):
+        raw = b'{"temperature": 0.2, "stream": true}'
+        self.assertEqual(
+            set_json_members(raw, {"temperature": b"0.7"}),
+            b'{"temperature": 0.7, "stream": true}',
+        )
+        self.assertEqual(
+            set_json_members(raw, {"stream": b"false"}),
+            b'{"temperature": 0.2, "stream": false}',
+        )
+
+    def test_replace_container(self):
+        raw = b'{"stop": ["}", "]"], "prompt": "a"}'
+        self.assertEqual(
+            set_json_members(raw, {"stop": b'["\\n"]'}),
+            b'{"stop": ["\\n"], "prompt": "a"}',
+        )
+
+    def test_nested_key_skipped(self):
+        raw = b'{"messages": [{"model": "nested"}], "model": "top"}'
+        self.assertEqual(
+            set_json_members(raw, {"model": b'"new"'}),
+            b'{"messages": [{"model": "nested"}], "model": "new"}',
+        )
+
+    def test_append(self):
+        self.assertEqual(
+            set_json_members(b'{"prompt": "a"}\n', {"suffix": b'"b"'}),
+            b'{"prompt": "a","suffix":"b"}\n',
+        )
+
+    def test_append_empty(self):
+        self.assertEqual(
+            set_json_members(b"{ }", {"suffix": b'"b"'}), b'{ "suffix":"b"}'
+        )
+
+    def test_not_an_object(self):
+        self.assertIsNone(set_json_members(b'[{"model": "x"}]', {"suffix": b'"b"'}))
+
+    def test_escaped_quote_in_key(self):
+        raw = b'{"note\\"model":"a","model":"client-model"}'
+        self.assertEqual(
+            set_json_members(raw, {"model": b'"upstream-model"'}),
+            b'{"note\\"model":"a","model":"upstream-model"}',
+        )
+
+    def test_duplicate_key(self):
+        raw = b'{"model": "a", "model": "b"}'
+        self.assertIsNone(set_json_members(raw, {"model": b'"c"'}))
+
+    def test_several(self):
+        raw = b'{"temperature": 0.2, "model": "qwen", "stream": true}'
+        self.assertEqual(
+            set_json_members(
+                raw, {"stream": b"false", "model": b'"qwen3"', "suffix": b'"b"'}
+            ),
+            b'{"temperature": 0.2, "model": "qwen3", "stream": false,"suffix":"b"}',
+        )
+
+    def test_members(self):
+        raw = b'{"model": "qwen"}'
+        members = json_members(raw)
+        self.assertEqual(
+            set_json_members(raw, {"model": b'"a"'}, members), b'{"model": "a"}'
+        )
+
+    def test_members__gap(self):
+        raw = b'{"messages": [[1], [2]], "model": "qwen"}'
+        members = json_members(raw, limit=2)
+        self.assertEqual(
+            set_json_members(raw, {"model": b'"a"', "n": b"1"}, members),
+            b'{"messages": [[1], [2]], "model": "a","n":1}',
+        )
+        # members in the gap are overridden by appending them, as the last member wins
+        self.assertEqual(
+            set_json_members(raw, {"messages": b"[]"}, members),
+            b'{"messages": [[1], [2]], "model": "qwen","messages":[]}',
+        )